@@ -4,6 +4,11 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
+# e.g. uvicorn app.asgi:application --workers 4, with ASYNC_VIEWS=True to
+# serve the async views, see settings.ASYNC_VIEWS.
+# Under ASGI, Django reads a streaming response's sync iterator whole before
+# sending it, async views or not, so streamed exports hand out an async
+# iterator there, see core.export.
 application = get_asgi_application()
 
 
@@ -1,6 +1,7 @@
+import copy
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 import mimetypes
 mimetypes.add_type("text/css", ".css", True)
 mimetypes.add_type("text/html", ".html", True)
@@ -52,8 +53,11 @@ CORS_REPLACE_HTTPS_REFERER = True
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
 
 MIDDLEWARE = [
+    # First, so its timings include every other middleware
+    "core.instrumentation.InstrumentationMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "core.throttling.ThrottleMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -98,17 +102,183 @@ REST_FRAMEWORK = {
     # 'DATETIME_FORMAT': "%b %d at %I:%M %P",
     "DATETIME_FORMAT": "%Y-%m-%dT%H:%M:%S.%fZ",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "oauth2_provider.contrib.rest_framework.OAuth2Authentication",
+        "user.authentication.CachedOAuth2Authentication",
     ),
 }
 
+# Routes the user and product endpoints that have one to their async view,
+# see user.async_views and product.async_views. Off by default, ASGI too:
+# Django's middleware still runs its hooks in threads there, so they only
+# pay off once views wait on the network, see bench_load.
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {
+            "MAX_ENTRIES": config("CACHE_MAX_ENTRIES", default=10000, cast=int),
+        },
+    },
+}
+# Cache shared by all workers, for the SHARED_CACHE and CACHE aliases below
+if config("CACHE_REDIS_URL", default=None):
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config("CACHE_REDIS_URL"),
+    }
+
+# Rendered product GET responses, see core.response_cache
+RESPONSE_CACHE = {
+    # Alias in CACHES, only a shared one sees the writes of other workers
+    "CACHE": config("RESPONSE_CACHE", default="default"),
+    # Seconds an entry lives, and the longest writes of other workers stay
+    # unseen with a per process cache. 0 turns the cache off.
+    "TIMEOUT": config("RESPONSE_CACHE_TIMEOUT", default=60, cast=int),
+    # Seconds after a write that entries are read from the primary database
+    # rather than a replica, longer than replication lag
+    "REPLICA_LAG": config("RESPONSE_CACHE_REPLICA_LAG", default=5, cast=int),
+}
+
+# Product change feed for syncing clients, see product.changes
+PRODUCT_CHANGES = {
+    # Seconds a write stays out of the feed, longer than any transaction
+    # between setting updated_at and committing
+    "LAG": config("PRODUCT_CHANGES_LAG", default=5, cast=int),
+    # Days deletes are kept; older sync tokens must sync from scratch
+    "RETENTION_DAYS": config("PRODUCT_CHANGES_RETENTION_DAYS", default=30, cast=int),
+}
+
+OAUTH2_TOKEN_CACHE = {
+    "MAX_ENTRIES": config("OAUTH2_TOKEN_CACHE_MAX_ENTRIES", default=10000, cast=int),
+    # Upper bound on how long other workers may accept a revoked token
+    "TIMEOUT": config("OAUTH2_TOKEN_CACHE_TIMEOUT", default=60, cast=int),
+    # Alias in CACHES shared by all workers, e.g. a Redis cache
+    "SHARED_CACHE": config("OAUTH2_TOKEN_CACHE_SHARED", default=None),
+}
+
+# Logins within this many seconds of the stored last_login do not write it
+LAST_LOGIN_UPDATE_INTERVAL = config("LAST_LOGIN_UPDATE_INTERVAL", default=300, cast=int)
+
+# Background jobs in the database, run by manage.py run_jobs, see core.jobs
+JOBS = {
+    # Seconds an idle worker waits before looking for due jobs again
+    "POLL_INTERVAL": config("JOBS_POLL_INTERVAL", default=1.0, cast=float),
+    "BATCH_SIZE": config("JOBS_BATCH_SIZE", default=20, cast=int),
+    # Seconds a job may run before another worker takes it for dead and retries
+    "LEASE": config("JOBS_LEASE", default=300, cast=int),
+    # Runs of a failing job, retried after RETRY_BACKOFF seconds, doubling
+    "MAX_ATTEMPTS": config("JOBS_MAX_ATTEMPTS", default=5, cast=int),
+    "RETRY_BACKOFF": config("JOBS_RETRY_BACKOFF", default=5, cast=int),
+    # Days finished jobs are kept
+    "KEEP_DAYS": config("JOBS_KEEP_DAYS", default=7, cast=int),
+    # Tasks queued every INTERVAL seconds
+    "SCHEDULE": {
+        "prune_jobs": {"TASK": "core.jobs.prune_jobs", "INTERVAL": 60 * 60},
+        "prune_tombstones": {
+            "TASK": "product.changes.prune_tombstones",
+            "INTERVAL": 60 * 60 * 24,
+        },
+        "purge_expired": {"TASK": "user.cleanup.purge_expired", "INTERVAL": 60 * 60},
+    },
+}
+
+# Expired tokens, grants and sessions deleted by user.cleanup.purge_expired
+EXPIRED_CLEANUP = {
+    # Rows deleted per transaction
+    "BATCH_SIZE": config("EXPIRED_CLEANUP_BATCH_SIZE", default=500, cast=int),
+    # Seconds between batches, in which other writers get the lock
+    "PAUSE": config("EXPIRED_CLEANUP_PAUSE", default=0.1, cast=float),
+}
+
+# Outbound calls, see core.http
+HTTP_CLIENT = {
+    # Hosts kept pooled and connections kept alive per host
+    "POOL_CONNECTIONS": config("HTTP_POOL_CONNECTIONS", default=10, cast=int),
+    "POOL_MAXSIZE": config("HTTP_POOL_MAXSIZE", default=10, cast=int),
+    # Seconds a call waits for a free connection before failing
+    "POOL_TIMEOUT": config("HTTP_POOL_TIMEOUT", default=1.0, cast=float),
+    "CONNECT_TIMEOUT": config("HTTP_CONNECT_TIMEOUT", default=1.0, cast=float),
+    "READ_TIMEOUT": config("HTTP_READ_TIMEOUT", default=5.0, cast=float),
+    "RETRIES": config("HTTP_RETRIES", default=2, cast=int),
+    "BACKOFF": config("HTTP_BACKOFF", default=0.1, cast=float),
+    # Consecutive failures that open a host's circuit, and seconds it stays open
+    "BREAKER_THRESHOLD": config("HTTP_BREAKER_THRESHOLD", default=5, cast=int),
+    "BREAKER_RESET": config("HTTP_BREAKER_RESET", default=30, cast=int),
+}
+
 OAUTH2_PROVIDER = {
     "ACCESS_TOKEN_EXPIRE_SECONDS": 60 * 60 * 24,  # 1 day the token will be validated
     "OAUTH_SINGLE_ACCESS_TOKEN": True,
-    "OAUTH_DELETE_EXPIRED": True,
+    # Refresh tokens unused this long after their access token expired stop
+    # working and are purged, see EXPIRED_CLEANUP
+    "REFRESH_TOKEN_EXPIRE_SECONDS": config(
+        "OAUTH2_REFRESH_TOKEN_EXPIRE_SECONDS", default=60 * 60 * 24 * 30, cast=int
+    ),
     "OAUTH2_BACKEND_CLASS": "oauth2_provider.oauth2_backends.JSONOAuthLibCore",
+    "OAUTH2_VALIDATOR_CLASS": "user.oauth.FirstPartyValidator",
 }
 
+# Per view metrics, see core.instrumentation. Served on /metrics.
+INSTRUMENTATION = {
+    # Share of requests whose queries, rendering and outbound calls are
+    # timed and reported in a Server-Timing header
+    "SAMPLE_RATE": config("INSTRUMENTATION_SAMPLE_RATE", default=0.1, cast=float),
+    "SERVER_TIMING": config("INSTRUMENTATION_SERVER_TIMING", default=True, cast=bool),
+    # Sampled requests slower than this are logged with their SQL, 0 is off
+    "SLOW_REQUEST_MS": config("SLOW_REQUEST_MS", default=0, cast=int),
+    # Debug mode sampling every request and logging statements it ran this
+    # many times, the mark of N+1 queries, 0 is off
+    "REPEATED_QUERY_THRESHOLD": config(
+        "REPEATED_QUERY_THRESHOLD", default=0, cast=int
+    ),
+    # Addresses allowed to scrape /metrics, everyone if empty
+    "METRICS_ALLOWED_IPS": config(
+        "METRICS_ALLOWED_IPS", default="127.0.0.1,::1", cast=Csv()
+    ),
+}
+
+THROTTLING = {
+    # Alias in CACHES shared by all workers, buckets stay in process without it
+    "SHARED_CACHE": config("THROTTLE_SHARED_CACHE", default=None),
+    "MAX_ENTRIES": config("THROTTLE_MAX_ENTRIES", default=100000, cast=int),
+    # Token buckets refilling at the given rate, per client ip or posted email
+    "BUDGETS": {
+        "oauth": {
+            "PATHS": ["/user/oauth/"],
+            "RATES": {
+                "ip": config("THROTTLE_OAUTH_IP_RATE", default="30/min"),
+                "email": config("THROTTLE_OAUTH_EMAIL_RATE", default="10/min"),
+            },
+        },
+        "product": {
+            "PATHS": ["/product/"],
+            "RATES": {"ip": config("THROTTLE_PRODUCT_IP_RATE", default="600/min")},
+        },
+    },
+}
+
+PRODUCT_SEARCH = {
+    # Most indexed terms a query term is expanded to as a prefix
+    "MAX_EXPANSIONS": config("PRODUCT_SEARCH_MAX_EXPANSIONS", default=50, cast=int),
+    # Seconds before writes made without signals, e.g. by other workers,
+    # show up in search results
+    "REFRESH_INTERVAL": config(
+        "PRODUCT_SEARCH_REFRESH_INTERVAL", default=1.0, cast=float
+    ),
+}
+
+# Applied in order to every batch of rental quotes, see product.pricing
+RENTAL_PRICING_RULES = [
+    {
+        "CLASS": "product.pricing.LongRentalDiscount",
+        "OPTIONS": {"tiers": {7: 10, 30: 25}},
+    },
+    {
+        "CLASS": "product.pricing.WearSurcharge",
+        "OPTIONS": {"percent": 20},
+    },
+]
+
 WSGI_APPLICATION = "app.wsgi.application"
 
 AUTHENTICATION_BACKENDS = (
@@ -122,35 +292,114 @@ AUTHENTICATION_BACKENDS = (
     # 'social_core.backends.google.GoogleOAuth',
     # # django-rest-framework-social-oauth2:
     # "rest_framework_social_oauth2.backends.DjangoOAuth2",
-    # Django
-    "django.contrib.auth.backends.ModelBackend",
+    # Django, hashing in the pool of core.hashers
+    "user.backends.ModelBackend",
 )
 
+# Password hashing, see core.hashers. New hashes use HASHER and hashes of
+# the other hashers or other parameters are replaced on the next login.
+PASSWORD_HASHING = {
+    "HASHER": config("PASSWORD_HASHER", default="core.hashers.ScryptPasswordHasher"),
+    # Hashes computed at once per process, one per core if 0
+    "WORKERS": config("PASSWORD_HASHING_WORKERS", default=0, cast=int),
+    # Needs argon2-cffi
+    "ARGON2": {
+        "time_cost": config("ARGON2_TIME_COST", default=2, cast=int),
+        "memory_cost": config("ARGON2_MEMORY_COST", default=19456, cast=int),  # KiB
+        "parallelism": config("ARGON2_PARALLELISM", default=1, cast=int),
+    },
+    # Uses 128 * work_factor * block_size bytes of memory per hash
+    "SCRYPT": {
+        "work_factor": config("SCRYPT_WORK_FACTOR", default=2**14, cast=int),
+        "block_size": config("SCRYPT_BLOCK_SIZE", default=8, cast=int),
+        "parallelism": config("SCRYPT_PARALLELISM", default=1, cast=int),
+    },
+    "PBKDF2": {
+        "iterations": config("PBKDF2_ITERATIONS", default=1000000, cast=int),
+    },
+}
+PASSWORD_HASHERS = [PASSWORD_HASHING["HASHER"]] + [
+    hasher
+    for hasher in (
+        "core.hashers.Argon2PasswordHasher",
+        "core.hashers.ScryptPasswordHasher",
+        "core.hashers.PBKDF2PasswordHasher",
+    )
+    if hasher != PASSWORD_HASHING["HASHER"]
+]
+
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880
 
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
-#For production database
-# DATABASES = {
-#     'default': {
-#         'ENGINE': config("SQL_ENGINE", "django.db.backends.sqlite3"),
-#         'NAME': config("SQL_DATABASE", os.path.join(BASE_DIR, "db.sqlite3")),
-#         'USER': config("SQL_USER", "user"),  # master username
-#         'PASSWORD': config("SQL_PASSWORD", "password"),  # master password
-#         'HOST': config("SQL_HOST", "localhost"),  # Endpoint
-#         'PORT': config("SQL_PORT", "5432"),
-#     }
-# }
-
+# SQLite unless DB_ENGINE names another backend, e.g.
+# django.db.backends.postgresql with DB_NAME, DB_USER, DB_PASSWORD and DB_HOST
+DB_ENGINE = config("DB_ENGINE", default="django.db.backends.sqlite3")
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
+        "ENGINE": DB_ENGINE,
+        "NAME": config("DB_NAME", default=os.path.join(BASE_DIR, "db.sqlite3")),
+        "USER": config("DB_USER", default=""),
+        "PASSWORD": config("DB_PASSWORD", default=""),
+        "HOST": config("DB_HOST", default=""),
+        "PORT": config("DB_PORT", default=""),
+        # Seconds a connection is kept across requests, 0 closes it after each
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=60, cast=int),
+        # Checks a kept connection is still usable before a request uses it
+        "CONN_HEALTH_CHECKS": config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool),
+        "OPTIONS": {},
+    }
+}
+
+DB_POOL_MAX_SIZE = config("DB_POOL_MAX_SIZE", default=0, cast=int)
+if DB_POOL_MAX_SIZE and DB_ENGINE == "django.db.backends.postgresql":
+    # A psycopg pool per worker replaces persistent connections
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+        "max_size": DB_POOL_MAX_SIZE,
+        "timeout": config("DB_POOL_TIMEOUT", default=10, cast=int),
     }
+
+if DB_ENGINE == "django.db.backends.sqlite3":
+    # Transactions take the write lock up front and wait for it, instead of
+    # failing with "database is locked" when their first write needs it
+    DATABASES["default"]["OPTIONS"]["transaction_mode"] = config(
+        "SQLITE_TRANSACTION_MODE", default="IMMEDIATE"
+    )
+
+# Run on every new SQLite connection, see core.signals
+SQLITE_PRAGMAS = {
+    # Readers no longer wait for writers
+    "journal_mode": config("SQLITE_JOURNAL_MODE", default="wal"),
+    # Durable at checkpoints rather than at every commit, safe with WAL
+    "synchronous": config("SQLITE_SYNCHRONOUS", default="normal"),
+    # Milliseconds a connection waits for a lock before failing
+    "busy_timeout": config("SQLITE_BUSY_TIMEOUT", default=5000, cast=int),
+    # Bytes of the database file read through mmap
+    "mmap_size": config("SQLITE_MMAP_SIZE", default=256 * 1024 * 1024, cast=int),
+    # Page cache per connection, negative values are KiB
+    "cache_size": config("SQLITE_CACHE_SIZE", default=-64000, cast=int),
+    "temp_store": "memory",
+    # Refreshes the query planner statistics of tables that changed a lot,
+    # sampling at most this many rows per index
+    "analysis_limit": 1000,
+    "optimize": "0x10002",
 }
 
+# Read only copies of default, one per host in DB_REPLICA_HOSTS. Views using
+# core.routers.ReplicaReadMixin read from them, everything else from default.
+DATABASE_REPLICAS = []
+for index, host in enumerate(config("DB_REPLICA_HOSTS", default="", cast=Csv())):
+    alias = f"replica_{index}"
+    DATABASES[alias] = copy.deepcopy(DATABASES["default"])
+    DATABASES[alias].update(HOST=host, TEST={"MIRROR": "default"})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -174,6 +423,13 @@ SWAGGER_SETTINGS = {
    'USE_SESSION_AUTH': False
 }
 
+# Schema file written by the build_schema command at deploy time
+OPENAPI_SCHEMA = {
+    "FILE": config(
+        "OPENAPI_SCHEMA_FILE", default=os.path.join(BASE_DIR, "openapi.json")
+    ),
+}
+
 REDOC_SETTINGS = {
    'LAZY_RENDERING': False,
    'USE_SESSION_AUTH': False
@@ -8,23 +8,33 @@ from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Rental Software",
-        default_version="v1",
-        description="Describes all the API of Rental Software",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="zuhabul.islam@gmail.com"),
-        license=openapi.License(name="Private software"),
+from core.instrumentation import metrics_view
+from core.schema import precomputed_schema_view
+
+api_info = openapi.Info(
+    title="Rental Software",
+    default_version="v1",
+    description="Describes all the API of Rental Software",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="zuhabul.islam@gmail.com"),
+    license=openapi.License(name="Private software"),
+)
+
+# Serves the schema written by the build_schema command, see core.schema
+schema_view = precomputed_schema_view(
+    get_schema_view(
+        api_info,
+        public=True,
+        permission_classes=(permissions.AllowAny,),
     ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
+    api_info,
 )
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("user/", include("user.urls")),
     path("product/", include("product.urls")),
+    path("metrics", metrics_view, name="metrics"),
     path("swagger.json", schema_view.without_ui(cache_timeout=0), name="schema-json"),
     path(
         "swagger/",
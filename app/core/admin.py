@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from core import models
+from product.search import get_search_index
 from django.utils.translation import gettext_lazy as _
 
 
@@ -35,6 +36,28 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ["code", "name", "product_type", "availability", "updated_at"]
+    search_fields = ("code", "name")
+    # Most search matches listed
+    search_limit = 100
+
+    def get_search_results(self, request, queryset, search_term):
+        """Looks products up through the product search index"""
+        if not search_term:
+            return queryset, False
+        ids = get_search_index().search(search_term, self.search_limit)
+        return queryset.filter(id__in=ids), False
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["task", "status", "attempts", "run_at", "finished_at"]
+    list_filter = ("status",)
+    search_fields = ("task", "key")
+
+
 admin.site.site_header = "Rental Software"
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.ProductModel)
+admin.site.register(models.ProductModel, ProductAdmin)
+admin.site.register(models.Rental)
+admin.site.register(models.Job, JobAdmin)
@@ -0,0 +1,109 @@
+import resource
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+from django.db import connection, connections
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+
+@contextmanager
+def benchmark_database(test_name=None):
+    """Runs the block against a throwaway copy of the default database
+
+    test_name overrides TEST["NAME"], e.g. a file instead of SQLite's
+    in-memory default. Throttling is off, benchmarks send far more
+    requests than a client may.
+    """
+    old_name = connection.settings_dict["NAME"]
+    old_test_name = connection.settings_dict["TEST"].get("NAME")
+    if test_name:
+        connection.settings_dict["TEST"]["NAME"] = test_name
+    setup_test_environment(debug=False)
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    # Replicas read the test database, like under the test runner
+    mirrors = [
+        (replica, replica.settings_dict.copy())
+        for replica in connections.all()
+        if replica.settings_dict["TEST"].get("MIRROR") == connection.alias
+    ]
+    for replica, _ in mirrors:
+        replica.close()
+        replica.creation.set_as_test_mirror(connection.settings_dict)
+    try:
+        with override_settings(THROTTLING={}):
+            yield connection
+    finally:
+        for replica, settings_dict in mirrors:
+            replica.close()
+            replica.settings_dict = settings_dict
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict["TEST"]["NAME"] = old_test_name
+        teardown_test_environment()
+
+
+def current_rss():
+    """Returns the resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # Peak rather than current RSS, but still an upper bound
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def percentile(samples, pct):
+    """Returns the nearest-rank percentile of already sorted samples"""
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, round(pct / 100 * len(samples)) - 1))
+    return samples[rank]
+
+
+def expect_status(response, expected=200):
+    """Fails the benchmark when a call did not do the work being measured"""
+    status = getattr(response, "status_code", response)
+    if status != expected:
+        raise AssertionError(f"Expected status {expected}, got {status}")
+    return response
+
+
+def measure(func, repeat, warmup=0):
+    """Calls func repeat times and returns latency statistics in milliseconds"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - begin) * 1000)
+    elapsed = time.perf_counter() - started
+    return summarize(samples, elapsed)
+
+
+def summarize(samples, elapsed):
+    """Returns count, throughput and latency percentiles of samples"""
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "mean": round(statistics.fmean(samples), 3) if samples else 0.0,
+        "p50": round(percentile(samples, 50), 3),
+        "p95": round(percentile(samples, 95), 3),
+        "p99": round(percentile(samples, 99), 3),
+    }
+
+
+def format_result(name, result):
+    """Formats one result line for command output"""
+    return (
+        f"{name:<32} n={result['count']:<7} rps={result['rps']:<9} "
+        f"p50={result['p50']}ms p95={result['p95']}ms p99={result['p99']}ms"
+    )
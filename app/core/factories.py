@@ -0,0 +1,94 @@
+import datetime
+import random
+
+from decouple import config
+from django.contrib.auth.hashers import make_password
+from oauth2_provider.models import Application
+
+from core.models import ProductModel, Rental, User
+
+PRODUCT_TYPES = ["car", "truck", "van", "bike", "scooter", "trailer"]
+BRANDS = (
+    "Atlas Bolt Comet Drift Ember Falcon Glide Harbor Ion Juniper Kestrel Lumen "
+    "Meridian Nomad Orbit Pioneer Quartz Ranger Summit Tundra"
+).split()
+
+
+def build_product(index, rng=random):
+    """Returns an unsaved product with plausible random values"""
+    max_durability = rng.randint(100, 5000)
+    product_type = rng.choice(PRODUCT_TYPES)
+    return ProductModel(
+        code=f"P{index:09d}",
+        name=f"{rng.choice(BRANDS)} {product_type.title()} {index}",
+        product_type=product_type,
+        availability=rng.random() < 0.8,
+        needing_repair=rng.random() < 0.1,
+        durability=rng.randint(0, max_durability),
+        max_durability=max_durability,
+        mileage=rng.randint(0, 200000),
+        price=rng.randint(10, 1000),
+        minimum_rent_period=rng.randint(1, 7),
+    )
+
+
+def create_products(count, batch_size=5000, seed=0, start=0):
+    """Inserts count products in batches and returns how many were created"""
+    rng = random.Random(seed)
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        ProductModel.objects.bulk_create(
+            [build_product(start + created + i, rng) for i in range(size)]
+        )
+        created += size
+    return created
+
+
+def create_users(count, batch_size=5000, password="password", start=0):
+    """Inserts count users sharing one password hash, which is slow to compute"""
+    encoded = make_password(password)
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        User.objects.bulk_create(
+            [
+                User(email=f"user{start + created + i}@example.com", password=encoded)
+                for i in range(size)
+            ]
+        )
+        created += size
+    return created
+
+
+def create_rentals(count, batch_size=10000, seed=0, start=datetime.date(2022, 1, 1)):
+    """Books count non-overlapping rentals spread over the existing products"""
+    rng = random.Random(seed)
+    products = list(ProductModel.objects.values_list("id", "minimum_rent_period"))
+    per_product = -(-count // len(products))
+    batch = []
+    created = 0
+    for product_id, minimum in products:
+        day = start
+        for _ in range(min(per_product, count - created)):
+            day += datetime.timedelta(days=rng.randint(0, 10))
+            end = day + datetime.timedelta(days=minimum + rng.randint(0, 7))
+            batch.append(Rental(product_id=product_id, start_date=day, end_date=end))
+            day = end
+            created += 1
+            if len(batch) >= batch_size:
+                Rental.objects.bulk_create(batch)
+                batch = []
+    Rental.objects.bulk_create(batch)
+    return created
+
+
+def create_application(name="bench"):
+    """Registers the first party OAuth application the login views mint for"""
+    return Application.objects.create(
+        name=name,
+        client_id=config("CLIENT_ID"),
+        client_secret=config("CLIENT_SECRET"),
+        client_type=Application.CLIENT_CONFIDENTIAL,
+        authorization_grant_type=Application.GRANT_PASSWORD,
+    )
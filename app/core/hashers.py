@@ -0,0 +1,95 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+# Set in the threads of the hashing pool, which hash in place
+pool_thread = threading.local()
+
+
+def get_options():
+    options = getattr(settings, "PASSWORD_HASHING", {})
+    return {
+        "WORKERS": options.get("WORKERS") or os.cpu_count() or 1,
+        "ARGON2": options.get("ARGON2", {}),
+        "SCRYPT": options.get("SCRYPT", {}),
+        "PBKDF2": options.get("PBKDF2", {}),
+    }
+
+
+def mark_pool_thread():
+    pool_thread.active = True
+
+
+@lru_cache(maxsize=None)
+def get_hashing_pool():
+    """Returns the pool of WORKERS threads every password hash is computed in
+
+    hashlib and argon2 release the GIL while hashing, so the pool runs one
+    hash per core however many request threads or coroutines wait on it,
+    and extra logins queue instead of oversubscribing the CPU.
+    """
+    return ThreadPoolExecutor(
+        max_workers=get_options()["WORKERS"],
+        thread_name_prefix="hashing",
+        initializer=mark_pool_thread,
+    )
+
+
+def run_hashing(func, *args, **kwargs):
+    """Calls func in the hashing pool and waits for its result"""
+    if getattr(pool_thread, "active", False):
+        return func(*args, **kwargs)
+    return get_hashing_pool().submit(func, *args, **kwargs).result()
+
+
+async def arun_hashing(func, *args, **kwargs):
+    """Like run_hashing(), leaving the event loop free while func runs"""
+    future = get_hashing_pool().submit(func, *args, **kwargs)
+    return await asyncio.wrap_future(future)
+
+
+async def acheck_password(user, raw_password):
+    """Checks raw_password of user in the hashing pool, rehashing if outdated
+
+    Django's own acheck_password() hashes on the event loop.
+    """
+    correct, must_update = await arun_hashing(
+        hashers.verify_password, raw_password, user.password
+    )
+    if correct and must_update:
+        user.password = await arun_hashing(hashers.make_password, raw_password)
+        await user.asave(update_fields=["password"])
+    return correct
+
+
+class PooledHasherMixin:
+    """Computes hashes in the hashing pool, with parameters from settings"""
+
+    options_key = None
+
+    def __init__(self):
+        for name, value in get_options()[self.options_key].items():
+            setattr(self, name, value)
+
+    def encode(self, *args, **kwargs):
+        return run_hashing(super().encode, *args, **kwargs)
+
+    def verify(self, password, encoded):
+        return run_hashing(super().verify, password, encoded)
+
+
+class Argon2PasswordHasher(PooledHasherMixin, hashers.Argon2PasswordHasher):
+    options_key = "ARGON2"
+
+
+class ScryptPasswordHasher(PooledHasherMixin, hashers.ScryptPasswordHasher):
+    options_key = "SCRYPT"
+
+
+class PBKDF2PasswordHasher(PooledHasherMixin, hashers.PBKDF2PasswordHasher):
+    options_key = "PBKDF2"
@@ -0,0 +1,215 @@
+import threading
+import time
+from functools import lru_cache
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.instrumentation import timed
+
+# Upstream answers that count as a failure of the host rather than the call
+FAILURE_STATUSES = frozenset({500, 502, 503, 504})
+
+# Methods retried once their request was sent. A POST may have taken effect
+# before the answer was lost, so it is only retried on connection errors
+RETRY_METHODS = frozenset({"DELETE", "GET", "HEAD", "OPTIONS", "PUT", "TRACE"})
+
+
+class Unavailable(requests.RequestException):
+    """Raised instead of calling a host whose circuit is open or pool is full"""
+
+
+class CircuitBreaker:
+    """Stops calls to a host after threshold consecutive failures
+
+    Once open, calls fail at once for reset_timeout seconds. Then one call
+    is let through, and its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, threshold=5, reset_timeout=30):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial:
+                self.trial = True
+                return True
+            return False
+
+    def record(self, success):
+        with self.lock:
+            self.trial = False
+            if success:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class Host:
+    """Breaker, concurrency limit and counters of one upstream host"""
+
+    def __init__(self, max_in_flight, breaker):
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.breaker = breaker
+        self.counts = {"requests": 0, "failures": 0, "rejected": 0, "in_flight": 0}
+        self.lock = threading.Lock()
+
+    def count(self, name, delta=1):
+        with self.lock:
+            self.counts[name] += delta
+
+
+class HTTPClient:
+    """Process wide requests session for outbound calls
+
+    Connections are kept alive per host, at most pool_maxsize of them.
+    Callers beyond that wait up to pool_timeout seconds for a connection
+    and then fail, so a slow upstream cannot tie up every worker thread.
+    Connection errors, and 502, 503 and 504 answers to RETRY_METHODS, are
+    retried with exponential backoff. Every call has a (connect, read)
+    timeout.
+    """
+
+    def __init__(
+        self,
+        pool_connections=10,
+        pool_maxsize=10,
+        pool_timeout=1.0,
+        timeout=(1.0, 5.0),
+        retries=2,
+        backoff=0.1,
+        breaker_threshold=5,
+        breaker_reset=30,
+    ):
+        self.pool_maxsize = pool_maxsize
+        self.pool_timeout = pool_timeout
+        self.timeout = timeout
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.session = requests.Session()
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            # The host slots below keep callers from waiting on the pool
+            pool_block=True,
+            max_retries=Retry(
+                total=retries,
+                backoff_factor=backoff,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=RETRY_METHODS,
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    def get_host(self, url):
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        host = self.hosts.get(key)
+        if host is None:
+            with self.lock:
+                host = self.hosts.setdefault(
+                    key,
+                    Host(
+                        self.pool_maxsize,
+                        CircuitBreaker(self.breaker_threshold, self.breaker_reset),
+                    ),
+                )
+        return host
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """Sends a request like requests.request, raising Unavailable when shed"""
+        host = self.get_host(url)
+        if not host.slots.acquire(timeout=self.pool_timeout):
+            host.count("rejected")
+            raise Unavailable(f"No connection to {url} within {self.pool_timeout}s")
+        if not host.breaker.allow():
+            host.slots.release()
+            host.count("rejected")
+            raise Unavailable(f"Circuit open for {url}")
+        host.count("requests")
+        host.count("in_flight")
+        success = False
+        try:
+            with timed("http"):
+                response = self.session.request(
+                    method, url, timeout=timeout or self.timeout, **kwargs
+                )
+            success = response.status_code not in FAILURE_STATUSES
+            return response
+        finally:
+            host.count("in_flight", -1)
+            host.slots.release()
+            host.breaker.record(success)
+            if not success:
+                host.count("failures")
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def stats(self):
+        """Returns counters, circuit state and pooled connections per host"""
+        pools = {}
+        pools_by_key = self.adapter.poolmanager.pools
+        for key in pools_by_key.keys():
+            pool = pools_by_key.get(key)
+            if pool is None:
+                continue
+            pools[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                "opened": pool.num_connections,
+                # Slots not checked out, holding an idle connection or none yet
+                "free": pool.pool.qsize() if pool.pool else 0,
+                "sent": pool.num_requests,
+            }
+        stats = {}
+        for key, host in list(self.hosts.items()):
+            with host.lock:
+                stats[key] = dict(host.counts, circuit=host.breaker.state)
+        return {"hosts": stats, "pools": pools}
+
+
+@lru_cache(maxsize=None)
+def get_http_client():
+    """Returns the client configured by settings.HTTP_CLIENT"""
+    options = getattr(settings, "HTTP_CLIENT", {})
+    return HTTPClient(
+        pool_connections=options.get("POOL_CONNECTIONS", 10),
+        pool_maxsize=options.get("POOL_MAXSIZE", 10),
+        pool_timeout=options.get("POOL_TIMEOUT", 1.0),
+        timeout=(
+            options.get("CONNECT_TIMEOUT", 1.0),
+            options.get("READ_TIMEOUT", 5.0),
+        ),
+        retries=options.get("RETRIES", 2),
+        backoff=options.get("BACKOFF", 0.1),
+        breaker_threshold=options.get("BREAKER_THRESHOLD", 5),
+        breaker_reset=options.get("BREAKER_RESET", 30),
+    )
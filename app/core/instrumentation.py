@@ -0,0 +1,434 @@
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core.throttling import client_ip
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """Monotonic count per label values, in the Prometheus text format"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            series = dict(self.series)
+        for labels, value in sorted(series.items()):
+            yield self.name, format_labels(self.labelnames, labels), value
+
+
+class Histogram(Counter):
+    """Observations per label values, counted in cumulative buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # One count per bucket and +Inf, then the sum
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self.lock:
+            series = {labels: list(values) for labels, values in self.series.items()}
+        names = self.labelnames + ("le",)
+        for labels, values in sorted(series.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                total += count
+                yield f"{self.name}_bucket", format_labels(
+                    names, labels + (bound,)
+                ), total
+            yield f"{self.name}_sum", format_labels(self.labelnames, labels), values[-1]
+            yield f"{self.name}_count", format_labels(self.labelnames, labels), total
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def expose(self, extra=()):
+        """Returns every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in [*self.metrics, *extra]:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+VIEW_LABELS = ("view", "method")
+
+REQUESTS = REGISTRY.register(
+    Counter("http_requests_total", "Requests answered", ("view", "method", "status"))
+)
+REQUEST_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from the first middleware to the response",
+        VIEW_LABELS,
+    )
+)
+RESPONSE_SIZE = REGISTRY.register(
+    Histogram(
+        "http_response_size_bytes",
+        "Body size of non streaming responses",
+        VIEW_LABELS,
+        SIZE_BUCKETS,
+    )
+)
+# Recorded for sampled requests only
+DB_QUERIES = REGISTRY.register(
+    Histogram(
+        "http_request_db_queries",
+        "Database queries per sampled request",
+        VIEW_LABELS,
+        QUERY_BUCKETS,
+    )
+)
+DB_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_db_seconds",
+        "Database time per sampled request",
+        VIEW_LABELS,
+    )
+)
+SERIALIZE_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_serialize_seconds",
+        "Response rendering time per sampled request",
+        VIEW_LABELS,
+    )
+)
+OUTBOUND_DURATION = REGISTRY.register(
+    Histogram(
+        "http_request_outbound_seconds",
+        "Outbound HTTP time per sampled request, see core.http",
+        VIEW_LABELS,
+    )
+)
+
+
+class RequestStats:
+    """Time spent per kind of work while one sampled request ran"""
+
+    # Statements kept for the slow request log
+    max_statements = 100
+
+    def __init__(self, capture_sql=False, count_repeats=False):
+        self.timings = {"db": 0.0, "serialize": 0.0, "http": 0.0}
+        self.queries = 0
+        self.statements = [] if capture_sql else None
+        self.repeats = {} if count_repeats else None
+
+    def add(self, name, seconds):
+        self.timings[name] += seconds
+
+    def execute(self, execute, sql, params, many, context):
+        """Database execute wrapper counting and timing every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.timings["db"] += elapsed
+            if (
+                self.statements is not None
+                and len(self.statements) < self.max_statements
+            ):
+                self.statements.append((elapsed, context["connection"].alias, sql))
+            if self.repeats is not None:
+                self.repeats[sql] = self.repeats.get(sql, 0) + 1
+
+    def repeated(self, threshold):
+        """Returns (count, sql) of statements run at least threshold times
+
+        Statements are compared before their parameters are bound, so the
+        per row queries of an N+1 pattern count as the same statement.
+        """
+        return sorted(
+            (
+                (count, sql)
+                for sql, count in (self.repeats or {}).items()
+                if count >= threshold
+            ),
+            reverse=True,
+        )
+
+
+@contextmanager
+def collect_queries(stats):
+    """Counts and times in stats every query run on any connection in the block"""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats.execute))
+        yield stats
+
+
+current_stats = ContextVar("current_stats", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper of every connection, see core.signals
+
+    Counts the query in the stats of the sampled request, if any. The
+    stats travel in a context variable, so queries an async view runs in
+    sync_to_async() threads, on those threads' connections, count too.
+    """
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.execute(execute, sql, params, many, context)
+
+
+@contextmanager
+def timed(name):
+    """Adds the time of the block to the stats of the sampled request, if any"""
+    stats = current_stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(name, time.perf_counter() - started)
+
+
+def get_options():
+    options = getattr(settings, "INSTRUMENTATION", {})
+    return {
+        "SAMPLE_RATE": options.get("SAMPLE_RATE", 0.1),
+        "SERVER_TIMING": options.get("SERVER_TIMING", True),
+        "SLOW_REQUEST_MS": options.get("SLOW_REQUEST_MS", 0),
+        "REPEATED_QUERY_THRESHOLD": options.get("REPEATED_QUERY_THRESHOLD", 0),
+        "METRICS_ALLOWED_IPS": options.get("METRICS_ALLOWED_IPS", []),
+    }
+
+
+class InstrumentationMiddleware:
+    """Records latency, status and response size of every request per view
+
+    A SAMPLE_RATE share of requests also counts and times database queries,
+    response rendering and outbound HTTP calls, and reports them in a
+    Server-Timing header. With SLOW_REQUEST_MS set, sampled requests
+    slower than that are logged with their SQL. With
+    REPEATED_QUERY_THRESHOLD set, a debug mode, every request is sampled
+    and statements it ran that many times or more, the mark of an N+1
+    pattern, are logged. Metrics are kept per process and served by
+    metrics_view.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Like MiddlewareMixin, stays on the event loop under ASGI
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        options = get_options()
+        self.sample_rate = options["SAMPLE_RATE"]
+        self.server_timing = options["SERVER_TIMING"]
+        self.slow_seconds = (
+            options["SLOW_REQUEST_MS"] / 1000 if options["SLOW_REQUEST_MS"] else None
+        )
+        self.repeat_threshold = options["REPEATED_QUERY_THRESHOLD"]
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        stats = self.sample()
+        token = current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        stats = self.sample()
+        token = current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        self.record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def sample(self):
+        """Returns the stats to collect for a sampled request, else None"""
+        if self.repeat_threshold or (
+            self.sample_rate and random.random() < self.sample_rate
+        ):
+            return RequestStats(
+                capture_sql=self.slow_seconds is not None,
+                count_repeats=bool(self.repeat_threshold),
+            )
+        return None
+
+    def process_template_response(self, request, response):
+        stats = current_stats.get()
+        if stats is not None:
+            started = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: stats.add("serialize", time.perf_counter() - started)
+            )
+        return response
+
+    def record(self, request, response, elapsed, stats):
+        match = request.resolver_match
+        labels = (match.view_name if match else "unmatched", request.method)
+        REQUESTS.inc(labels + (str(response.status_code),))
+        REQUEST_DURATION.observe(labels, elapsed)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(labels, len(response.content))
+        if stats is None:
+            return
+        DB_QUERIES.observe(labels, stats.queries)
+        DB_DURATION.observe(labels, stats.timings["db"])
+        SERIALIZE_DURATION.observe(labels, stats.timings["serialize"])
+        OUTBOUND_DURATION.observe(labels, stats.timings["http"])
+        if self.server_timing:
+            ms = {name: seconds * 1000 for name, seconds in stats.timings.items()}
+            response["Server-Timing"] = (
+                f'db;dur={ms["db"]:.1f};desc="{stats.queries} queries", '
+                f'serialize;dur={ms["serialize"]:.1f}, http;dur={ms["http"]:.1f}, '
+                f"total;dur={elapsed * 1000:.1f}"
+            )
+        if self.slow_seconds is not None and elapsed >= self.slow_seconds:
+            statements = sorted(stats.statements, reverse=True)
+            logger.warning(
+                "Slow request %s %s took %.0fms, %d queries in %.0fms:\n%s",
+                request.method,
+                request.get_full_path(),
+                elapsed * 1000,
+                stats.queries,
+                stats.timings["db"] * 1000,
+                "\n".join(
+                    f"{seconds * 1000:8.2f}ms {alias} {sql}"
+                    for seconds, alias, sql in statements
+                ),
+            )
+        if self.repeat_threshold:
+            repeated = stats.repeated(self.repeat_threshold)
+            if repeated:
+                logger.warning(
+                    "%s %s repeated %d statements, likely N+1 queries:\n%s",
+                    request.method,
+                    request.get_full_path(),
+                    len(repeated),
+                    "\n".join(f"{count:5d}x {sql}" for count, sql in repeated),
+                )
+
+
+class OutboundMetric:
+    """Counters of core.http.HTTPClient per upstream host, read when scraped"""
+
+    def __init__(self, name, kind, documentation, field):
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.field = field
+
+    def samples(self):
+        # Imported here since core.http reports its timings through this module
+        from core.http import get_http_client
+
+        # Only a process that made outbound calls has a client
+        if not get_http_client.cache_info().currsize:
+            return
+        for host, counts in sorted(get_http_client().stats()["hosts"].items()):
+            value = counts[self.field]
+            if self.field == "circuit":
+                value = int(value != "closed")
+            yield self.name, format_labels(("host",), (host,)), value
+
+
+OUTBOUND_METRICS = (
+    OutboundMetric(
+        "outbound_requests_total", "counter", "Outbound calls made", "requests"
+    ),
+    OutboundMetric(
+        "outbound_failures_total",
+        "counter",
+        "Outbound calls failed or answered 5xx",
+        "failures",
+    ),
+    OutboundMetric(
+        "outbound_rejected_total",
+        "counter",
+        "Outbound calls shed by a full pool or an open circuit",
+        "rejected",
+    ),
+    OutboundMetric(
+        "outbound_circuit_open", "gauge", "Whether the circuit is not closed", "circuit"
+    ),
+)
+
+
+def metrics_view(request):
+    """Serves the metrics of this process to Prometheus"""
+    allowed = get_options()["METRICS_ALLOWED_IPS"]
+    # X-Forwarded-For only counts behind NUM_PROXIES, see client_ip()
+    if allowed and client_ip(request) not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(
+        REGISTRY.expose(OUTBOUND_METRICS),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
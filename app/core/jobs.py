@@ -0,0 +1,194 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def get_options():
+    options = getattr(settings, "JOBS", {})
+    return {
+        "POLL_INTERVAL": options.get("POLL_INTERVAL", 1.0),
+        "BATCH_SIZE": options.get("BATCH_SIZE", 20),
+        "LEASE": options.get("LEASE", 300),
+        "MAX_ATTEMPTS": options.get("MAX_ATTEMPTS", 5),
+        "RETRY_BACKOFF": options.get("RETRY_BACKOFF", 5),
+        "KEEP_DAYS": options.get("KEEP_DAYS", 7),
+        "SCHEDULE": options.get("SCHEDULE", {}),
+    }
+
+
+def task(func=None, *, max_attempts=None):
+    """Marks func as a task the job workers may run, see enqueue()
+
+    Tasks take JSON serializable arguments, handle their own transactions
+    and must be safe to run again: a worker that dies mid job leaves it to
+    be retried.
+    """
+
+    def decorate(func):
+        func.max_attempts = max_attempts
+        return func
+
+    return decorate if func is None else decorate(func)
+
+
+def task_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def enqueue(func, *args, key=None, delay=0, run_at=None, **kwargs):
+    """Queues the task func(*args, **kwargs) for the job workers
+
+    The job is inserted in the caller's transaction, so a rolled back
+    request queues nothing. While a job with the same key exists, it is
+    returned instead of queueing another.
+    """
+    if not hasattr(func, "max_attempts"):
+        raise TypeError(f"{task_name(func)} is not a task")
+    fields = {
+        "task": task_name(func),
+        "args": list(args),
+        "kwargs": kwargs,
+        "run_at": run_at or timezone.now() + timedelta(seconds=delay),
+        "max_attempts": func.max_attempts or get_options()["MAX_ATTEMPTS"],
+    }
+    if key is None:
+        return Job.objects.create(**fields)
+    return Job.objects.get_or_create(key=key, defaults=fields)[0]
+
+
+@task
+def prune_jobs(keep_days=None):
+    """Deletes jobs finished more than KEEP_DAYS ago, returning how many"""
+    if keep_days is None:
+        keep_days = get_options()["KEEP_DAYS"]
+    horizon = timezone.now() - timedelta(days=keep_days)
+    return Job.objects.filter(
+        status__in=[Job.DONE, Job.FAILED], finished_at__lt=horizon
+    ).delete()[0]
+
+
+class Worker:
+    """Runs due jobs from the database, retrying failed ones with backoff
+
+    Any number of workers may share the queue: a job is claimed with a
+    conditional UPDATE, so only one of them runs it.
+    """
+
+    def __init__(self, options=None):
+        self.options = options or get_options()
+        self.stopping = threading.Event()
+        # Last slot queued per schedule entry, saves a query per poll
+        self.scheduled = {}
+
+    def run(self):
+        while not self.stopping.is_set():
+            # Like the request cycle, drops broken or expired connections
+            close_old_connections()
+            self.enqueue_scheduled()
+            if not self.run_due():
+                self.stopping.wait(self.options["POLL_INTERVAL"])
+
+    def stop(self):
+        """Stops run() once the current job finishes"""
+        self.stopping.set()
+
+    def enqueue_scheduled(self, now=None):
+        """Queues the current run of every SCHEDULE entry, once across workers"""
+        now = now or timezone.now()
+        for name, entry in self.options["SCHEDULE"].items():
+            interval = entry["INTERVAL"]
+            slot = int(now.timestamp() // interval)
+            if self.scheduled.get(name) == slot:
+                continue
+            enqueue(
+                import_string(entry["TASK"]),
+                *entry.get("ARGS", ()),
+                key=f"schedule:{name}:{slot}",
+                run_at=now,
+                **entry.get("KWARGS", {}),
+            )
+            self.scheduled[name] = slot
+
+    def run_due(self, now=None):
+        """Runs up to BATCH_SIZE due jobs, returning how many ran
+
+        Each job is claimed at the time of the claim, not of the batch, so
+        jobs later in a batch get a full lease. now fixes that time instead.
+        """
+        clock = (lambda: now) if now else timezone.now
+
+        def due(now):
+            return Q(status=Job.PENDING, run_at__lte=now) | Q(
+                status=Job.RUNNING, locked_until__lt=now
+            )
+
+        ids = (
+            Job.objects.filter(due(clock()))
+            .order_by("run_at", "id")
+            .values_list("id", flat=True)
+        )
+        ran = 0
+        for job_id in ids[: self.options["BATCH_SIZE"]]:
+            if self.stopping.is_set():
+                break
+            claimed_at = clock()
+            lease = claimed_at + timedelta(seconds=self.options["LEASE"])
+            claimed = Job.objects.filter(due(claimed_at), pk=job_id).update(
+                status=Job.RUNNING, attempts=F("attempts") + 1, locked_until=lease
+            )
+            # Nothing updated when another worker claimed it first
+            if claimed:
+                self.run_job(Job.objects.get(pk=job_id))
+                ran += 1
+        return ran
+
+    def run_job(self, job):
+        try:
+            func = import_string(job.task)
+            if not hasattr(func, "max_attempts"):
+                raise TypeError(f"{job.task} is not a task")
+            func(*job.args, **job.kwargs)
+        except Exception as error:
+            job.last_error = repr(error)
+            if job.attempts >= job.max_attempts:
+                logger.exception("Job %s %s failed for good", job.pk, job.task)
+                self.finish(job, Job.FAILED)
+                return
+            logger.warning("Job %s %s failed, retrying: %r", job.pk, job.task, error)
+            backoff = self.options["RETRY_BACKOFF"] * 2 ** (job.attempts - 1)
+            self.leased(job).update(
+                status=Job.PENDING,
+                run_at=timezone.now() + timedelta(seconds=backoff),
+                locked_until=None,
+                last_error=job.last_error,
+            )
+            return
+        self.finish(job, Job.DONE)
+
+    def leased(self, job):
+        """The job while this worker holds its lease
+
+        Once the lease ran out and another worker claimed the job, updates
+        through it change nothing.
+        """
+        return Job.objects.filter(
+            pk=job.pk, status=Job.RUNNING, locked_until=job.locked_until
+        )
+
+    def finish(self, job, status):
+        self.leased(job).update(
+            status=status,
+            locked_until=None,
+            finished_at=timezone.now(),
+            last_error=job.last_error,
+        )
@@ -0,0 +1,89 @@
+import asyncio
+import itertools
+import time
+
+from core.benchmark import summarize
+
+# Seconds a request may take before the connection counts as failed
+REQUEST_TIMEOUT = 30
+
+
+async def read_response(reader):
+    """Returns (status, keep_alive) after reading one HTTP/1.1 response"""
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() != "close"
+
+
+async def connection(host, port, paths, deadline, latencies, statuses, errors):
+    """Sends requests over one keep-alive connection until deadline"""
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        path = next(paths)
+        request = (
+            f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+            "Accept: application/json\r\n\r\n"
+        ).encode()
+        begin = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            status, keep_alive = await asyncio.wait_for(
+                read_response(reader), REQUEST_TIMEOUT
+            )
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            errors.append(1)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        latencies.append((time.perf_counter() - begin) * 1000)
+        statuses[status] = statuses.get(status, 0) + 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(host, port, paths, concurrency, seconds):
+    """Keeps concurrency connections busy with GETs of paths for seconds
+
+    Returns the latency summary of summarize() with the count of every
+    response status and of failed connections added.
+    """
+    latencies, statuses, errors = [], {}, []
+    started = time.perf_counter()
+    deadline = started + seconds
+    await asyncio.gather(
+        *(
+            connection(
+                host,
+                port,
+                itertools.islice(itertools.cycle(paths), i, None),
+                deadline,
+                latencies,
+                statuses,
+                errors,
+            )
+            for i in range(concurrency)
+        )
+    )
+    result = summarize(latencies, time.perf_counter() - started)
+    result["statuses"] = statuses
+    result["errors"] = len(errors)
+    return result
@@ -0,0 +1,192 @@
+import itertools
+import json
+import os
+import platform
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import modify_settings
+
+from core.benchmark import benchmark_database, expect_status, format_result, measure
+from core.factories import create_application, create_products, create_users
+from core.models import ProductModel
+
+DEFAULT_BASELINE = os.path.join(settings.BASE_DIR, "benchmarks", "baseline.json")
+
+# Latency statistics compared with the baseline, lower is better
+COMPARED = ("p50", "p95")
+
+PASSWORD = "password"
+
+# Scenarios hashing a password, which is slow on purpose
+HASHING = ("user login", "user create")
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures every user and product endpoint on seeded data, writes the "
+        "results as JSON and fails on regressions against a baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument(
+            "--hashing-requests",
+            type=int,
+            default=20,
+            help="Requests of the scenarios hashing a password",
+        )
+        parser.add_argument("--warmup", type=int, default=10)
+        parser.add_argument(
+            "--scenario",
+            action="append",
+            dest="scenarios",
+            help="Only run this scenario (repeatable)",
+        )
+        parser.add_argument("--output", help="Write the results to this JSON file")
+        parser.add_argument(
+            "--baseline",
+            default=DEFAULT_BASELINE,
+            help="Results to compare with, skipped if the file does not exist",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Fail when a latency grows by more than this share of the baseline",
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        with benchmark_database(), modify_settings(
+            ALLOWED_HOSTS={"append": "testserver"}
+        ):
+            create_application()
+            create_users(options["users"], password=PASSWORD)
+            create_products(options["products"])
+            scenarios = self.get_scenarios(Client())
+            for name in options["scenarios"] or scenarios:
+                if name not in scenarios:
+                    raise CommandError(f"Unknown scenario {name}")
+                repeat = options["hashing_requests" if name in HASHING else "requests"]
+                results[name] = measure(scenarios[name], repeat, options["warmup"])
+                self.stdout.write(format_result(name, results[name]))
+
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": settings.DATABASES["default"]["ENGINE"],
+                "machine": platform.machine(),
+            },
+            "options": {
+                name: options[name]
+                for name in (
+                    "users",
+                    "products",
+                    "requests",
+                    "hashing_requests",
+                    "warmup",
+                )
+            },
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+                file.write("\n")
+
+        if os.path.exists(options["baseline"]):
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            failures = self.compare(results, baseline, options["threshold"])
+            if failures:
+                raise CommandError("; ".join(failures))
+
+    def get_scenarios(self, client):
+        """Returns the callables of every scenario by name"""
+        login = {"email": "user0@example.com", "password": PASSWORD}
+        response = expect_status(
+            client.post("/user/oauth/login/", login, content_type="application/json")
+        )
+        bearer = {"HTTP_AUTHORIZATION": f"Bearer {response.json()['access_token']}"}
+        ids = itertools.cycle(ProductModel.objects.values_list("id", flat=True)[:1000])
+        counter = itertools.count()
+
+        def create_user():
+            email = f"created{next(counter)}@example.com"
+            expect_status(
+                client.post(
+                    "/user/oauth/create/",
+                    {"email": email, "password": PASSWORD},
+                    content_type="application/json",
+                )
+            )
+
+        def create_product():
+            index = next(counter)
+            expect_status(
+                client.post(
+                    "/product/",
+                    {
+                        "code": f"B{index:09d}",
+                        "name": f"Bench {index}",
+                        "product_type": "car",
+                        "availability": True,
+                        "needing_repair": False,
+                        "durability": 100,
+                        "max_durability": 100,
+                        "mileage": 0,
+                        "price": 100,
+                        "minimum_rent_period": 1,
+                    },
+                    content_type="application/json",
+                ),
+                201,
+            )
+
+        return {
+            "user login": lambda: expect_status(
+                client.post(
+                    "/user/oauth/login/", login, content_type="application/json"
+                )
+            ),
+            "user create": create_user,
+            "user list": lambda: expect_status(client.get("/user/", **bearer)),
+            "product list": lambda: expect_status(client.get("/product/?page_size=50")),
+            "product detail": lambda: expect_status(
+                client.get(f"/product/{next(ids)}/")
+            ),
+            "product create": create_product,
+            "product update": lambda: expect_status(
+                client.patch(
+                    f"/product/{next(ids)}/",
+                    {"price": next(counter) % 1000 + 1},
+                    content_type="application/json",
+                )
+            ),
+        }
+
+    def compare(self, results, baseline, threshold):
+        """Prints the change of every result against baseline, returning regressions"""
+        failures = []
+        for name, result in results.items():
+            before = baseline.get("results", {}).get(name)
+            if not before:
+                continue
+            changes = []
+            for stat in COMPARED:
+                if not before[stat]:
+                    continue
+                change = result[stat] / before[stat] - 1
+                changes.append(f"{stat} {change:+.0%}")
+                if change > threshold:
+                    failures.append(
+                        f"{name} {stat} {result[stat]}ms, baseline {before[stat]}ms"
+                    )
+            self.stdout.write(f"{name:<32} vs baseline: {', '.join(changes)}")
+        return failures
@@ -0,0 +1,95 @@
+import asyncio
+import gc
+import time
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core.benchmark import benchmark_database, current_rss
+from core.factories import create_products
+
+MB = 1024 * 1024
+
+
+class Command(BaseCommand):
+    help = "Streams a product export and checks that memory stays bounded"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=5000000)
+        parser.add_argument("--output", choices=["ndjson", "csv"], default="ndjson")
+        parser.add_argument(
+            "--max-growth", type=int, default=64, help="Allowed RSS growth in MB"
+        )
+        parser.add_argument(
+            "--asgi", action="store_true", help="serve through the ASGI handler"
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write(f"Seeding {options['products']} products")
+            create_products(options["products"], batch_size=20000)
+            gc.collect()
+
+            path = "/product/export/"
+            query = f"output={options['output']}"
+            baseline = current_rss()
+            stats = {"peak": baseline, "size": 0, "rows": 0, "blocks": 0}
+
+            def record(block):
+                stats["size"] += len(block)
+                stats["rows"] += block.count(b"\n")
+                if stats["blocks"] % 10 == 0:
+                    stats["peak"] = max(stats["peak"], current_rss())
+                stats["blocks"] += 1
+
+            started = time.perf_counter()
+            if options["asgi"]:
+                asyncio.run(asgi_get(path, query, record))
+            else:
+                for block in Client().get(f"{path}?{query}").streaming_content:
+                    record(block)
+            elapsed = time.perf_counter() - started
+
+        growth = (stats["peak"] - baseline) / MB
+        rows = stats["rows"]
+        self.stdout.write(
+            f"exported {rows} lines, {stats['size'] / MB:.1f} MB in {elapsed:.1f}s "
+            f"({rows / elapsed:.0f} rows/s) in {stats['blocks']} blocks, "
+            f"RSS growth {growth:.1f} MB"
+        )
+        if growth > options["max_growth"]:
+            raise CommandError(
+                f"RSS grew by {growth:.1f} MB, over the {options['max_growth']} MB bound"
+            )
+
+
+async def asgi_get(path, query, on_block):
+    """GETs path through Django's ASGI handler, passing on each body block"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client stays connected until the handler is done
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            on_block(message.get("body", b""))
+
+    await get_asgi_application()(scope, receive, send)
@@ -0,0 +1,162 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.benchmark import benchmark_database, format_result
+from core.factories import create_products
+from core.loadtest import run_load
+from core.models import ProductModel
+
+HOST = "127.0.0.1"
+
+# Keeps the product budget out of the way of a single load generating address
+UNTHROTTLED = {"THROTTLE_PRODUCT_IP_RATE": "1000000000/s"}
+
+
+def wsgi_server(port, options):
+    return [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "app.wsgi:application",
+        f"--bind={HOST}:{port}",
+        f"--workers={options['workers']}",
+        "--worker-class=gthread",
+        f"--threads={options['threads']}",
+        f"--backlog={options['concurrency'] * 2}",
+        "--log-level=warning",
+    ], {"ASYNC_VIEWS": "False"}
+
+
+def asgi_server(port, options):
+    return [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app.asgi:application",
+        f"--host={HOST}",
+        f"--port={port}",
+        f"--workers={options['workers']}",
+        f"--backlog={options['concurrency'] * 2}",
+        "--no-access-log",
+        "--log-level=warning",
+    ], {"ASYNC_VIEWS": "True"}
+
+
+SERVERS = {"wsgi": wsgi_server, "asgi": asgi_server}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_serving(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited with {process.returncode}")
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"Server did not listen on port {port} in {timeout}s")
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the throughput of the sync views under gunicorn (WSGI) with "
+        "the async views under uvicorn (ASGI) at many concurrent connections"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=1000)
+        parser.add_argument("--seconds", type=float, default=10.0)
+        parser.add_argument("--warmup", type=float, default=2.0)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--threads", type=int, default=32, help="per WSGI worker")
+        parser.add_argument("--products", type=int, default=10000)
+        parser.add_argument(
+            "--path",
+            action="append",
+            dest="paths",
+            help="GET path, {id} is replaced by product ids (repeatable)",
+        )
+        parser.add_argument(
+            "--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS)
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        test_name = os.path.join(directory, "load.sqlite3")
+        results = {}
+        with benchmark_database(test_name=test_name):
+            create_products(options["products"])
+            # Throwaway copy created by benchmark_database, which the servers share
+            database = connection.settings_dict["NAME"]
+            connection.close()
+            paths = self.get_paths(options["paths"])
+            for name in options["servers"]:
+                results[name] = result = self.run(name, database, paths, options)
+                statuses = ", ".join(
+                    f"{status}: {count}"
+                    for status, count in sorted(result["statuses"].items())
+                )
+                self.stdout.write(
+                    format_result(
+                        f"{name} ({options['concurrency']} connections)", result
+                    )
+                    + f" failed={result['errors']} statuses=({statuses})"
+                )
+        os.rmdir(directory)
+
+        failures = [
+            f"{name} answered {count} requests with {status}"
+            for name, result in results.items()
+            for status, count in result["statuses"].items()
+            if status != 200
+        ]
+        if failures:
+            raise CommandError("; ".join(failures))
+        if "wsgi" in results and "asgi" in results and results["wsgi"]["rps"]:
+            gain = results["asgi"]["rps"] / results["wsgi"]["rps"]
+            self.stdout.write(f"asgi: {gain:.2f}x the requests per second of wsgi")
+
+    def get_paths(self, paths):
+        paths = paths or ["/product/?page_size=20", "/product/{id}/"]
+        ids = list(ProductModel.objects.values_list("id", flat=True)[:1000])
+        return [path.replace("{id}", str(pk)) for pk in ids for path in paths]
+
+    def run(self, name, database, paths, options):
+        """Starts one server, loads it for warmup plus seconds and stops it"""
+        port = free_port()
+        command, env = SERVERS[name](port, options)
+        env = {
+            **os.environ,
+            **UNTHROTTLED,
+            **env,
+            "DB_NAME": database,
+            "DJANGO_ALLOWED_HOSTS": " ".join([*settings.ALLOWED_HOSTS, HOST]),
+        }
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+        try:
+            wait_until_serving(port, process)
+            concurrency = options["concurrency"]
+            if options["warmup"]:
+                asyncio.run(run_load(HOST, port, paths, concurrency, options["warmup"]))
+            return asyncio.run(
+                run_load(HOST, port, paths, concurrency, options["seconds"])
+            )
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
@@ -0,0 +1,104 @@
+import requests
+from decouple import config
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, RequestFactory
+from django.test.testcases import LiveServerThread
+from django.test.utils import modify_settings
+from oauth2_provider.models import Application
+
+from core.benchmark import benchmark_database, expect_status, format_result, measure
+from core.http import get_http_client
+from core.models import User
+from user.oauth import issue_token
+
+EMAIL = "bench@example.com"
+PASSWORD = "bench-password"
+
+
+class Command(BaseCommand):
+    help = "Measures login latency with loopback and in-process token issuance"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--warmup", type=int, default=5)
+
+    def handle(self, *args, **options):
+        repeat, warmup = options["requests"], options["warmup"]
+        with benchmark_database():
+            Application.objects.create(
+                name="bench",
+                client_id=config("CLIENT_ID"),
+                client_secret=config("CLIENT_SECRET"),
+                client_type=Application.CLIENT_CONFIDENTIAL,
+                authorization_grant_type=Application.GRANT_PASSWORD,
+            )
+            User.objects.create_user(EMAIL, PASSWORD)
+            token_data = {
+                "grant_type": "password",
+                "username": EMAIL,
+                "password": PASSWORD,
+                "client_id": config("CLIENT_ID"),
+                "client_secret": config("CLIENT_SECRET"),
+            }
+
+            # Before: the token endpoint of a live server over a fresh connection
+            connection = connections["default"]
+            connection.inc_thread_sharing()
+            server = LiveServerThread(
+                "localhost", lambda handler: handler, {"default": connection}
+            )
+            server.daemon = True
+            server.start()
+            server.is_ready.wait()
+            try:
+                url = f"http://localhost:{server.port}/user/oauth/token/"
+                with modify_settings(ALLOWED_HOSTS={"append": "localhost"}):
+                    loopback = measure(
+                        lambda: expect_status(
+                            requests.post(url, json=token_data, timeout=120)
+                        ),
+                        repeat,
+                        warmup,
+                    )
+                    # The same endpoint over pooled keep-alive connections
+                    pooled = measure(
+                        lambda: expect_status(
+                            get_http_client().post(url, json=token_data)
+                        ),
+                        repeat,
+                        warmup,
+                    )
+                    http_stats = get_http_client().stats()
+                    # Kept alive connections would outlive the server
+                    get_http_client().session.close()
+            finally:
+                server.terminate()
+                connection.dec_thread_sharing()
+
+            # After: the token minted inside the calling request
+            request = RequestFactory().post("/user/oauth/login/")
+            in_process = measure(
+                lambda: expect_status(issue_token(request, EMAIL, PASSWORD)[1]),
+                repeat,
+                warmup,
+            )
+
+            client = Client()
+            login = measure(
+                lambda: expect_status(
+                    client.post(
+                        "/user/oauth/login/",
+                        {"email": EMAIL, "password": PASSWORD},
+                        content_type="application/json",
+                    )
+                ),
+                repeat,
+                warmup,
+            )
+
+        self.stdout.write(format_result("token (loopback HTTP)", loopback))
+        self.stdout.write(format_result("token (pooled HTTP)", pooled))
+        self.stdout.write(f"http client: {http_stats}")
+        self.stdout.write(format_result("token (in-process)", in_process))
+        self.stdout.write(format_result("login view", login))
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from unittest import mock
+
+from django.contrib.auth import aauthenticate
+from django.contrib.auth.hashers import get_hasher, get_hashers, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import modify_settings
+
+from core.benchmark import benchmark_database, expect_status, format_result, measure
+from core.factories import create_application
+from core.hashers import get_options
+from core.models import User
+
+EMAIL = "hashing@example.com"
+PASSWORD = "hashing-password"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures every password hasher and logins per second per core, and "
+        "checks that a login hashes once and rehashes outdated passwords"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20)
+        parser.add_argument(
+            "--concurrency", type=int, default=8, help="async logins at once"
+        )
+        parser.add_argument(
+            "--max-stall",
+            type=float,
+            default=20.0,
+            help="Fail when the event loop waits longer during async logins (ms)",
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+        for hasher in get_hashers():
+            try:
+                encoded = make_password(PASSWORD, hasher=hasher.algorithm)
+            except ValueError as error:
+                self.stdout.write(f"{hasher.algorithm}: skipped, {error}")
+                continue
+            result = measure(lambda: hasher.verify(PASSWORD, encoded), 5, 1)
+            self.stdout.write(format_result(f"{hasher.algorithm} verify", result))
+
+        with benchmark_database(), modify_settings(
+            ALLOWED_HOSTS={"append": "testserver"}
+        ):
+            create_application()
+            User.objects.create_user(EMAIL, PASSWORD)
+            failures += self.check_logins(options["requests"])
+            failures += self.check_rehash()
+            failures += asyncio.run(
+                self.check_event_loop(options["concurrency"], options["max_stall"])
+            )
+        if failures:
+            raise CommandError("; ".join(failures))
+
+    def check_logins(self, repeat):
+        """Measures logins and counts the hashes verified per login"""
+        client = Client()
+        hasher_class = type(get_hasher())
+        verify = hasher_class.verify
+        calls = []
+
+        def counting_verify(hasher, password, encoded):
+            calls.append(encoded)
+            return verify(hasher, password, encoded)
+
+        def login():
+            return expect_status(
+                client.post(
+                    "/user/oauth/login/",
+                    {"email": EMAIL, "password": PASSWORD},
+                    content_type="application/json",
+                )
+            )
+
+        # The first login also verifies the client secret, which is remembered
+        login()
+        with mock.patch.object(hasher_class, "verify", counting_verify):
+            result = measure(login, repeat)
+        self.stdout.write(format_result("login", result))
+        # Single threaded, so one core's worth of logins
+        self.stdout.write(f"logins per core per second: {result['rps']}")
+        per_login = len(calls) / repeat
+        self.stdout.write(f"hashes verified per login: {per_login:g}")
+        if per_login != 1:
+            return [f"a login verified {per_login:g} hashes"]
+        return []
+
+    def check_rehash(self):
+        """Logs in a user with an outdated hash, which must be replaced"""
+        outdated = [
+            hasher.algorithm
+            for hasher in get_hashers()[1:]
+            if hasher.algorithm == "pbkdf2_sha256"
+        ]
+        if not outdated:
+            return []
+        user = User.objects.create_user("rehash@example.com")
+        user.password = make_password(PASSWORD, hasher=outdated[0])
+        user.save(update_fields=["password"])
+        expect_status(
+            Client().post(
+                "/user/oauth/login/",
+                {"email": user.email, "password": PASSWORD},
+                content_type="application/json",
+            )
+        )
+        user.refresh_from_db()
+        algorithm = user.password.split("$", 1)[0]
+        self.stdout.write(f"{outdated[0]} hash after login: {algorithm}")
+        if algorithm != get_hasher().algorithm:
+            return [f"an {outdated[0]} hash was not replaced on login"]
+        return []
+
+    async def check_event_loop(self, concurrency, max_stall):
+        """Returns failures if async logins keep the event loop from running"""
+        ticks = []
+        done = asyncio.Event()
+
+        async def tick():
+            while not done.is_set():
+                started = time.perf_counter()
+                await asyncio.sleep(0.001)
+                ticks.append((time.perf_counter() - started) * 1000)
+
+        async def logins():
+            started = time.perf_counter()
+            users = await asyncio.gather(
+                *(
+                    aauthenticate(username=EMAIL, password=PASSWORD)
+                    for _ in range(concurrency)
+                )
+            )
+            elapsed = time.perf_counter() - started
+            done.set()
+            return users, elapsed
+
+        ticker = asyncio.create_task(tick())
+        users, elapsed = await logins()
+        await ticker
+        stall = max(ticks, default=0)
+        workers = get_options()["WORKERS"]
+        self.stdout.write(
+            f"{concurrency} async logins on {workers} hashing threads: "
+            f"{concurrency / elapsed:.1f}/s, longest event loop stall {stall:.1f}ms"
+        )
+        failures = []
+        if not all(users):
+            failures.append("an async login failed")
+        # A single hash would block the loop for its whole duration
+        if stall > max_stall:
+            failures.append(f"async logins stalled the event loop for {stall:.1f}ms")
+        return failures
@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core.benchmark import benchmark_database, expect_status, format_result, measure
+from core.factories import create_products
+from core.models import ProductModel
+from product.pagination import KeysetPagination
+
+
+class Command(BaseCommand):
+    help = "Seeds products and checks that list page latency is flat at any depth"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000000)
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--page-size", type=int, default=50)
+        parser.add_argument(
+            "--max-ratio",
+            type=float,
+            default=3.0,
+            help="Fail when a deep page p50 exceeds the first page p50 by this factor",
+        )
+
+    def handle(self, *args, **options):
+        count, repeat = options["products"], options["requests"]
+        page_size = options["page_size"]
+        with benchmark_database():
+            self.stdout.write(f"Seeding {count} products")
+            create_products(count)
+            client = Client()
+            paginator = KeysetPagination()
+            ordered = ProductModel.objects.order_by("-updated_at", "-id")
+
+            results = {}
+            for depth in (0.0, 0.5, 0.99):
+                url = f"/product/?page_size={page_size}"
+                offset = int(count * depth)
+                if offset:
+                    row = ordered.values("updated_at", "id")[offset]
+                    cursor = paginator.encode_cursor(
+                        (row["updated_at"], row["id"]), reverse=False
+                    )
+                    url += f"&cursor={cursor}"
+                results[depth] = measure(
+                    lambda: expect_status(client.get(url)), repeat, warmup=3
+                )
+                self.stdout.write(format_result(f"page at {depth:.0%}", results[depth]))
+
+            filtered = measure(
+                lambda: expect_status(
+                    client.get(
+                        f"/product/?page_size={page_size}&product_type=car"
+                        "&availability=true&price_max=500"
+                    )
+                ),
+                repeat,
+                warmup=3,
+            )
+            self.stdout.write(format_result("filtered first page", filtered))
+
+        first = results[0.0]["p50"]
+        for depth, result in results.items():
+            if first and result["p50"] > first * options["max_ratio"]:
+                raise CommandError(
+                    f"Page at {depth:.0%} is {result['p50'] / first:.1f}x slower "
+                    "than the first page"
+                )
@@ -0,0 +1,53 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core.benchmark import benchmark_database, expect_status, format_result, measure
+from core.factories import create_products
+from core.models import ProductModel
+from product.pricing import fetch_columns, quote
+
+
+class Command(BaseCommand):
+    help = "Measures batch rental quotes over many products"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=50000)
+        parser.add_argument("--requests", type=int, default=20)
+        parser.add_argument(
+            "--budget", type=float, default=200.0, help="Maximum engine p50 in ms"
+        )
+
+    def handle(self, *args, **options):
+        repeat = options["requests"]
+        start, end = datetime.date(2030, 1, 1), datetime.date(2030, 1, 11)
+        with benchmark_database():
+            create_products(options["products"])
+            queryset = ProductModel.objects.all()
+            columns = fetch_columns(queryset)
+
+            engine = measure(lambda: quote(columns, start, end), repeat, 2)
+            fetched = measure(
+                lambda: quote(fetch_columns(queryset), start, end), repeat, 2
+            )
+            client = Client()
+            endpoint = measure(
+                lambda: expect_status(
+                    client.post(
+                        "/product/quote/",
+                        {"start_date": str(start), "end_date": str(end)},
+                        content_type="application/json",
+                    )
+                ),
+                repeat,
+                2,
+            )
+
+        self.stdout.write(format_result("quote engine", engine))
+        self.stdout.write(format_result("quote engine + fetch", fetched))
+        self.stdout.write(format_result("quote endpoint", endpoint))
+        if engine["p50"] > options["budget"]:
+            raise CommandError(
+                f"Quoting took {engine['p50']}ms, over the {options['budget']}ms budget"
+            )
@@ -0,0 +1,64 @@
+import datetime
+import itertools
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from core.benchmark import benchmark_database, expect_status, format_result, measure
+from core.factories import create_products, create_rentals
+
+
+class Command(BaseCommand):
+    help = "Seeds products and bookings and measures availability queries"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=100000)
+        parser.add_argument("--rentals", type=int, default=1000000)
+        parser.add_argument("--requests", type=int, default=50)
+
+    def handle(self, *args, **options):
+        repeat = options["requests"]
+        with benchmark_database():
+            self.stdout.write(
+                f"Seeding {options['products']} products and {options['rentals']} rentals"
+            )
+            create_products(options["products"])
+            create_rentals(options["rentals"])
+            client = Client()
+
+            for label, start, days in (
+                ("availability, busy period", datetime.date(2022, 3, 1), 7),
+                ("availability, future", datetime.date(2035, 1, 1), 14),
+            ):
+                end = start + datetime.timedelta(days=days)
+                url = (
+                    f"/product/availability/?product_type=car"
+                    f"&start_date={start}&end_date={end}"
+                )
+                with CaptureQueriesContext(connection) as queries:
+                    expect_status(client.get(url))
+                query_count = len(queries)
+                result = measure(lambda: expect_status(client.get(url)), repeat, 3)
+                self.stdout.write(
+                    format_result(label, result) + f" queries={query_count}"
+                )
+
+            months = itertools.count()
+
+            def book():
+                start = datetime.date(2040, 1, 1) + datetime.timedelta(
+                    days=30 * next(months)
+                )
+                end = start + datetime.timedelta(days=10)
+                data = {"product": 1, "start_date": str(start), "end_date": str(end)}
+                expect_status(
+                    client.post(
+                        "/product/rentals/", data, content_type="application/json"
+                    ),
+                    201,
+                )
+
+            booking = measure(book, repeat, 3)
+            self.stdout.write(format_result("booking", booking))
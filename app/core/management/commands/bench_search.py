@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import modify_settings
+from rest_framework.test import APIClient
+
+from core.benchmark import benchmark_database, expect_status, format_result, measure
+from core.factories import create_products
+from core.models import ProductModel, User
+from product.search import get_search_index
+
+
+def get_queries(product):
+    """Returns common kinds of lookups, partly aimed at one product"""
+    return {
+        "word": "falcon",
+        "prefix": "fal",
+        "typo": "flacon",
+        "code": product.code,
+        "code prefix": product.code[:-1],
+        "name": product.name,
+        "typos": "falcn trcuk",
+    }
+
+
+class Command(BaseCommand):
+    help = "Measures product search latency over a large catalogue"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000000)
+        parser.add_argument("--requests", type=int, default=50)
+        parser.add_argument("--budget", type=float, default=50.0, help="p95 in ms")
+
+    def handle(self, *args, **options):
+        repeat, budget = options["requests"], options["budget"]
+        failures = []
+        with benchmark_database(), modify_settings(
+            ALLOWED_HOSTS={"append": "testserver"}
+        ):
+            create_products(options["products"])
+            client = APIClient()
+            client.force_authenticate(User.objects.create_user("bench@example.com"))
+
+            index = get_search_index()
+            build = measure(index.build, 1)
+            self.stdout.write(format_result("build index", build))
+
+            middle = ProductModel.objects.order_by("id")[options["products"] // 2]
+            for label, query in get_queries(middle).items():
+                response = client.get("/product/search/", {"q": query})
+                expect_status(response)
+                results = response.json()["results"]
+                result = measure(
+                    lambda: expect_status(client.get("/product/search/", {"q": query})),
+                    repeat,
+                    1,
+                )
+                self.stdout.write(format_result(f"{label} {query!r}", result))
+                self.stdout.write(
+                    f"  {len(results)} results, first: "
+                    f"{results[0]['code'] + ' ' + results[0]['name'] if results else '-'}"
+                )
+                if not results:
+                    failures.append(f"{query!r} found nothing")
+                if result["p95"] > budget:
+                    failures.append(f"{query!r} p95 {result['p95']}ms > {budget}ms")
+
+        if failures:
+            raise CommandError("; ".join(failures))
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmark import benchmark_database, format_result, measure
+from core.factories import create_products, create_users
+from core.models import ProductModel, User
+from core.serialization import ValuesSerializer
+from product.serializers import ProductSerializer
+from user.serializers import UserSerializer
+
+
+class Command(BaseCommand):
+    help = "Checks that ValuesSerializer output matches DRF and measures the speedup"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10000)
+        parser.add_argument("--requests", type=int, default=10)
+        parser.add_argument("--min-speedup", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["requests"]
+        failures = []
+        with benchmark_database():
+            create_products(rows)
+            create_users(rows)
+            # Fill the nullable columns of half the rows as well
+            creator = User.objects.first()
+            User.objects.filter(id__lte=rows // 2).update(created_by=creator)
+            ProductModel.objects.filter(id__lte=rows // 2).update(
+                created_by=creator, mileage=None
+            )
+
+            for name, serializer_class, queryset in (
+                ("products", ProductSerializer, ProductModel.objects.order_by("id")),
+                ("users", UserSerializer, User.objects.order_by("id")),
+            ):
+                failures.extend(
+                    self.compare(name, serializer_class, queryset, repeat, options)
+                )
+
+        if failures:
+            raise CommandError("; ".join(failures))
+
+    def compare(self, name, serializer_class, queryset, repeat, options):
+        render = JSONRenderer().render
+        values_serializer = ValuesSerializer(serializer_class)
+        expected = render(serializer_class(queryset, many=True).data)
+        if render(values_serializer.data(queryset)) != expected:
+            return [f"{name}: output differs from {serializer_class.__name__}"]
+
+        # Serialization alone, on rows that were already fetched
+        instances = list(queryset)
+        values = list(queryset.values_list(*values_serializer.sources))
+        names = values_serializer.names
+        drf = measure(
+            lambda: render(serializer_class(instances, many=True).data), repeat, 1
+        )
+        fast = measure(
+            lambda: render(
+                [dict(zip(names, row)) for row in values_serializer.convert(values)]
+            ),
+            repeat,
+            1,
+        )
+        # Whole list responses, fetching included
+        drf_total = measure(
+            lambda: render(serializer_class(queryset.all(), many=True).data),
+            repeat,
+            1,
+        )
+        fast_total = measure(
+            lambda: render(values_serializer.data(queryset.all())), repeat, 1
+        )
+
+        for label, result in (
+            ("ModelSerializer", drf),
+            ("ValuesSerializer", fast),
+            ("ModelSerializer+query", drf_total),
+            ("ValuesSerializer+query", fast_total),
+        ):
+            self.stdout.write(format_result(f"{name} {label}", result))
+        speedup = drf["p50"] / fast["p50"]
+        self.stdout.write(
+            f"{name}: identical output, serialization {speedup:.1f}x faster, "
+            f"with the query {drf_total['p50'] / fast_total['p50']:.1f}x faster"
+        )
+        if speedup < options["min_speedup"]:
+            return [f"{name} serialization is only {speedup:.1f}x faster"]
+        return []
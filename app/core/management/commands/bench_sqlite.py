@@ -0,0 +1,126 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test.utils import override_settings
+
+from core.benchmark import benchmark_database, format_result, summarize
+from core.factories import create_products, create_users
+from core.models import ProductModel, User
+from core.serialization import ValuesSerializer
+from product.serializers import ProductSerializer
+
+# SQLite's own defaults: rollback journal, synchronous=FULL, deferred
+# transactions and the 5 second timeout of Python's sqlite3 module
+DEFAULTS = {"pragmas": {}, "transaction_mode": None}
+
+
+class Command(BaseCommand):
+    help = "Compares mixed product reads and login writes on default and tuned SQLite"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument("--write-share", type=float, default=0.2)
+        parser.add_argument("--products", type=int, default=20000)
+        parser.add_argument("--min-gain", type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The default database is not SQLite")
+        tuned = {
+            "pragmas": getattr(settings, "SQLITE_PRAGMAS", {}),
+            "transaction_mode": connection.settings_dict["OPTIONS"].get(
+                "transaction_mode"
+            ),
+        }
+        directory = tempfile.mkdtemp()
+        try:
+            results = {
+                label: self.run(config, os.path.join(directory, label), options)
+                for label, config in (("default", DEFAULTS), ("tuned", tuned))
+            }
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        gain = results["tuned"] / results["default"] if results["default"] else 0
+        self.stdout.write(f"tuned SQLite: {gain:.1f}x the operations per second")
+        if gain < options["min_gain"]:
+            raise CommandError(f"Only {gain:.1f}x, expected {options['min_gain']}x")
+
+    def run(self, config, path, options):
+        """Returns successful operations per second with one configuration"""
+        saved_options = connection.settings_dict["OPTIONS"].copy()
+        connection.settings_dict["OPTIONS"]["transaction_mode"] = config[
+            "transaction_mode"
+        ]
+        try:
+            with override_settings(SQLITE_PRAGMAS=config["pragmas"]):
+                with benchmark_database(test_name=path):
+                    create_products(options["products"])
+                    create_users(100)
+                    return self.load(path, options)
+        finally:
+            connection.settings_dict["OPTIONS"] = saved_options
+
+    def load(self, path, options):
+        user_ids = list(User.objects.values_list("id", flat=True))
+        values_serializer = ValuesSerializer(ProductSerializer)
+        queryset = ProductModel.objects.order_by("-updated_at", "-id")
+        reads, writes, errors = [], [], []
+        deadline = time.perf_counter() + options["seconds"]
+
+        def read():
+            values_serializer.data(queryset[:50])
+
+        def write(rng):
+            # What a login does: look the user up and save it, then issue
+            # a token inside a transaction
+            with transaction.atomic():
+                user = User.objects.get(pk=rng.choice(user_ids))
+                user.is_active = True
+                user.save()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                while time.perf_counter() < deadline:
+                    is_write = rng.random() < options["write_share"]
+                    begin = time.perf_counter()
+                    try:
+                        if is_write:
+                            write(rng)
+                        else:
+                            read()
+                    except OperationalError:
+                        errors.append(1)
+                        continue
+                    elapsed = (time.perf_counter() - begin) * 1000
+                    (writes if is_write else reads).append(elapsed)
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker, args=(seed,))
+            for seed in range(options["threads"])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        name = os.path.basename(path)
+        for kind, samples in (("reads", reads), ("writes", writes)):
+            self.stdout.write(
+                format_result(f"{name} {kind}", summarize(samples, elapsed))
+            )
+        self.stdout.write(f"{name} errors: {len(errors)} database is locked")
+        return (len(reads) + len(writes)) / elapsed
@@ -0,0 +1,164 @@
+import time
+
+from django.contrib.auth.signals import user_login_failed
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.test.utils import modify_settings, override_settings
+
+from core.benchmark import benchmark_database, expect_status
+from core.throttling import ThrottleMiddleware
+
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "throttle": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "throttle",
+    },
+}
+
+
+def throttling(rate, email_rate, shared_cache=None):
+    return {
+        "SHARED_CACHE": shared_cache,
+        "BUDGETS": {
+            "oauth": {
+                "PATHS": ["/user/oauth/"],
+                "RATES": {"ip": rate, "email": email_rate},
+            },
+            "product": {"PATHS": ["/product/"], "RATES": {"ip": rate}},
+        },
+    }
+
+
+def view(request):
+    return HttpResponse()
+
+
+def product_request(i):
+    return RequestFactory().get(
+        "/product/", REMOTE_ADDR=f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"
+    )
+
+
+def login_request(i):
+    return RequestFactory().post(
+        "/user/oauth/login/",
+        {"email": f"user{i}@example.com", "password": "secret"},
+        content_type="application/json",
+        REMOTE_ADDR="10.0.0.1",
+    )
+
+
+class Command(BaseCommand):
+    help = "Checks the throttle budgets and measures their overhead per request"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=10000)
+        parser.add_argument("--budget", type=float, default=100.0, help="µs")
+
+    def handle(self, *args, **options):
+        failures = []
+        with benchmark_database(), override_settings(CACHES=CACHES), modify_settings(
+            ALLOWED_HOSTS={"append": "testserver"}
+        ):
+            failures += self.check_login_budget()
+            failures += self.check_forwarded_for()
+            for shared_cache in (None, "throttle"):
+                failures += self.measure_overhead(shared_cache, options)
+        if failures:
+            raise CommandError("; ".join(failures))
+
+    def check_login_budget(self):
+        """Spends the email budget from many addresses and counts password checks"""
+        checks = []
+        user_login_failed.connect(lambda **kwargs: checks.append(1), weak=False)
+        with override_settings(THROTTLING=throttling("1000/min", "5/min")):
+            client = Client()
+            statuses = []
+            for i in range(8):
+                response = client.post(
+                    "/user/oauth/login/",
+                    {"email": "victim@example.com", "password": "guess"},
+                    content_type="application/json",
+                    REMOTE_ADDR=f"10.0.0.{i}",
+                )
+                statuses.append(response.status_code)
+            expect_status(response, 429)
+        self.stdout.write(
+            f"login attempts: {statuses}, password checks: {len(checks)}, "
+            f"Retry-After: {response['Retry-After']}s"
+        )
+        if len(checks) != 5:
+            return [f"{len(checks)} password checks ran for a budget of 5"]
+        return []
+
+    def check_forwarded_for(self):
+        """Rotates X-Forwarded-For, which must not reset the ip budget"""
+        failures = []
+        cases = [
+            # Direct clients, the header is the client's own
+            (None, lambda i: f"198.51.100.{i}"),
+            # Behind one proxy, which appended the client's address
+            (1, lambda i: f"198.51.100.{i}, 10.0.0.1"),
+        ]
+        for num_proxies, forwarded_for in cases:
+            with override_settings(
+                THROTTLING=throttling("10/min", "1000/min"),
+                REST_FRAMEWORK={"NUM_PROXIES": num_proxies},
+            ):
+                middleware = ThrottleMiddleware(view)
+                throttled = 0
+                for i in range(20):
+                    request = login_request(i)
+                    request.META["HTTP_X_FORWARDED_FOR"] = forwarded_for(i)
+                    throttled += middleware(request).status_code == 429
+            self.stdout.write(
+                f"rotating X-Forwarded-For, NUM_PROXIES={num_proxies}: "
+                f"{throttled} of 20 logins throttled"
+            )
+            if throttled != 10:
+                failures.append(
+                    f"rotating X-Forwarded-For with NUM_PROXIES={num_proxies} "
+                    f"left {20 - throttled} logins through a budget of 10"
+                )
+        return failures
+
+    def measure_overhead(self, shared_cache, options):
+        """Times ThrottleMiddleware around a view that does nothing
+
+        Like timeit, the best of a few rounds is kept, slower rounds
+        measure other load on the machine.
+        """
+        failures = []
+        store = shared_cache or "local"
+        with override_settings(
+            THROTTLING=throttling("100000000/s", "1000/min", shared_cache)
+        ):
+            middleware = ThrottleMiddleware(view)
+            for label, build in (
+                ("product ip", product_request),
+                ("oauth ip+email", login_request),
+            ):
+                overhead = min(
+                    self.time_round(middleware, build, options["requests"], offset)
+                    for offset in range(0, 5 * options["requests"], options["requests"])
+                )
+                self.stdout.write(
+                    f"{label:<16} {store:<10} {overhead:.1f}µs per request"
+                )
+                if overhead > options["budget"]:
+                    failures.append(f"{label} on {store} takes {overhead:.1f}µs")
+        return failures
+
+    def time_round(self, middleware, build, repeat, offset):
+        """Returns the µs middleware adds to each of repeat fresh requests"""
+        requests = [build(offset + i) for i in range(repeat)]
+        started = time.perf_counter()
+        for request in requests:
+            view(request)
+        baseline = time.perf_counter() - started
+        started = time.perf_counter()
+        for request in requests:
+            expect_status(middleware(request))
+        return (time.perf_counter() - started - baseline) / repeat * 1e6
@@ -0,0 +1,48 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import resolve, reverse
+
+from core.schema import build_schema, current_fingerprint, read_schema_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the OpenAPI schema to OPENAPI_SCHEMA['FILE'], run at build or "
+        "deploy time so the schema views do not introspect the API per request"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="defaults to OPENAPI_SCHEMA['FILE']")
+        parser.add_argument("--url-name", default="schema-json")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="only fail if the file differs from the schema the API has now",
+        )
+
+    def handle(self, *args, **options):
+        path = options["output"] or settings.OPENAPI_SCHEMA["FILE"]
+        view_class = resolve(reverse(options["url_name"])).func.cls
+        started = time.perf_counter()
+        content = build_schema(view_class)
+        elapsed = (time.perf_counter() - started) * 1000
+        if options["check"]:
+            # Serializer, field and docstring changes leave the URLs as they
+            # are, so only the whole schema tells whether the file is current
+            if read_schema_file(path, current_fingerprint()) != content:
+                raise CommandError(f"{path} is missing or out of date")
+            self.stdout.write(f"{path} is up to date")
+            return
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Swapped in whole, so a running server never reads half a file
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as file:
+            file.write(content)
+        os.replace(temporary, path)
+        self.stdout.write(f"Wrote {len(content)} bytes to {path} in {elapsed:.0f}ms")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from product.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Deletes product tombstones older than the change feed retention"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, help='defaults to PRODUCT_CHANGES["RETENTION_DAYS"]'
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options["days"])
+        self.stdout.write(f"Deleted {deleted} tombstones")
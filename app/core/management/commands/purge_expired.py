@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from user.cleanup import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Deletes expired tokens, grants and sessions in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, help='defaults to EXPIRED_CLEANUP["BATCH_SIZE"]'
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            help='seconds between batches, defaults to EXPIRED_CLEANUP["PAUSE"]',
+        )
+
+    def handle(self, *args, **options):
+        deleted = purge_expired(options["batch_size"], options["pause"])
+        for label, count in deleted.items():
+            self.stdout.write(f"Deleted {count} {label}")
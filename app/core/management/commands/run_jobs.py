@@ -0,0 +1,29 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs queued jobs until stopped, see core.jobs. Start as many as "
+        "needed, they share the queue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once", action="store_true", help="run the due jobs and exit"
+        )
+
+    def handle(self, *args, **options):
+        worker = Worker()
+        if options["once"]:
+            worker.enqueue_scheduled()
+            while worker.run_due():
+                pass
+            return
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: worker.stop())
+        self.stdout.write("Running jobs, stop with CTRL-C")
+        worker.run()
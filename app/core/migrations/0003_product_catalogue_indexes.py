@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_auto_20220205_1732'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productmodel',
+            index=models.Index(fields=['updated_at', 'id'], name='product_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productmodel',
+            index=models.Index(fields=['product_type', 'updated_at', 'id'], name='product_type_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productmodel',
+            index=models.Index(fields=['availability', 'needing_repair', 'updated_at', 'id'], name='product_state_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productmodel',
+            index=models.Index(fields=['product_type', 'price'], name='product_type_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productmodel',
+            index=models.Index(fields=['product_type', 'durability'], name='product_type_durability_idx'),
+        ),
+    ]
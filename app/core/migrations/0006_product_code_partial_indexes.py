@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_product_tombstone"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="productmodel",
+            name="code",
+            field=models.CharField(max_length=30, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name="productmodel",
+            index=models.Index(
+                condition=models.Q(("availability", True), ("needing_repair", False)),
+                fields=["updated_at", "id"],
+                name="product_rentable_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="productmodel",
+            index=models.Index(
+                condition=models.Q(("needing_repair", True)),
+                fields=["updated_at", "id"],
+                name="product_repair_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:08
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_job"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="productmodel",
+            name="product_rentable_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="productmodel",
+            name="product_repair_idx",
+        ),
+    ]
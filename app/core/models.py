@@ -4,6 +4,7 @@ from django.contrib.auth.models import (
     BaseUserManager,
     PermissionsMixin,
 )
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django_currentuser.db.models import CurrentUserField
 
@@ -57,7 +58,8 @@ class User(AbstractBaseUser, PermissionsMixin):
 class ProductModel(models.Model):
     """Product Admin"""
 
-    code = models.CharField(max_length=30, blank=False, null=False)
+    # Business identifier, see ProductListSerializer for bulk writes
+    code = models.CharField(max_length=30, blank=False, null=False, unique=True)
     name = models.CharField(max_length=50, blank=False, null=False)
     product_type = models.CharField(max_length=50, blank=False, null=False)
     availability = models.BooleanField(blank=False, null=False)
@@ -72,5 +74,107 @@ class ProductModel(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the catalogue, see product.pagination
+            models.Index(fields=["updated_at", "id"], name="product_updated_idx"),
+            models.Index(
+                fields=["product_type", "updated_at", "id"],
+                name="product_type_updated_idx",
+            ),
+            models.Index(
+                fields=["availability", "needing_repair", "updated_at", "id"],
+                name="product_state_updated_idx",
+            ),
+            models.Index(
+                fields=["product_type", "price"], name="product_type_price_idx"
+            ),
+            models.Index(
+                fields=["product_type", "durability"],
+                name="product_type_durability_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
+
+
+class ProductTombstone(models.Model):
+    """Deleted product, kept for clients syncing changes, see product.changes"""
+
+    product_id = models.IntegerField(db_index=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="tombstone_deleted_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} deleted {self.deleted_at}"
+
+
+class Rental(models.Model):
+    """Booking of a product from start_date up to, but excluding, end_date"""
+
+    # Covered by rental_product_range_idx, which leads with product
+    product = models.ForeignKey(
+        ProductModel, on_delete=models.CASCADE, related_name="rentals", db_index=False
+    )
+    start_date = models.DateField(blank=False, null=False)
+    end_date = models.DateField(blank=False, null=False)
+    created_by = CurrentUserField(related_name="rental_creator", editable=False)
+    updated_by = CurrentUserField(on_update=True, related_name="rental_update")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Overlap probes seek on product, then range scan start_date
+            models.Index(
+                fields=["product", "start_date", "end_date"],
+                name="rental_product_range_idx",
+            ),
+            models.Index(fields=["updated_at", "id"], name="rental_updated_idx"),
+        ]
+
+    @property
+    def days(self):
+        return (self.end_date - self.start_date).days
+
+    def __str__(self):
+        return f"{self.product} {self.start_date} - {self.end_date}"
+
+
+class Job(models.Model):
+    """Call of a task queued for the job workers, see core.jobs"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUSES = [(PENDING, PENDING), (RUNNING, RUNNING), (DONE, DONE), (FAILED, FAILED)]
+
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    # Idempotency key, a job is queued once per key
+    key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=1)
+    # A running job not finished by then is claimed again
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # Due jobs, and finished ones to prune
+            models.Index(fields=["status", "run_at"], name="job_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task} {self.status}"
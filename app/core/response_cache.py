@@ -0,0 +1,267 @@
+import hashlib
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from functools import lru_cache
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
+
+from core.routers import primary_reads
+
+
+class ResponseCache:
+    """Rendered GET responses keyed by URL, query and the versions they read
+
+    Every scope, e.g. a collection or one object of it, has a version
+    counter that writes bump. Entries are keyed by the versions current
+    before the view ran, so a bump makes them unreachable at once and they
+    age out on their own. With a cache local to each process, writes of
+    other processes only show up after TIMEOUT seconds.
+    """
+
+    def __init__(self, alias="default", timeout=60, prefix="response", replica_lag=5):
+        self.cache = caches[alias]
+        self.timeout = timeout
+        self.prefix = prefix
+        self.replica_lag = replica_lag
+        # An in-process cache answers without I/O, so async views call it inline
+        self.blocking = not isinstance(self.cache, LocMemCache)
+
+    def version_key(self, scope):
+        return f"{self.prefix}-version:{scope}"
+
+    def changed_key(self, scope):
+        return f"{self.prefix}-changed:{scope}"
+
+    def versions(self, scopes):
+        """Returns ({scope: version}, last change time of any scope or None)"""
+        keys = [self.version_key(scope) for scope in scopes]
+        changed_keys = [self.changed_key(scope) for scope in scopes]
+        found = self.cache.get_many(keys + changed_keys)
+        for key in keys:
+            if key not in found:
+                # Starting from the clock keeps a counter that was evicted from
+                # going back to a version that old entries are stored under
+                self.cache.add(key, time.time_ns() // 1000, None)
+                found[key] = self.cache.get(key)
+        versions = {scope: found[key] for scope, key in zip(scopes, keys)}
+        changed = [found[key] for key in changed_keys if key in found]
+        return versions, max(changed, default=None)
+
+    def bump(self, *scopes):
+        """Invalidates every entry that read one of scopes"""
+        for scope in scopes:
+            key = self.version_key(scope)
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.add(key, time.time_ns() // 1000, None)
+        now = time.time()
+        self.cache.set_many({self.changed_key(scope): now for scope in scopes}, None)
+
+    def key(self, request, versions):
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        parts = [
+            request.build_absolute_uri(request.path),
+            query,
+            request.accepted_media_type,
+            *(f"{scope}={version}" for scope, version in sorted(versions.items())),
+        ]
+        digest = hashlib.sha256("\n".join(parts).encode()).hexdigest()
+        return f"{self.prefix}:{digest}"
+
+    def fill_reads(self, changed):
+        """Returns the context an entry is rendered in, given the last change
+
+        A replica may not have replayed a change yet, and an entry read from
+        it would be stored under the new versions, so entries are read from
+        default for replica_lag seconds after a change.
+        """
+        if changed is not None and time.time() - changed < self.replica_lag:
+            return primary_reads()
+        return nullcontext()
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, entry):
+        self.cache.set(key, entry, self.timeout)
+
+
+@lru_cache(maxsize=None)
+def get_response_cache():
+    """Returns the cache configured by settings.RESPONSE_CACHE"""
+    options = getattr(settings, "RESPONSE_CACHE", {})
+    return ResponseCache(
+        alias=options.get("CACHE", "default"),
+        timeout=options.get("TIMEOUT", 60),
+        replica_lag=options.get("REPLICA_LAG", 5),
+    )
+
+
+def parse_timestamp(value):
+    """Returns the timestamp of a datetime rendered with DATETIME_FORMAT
+
+    The format may end in a literal Z on local times, which parse_datetime()
+    would take for UTC, so it is parsed with the format itself.
+    """
+    output_format = api_settings.DATETIME_FORMAT
+    if output_format is None or output_format.lower() == ISO_8601:
+        parsed = parse_datetime(value)
+    else:
+        try:
+            parsed = datetime.strptime(value, output_format)
+        except ValueError:
+            parsed = None
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed.timestamp()
+
+
+def last_modified(data, field="updated_at"):
+    """Returns the newest field of a serialized object or page as a timestamp"""
+    if isinstance(data, dict) and isinstance(data.get("results"), list):
+        rows = data["results"]
+    elif isinstance(data, dict):
+        rows = [data]
+    else:
+        rows = data
+    stamps = []
+    for row in rows:
+        value = row.get(field) if isinstance(row, dict) else None
+        stamp = parse_timestamp(value) if isinstance(value, str) else None
+        if stamp is not None:
+            stamps.append(stamp)
+    return max(stamps, default=None)
+
+
+class BaseCachedResponseMixin:
+    """Serves JSON GET responses from the response cache
+
+    Responses carry an ETag, and a matching If-None-Match gets a 304. The
+    Last-Modified from updated_at and the last write is only sent, and
+    If-Modified-Since only honoured, for entries rendered after its second
+    ended: HTTP dates have whole seconds, so a later write in that second
+    would carry the same date. cache_scope names the collection; a view
+    with an object in its URL reads only the scope of that object. Writes
+    bump the scopes, see product.signals.
+    """
+
+    cache_scope = None
+
+    def get_cache_scopes(self):
+        pk = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if pk is None:
+            return [self.cache_scope]
+        return [f"{self.cache_scope}:{pk}"]
+
+    def use_response_cache(self, request):
+        return (
+            get_response_cache().timeout > 0
+            and request.accepted_renderer.format == "json"
+        )
+
+    def make_entry(self, request, response, changed, started, *args, **kwargs):
+        """Renders a 200 response into a cache entry, or returns None
+
+        started is the time the entry's versions were read, before the view.
+        """
+        if response.status_code != 200:
+            return None
+        response = self.finalize_response(request, response, *args, **kwargs)
+        content = response.rendered_content
+        stamps = [last_modified(response.data), changed]
+        stamps = [stamp for stamp in stamps if stamp is not None]
+        second = int(max(stamps)) if stamps else None
+        if second is not None and second >= int(started):
+            second = None
+        return {
+            "content": content,
+            "content_type": response["Content-Type"],
+            "etag": quote_etag(hashlib.md5(content, usedforsecurity=False).hexdigest()),
+            "last_modified": second,
+        }
+
+    def cached_response(self, request, entry):
+        response = HttpResponse(entry["content"], content_type=entry["content_type"])
+        response["ETag"] = entry["etag"]
+        if entry["last_modified"] is not None:
+            response["Last-Modified"] = http_date(entry["last_modified"])
+        # Stored copies must be revalidated, which the ETag makes cheap
+        patch_cache_control(response, no_cache=True)
+        return get_conditional_response(
+            request,
+            etag=entry["etag"],
+            last_modified=entry["last_modified"],
+            response=response,
+        )
+
+
+class CachedResponseMixin(BaseCachedResponseMixin):
+    """For views whose get() is inherited from a DRF generic view"""
+
+    def get(self, request, *args, **kwargs):
+        if not self.use_response_cache(request):
+            return super().get(request, *args, **kwargs)
+        cache = get_response_cache()
+        started = time.time()
+        # Versions are read before the view queries, so a write committed
+        # meanwhile bumps past them rather than being hidden by this entry
+        versions, changed = cache.versions(self.get_cache_scopes())
+        key = cache.key(request, versions)
+        entry = cache.get(key)
+        if entry is None:
+            with cache.fill_reads(changed):
+                response = super().get(request, *args, **kwargs)
+            entry = self.make_entry(
+                request, response, changed, started, *args, **kwargs
+            )
+            if entry is None:
+                return response
+            cache.set(key, entry)
+        return self.cached_response(request, entry)
+
+
+class AsyncCachedResponseMixin(BaseCachedResponseMixin):
+    """For async views, whose get() awaits acached_get() with their handler"""
+
+    async def call_cache(self, method, *args):
+        cache = get_response_cache()
+        if cache.blocking:
+            return await sync_to_async(method)(*args)
+        return method(*args)
+
+    async def acached_get(self, handler, request, *args, **kwargs):
+        """Answers from the cache, or awaits handler and caches its response"""
+        if not self.use_response_cache(request):
+            return await handler(request, *args, **kwargs)
+        cache = get_response_cache()
+        started = time.time()
+        versions, changed = await self.call_cache(
+            cache.versions, self.get_cache_scopes()
+        )
+        key = cache.key(request, versions)
+        entry = await self.call_cache(cache.get, key)
+        if entry is None:
+            with cache.fill_reads(changed):
+                response = await handler(request, *args, **kwargs)
+            entry = self.make_entry(
+                request, response, changed, started, *args, **kwargs
+            )
+            if entry is None:
+                return response
+            await self.call_cache(cache.set, key, entry)
+        return self.cached_response(request, entry)
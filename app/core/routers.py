@@ -0,0 +1,75 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+
+replica_reads = ContextVar("replica_reads", default=False)
+# Set by the first write while replica_reads is on, later reads see it
+wrote = ContextVar("wrote", default=False)
+
+
+@contextmanager
+def primary_reads():
+    """Sends the reads of the block to default, even in opted in views"""
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Writes to default and lets opted in reads go to settings.DATABASE_REPLICAS
+
+    Reads stay on default unless replica_reads is set, so replication lag
+    only shows in the views that opted in. Even there, reads in a
+    transaction, e.g. select_for_update(), and reads after a write go to
+    default, so a request sees its own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            replicas
+            and replica_reads.get()
+            and not wrote.get()
+            and not connections["default"].in_atomic_block
+        ):
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        if replica_reads.get() and not wrote.get():
+            wrote.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as default
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaReadMixin:
+    """Reads from a replica while the handler of a GET request runs
+
+    Authentication, permission checks and throttles run before and still
+    read from default.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS:
+            self.replica_tokens = (replica_reads.set(True), wrote.set(False))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        tokens = getattr(self, "replica_tokens", None)
+        if tokens is not None:
+            replica_reads.reset(tokens[0])
+            wrote.reset(tokens[1])
+            self.replica_tokens = None
+        return super().finalize_response(request, response, *args, **kwargs)
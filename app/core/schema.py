@@ -0,0 +1,134 @@
+import hashlib
+import json
+import logging
+import threading
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import URLPattern, URLResolver, get_resolver
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from drf_yasg.codecs import OpenAPICodecJson, yaml_dump
+from drf_yasg.renderers import SwaggerYAMLRenderer, _SpecRenderer
+
+logger = logging.getLogger(__name__)
+
+# Root key of the schema file holding the URLconf fingerprint it was built for
+FINGERPRINT_KEY = "x-urlconf-fingerprint"
+
+
+def iter_patterns(patterns, prefix=""):
+    """Yields (route, view) for every pattern of a URLconf, nested ones included"""
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if isinstance(pattern, URLResolver):
+            yield from iter_patterns(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            view = getattr(pattern.callback, "cls", pattern.callback)
+            yield route, f"{view.__module__}.{view.__qualname__}"
+
+
+@lru_cache(maxsize=None)
+def urlconf_fingerprint(resolver):
+    """Returns a hash of the routes and views of resolver
+
+    get_resolver() hands out one resolver per URLconf until the URLconf
+    setting changes, so this is computed once per process.
+    """
+    lines = sorted(
+        f"{route} {view}" for route, view in iter_patterns(resolver.url_patterns)
+    )
+    return hashlib.sha256("\n".join(lines).encode()).hexdigest()
+
+
+def current_fingerprint():
+    return urlconf_fingerprint(get_resolver())
+
+
+class SchemaDocument:
+    """A rendered schema with its strong ETag, encoded to YAML on demand"""
+
+    def __init__(self, content):
+        self.content = content
+        self.etag = quote_etag(hashlib.sha256(content).hexdigest())
+        self._yaml = None
+
+    def encode(self, renderer):
+        if not isinstance(renderer, SwaggerYAMLRenderer):
+            return self.content, self.etag
+        if self._yaml is None:
+            data = json.loads(self.content)
+            content = yaml_dump(data, binary=True)
+            self._yaml = content, quote_etag(hashlib.sha256(content).hexdigest())
+        return self._yaml
+
+
+def build_schema(view_class):
+    """Introspects every view and returns the schema as JSON bytes"""
+    generator = view_class.generator_class(view_class.info, version="")
+    schema = generator.get_schema(request=None, public=True)
+    schema[FINGERPRINT_KEY] = current_fingerprint()
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def read_schema_file(path, fingerprint):
+    """Returns the schema file content if it was built for fingerprint"""
+    try:
+        with open(path, "rb") as file:
+            content = file.read()
+        built_for = json.loads(content).get(FINGERPRINT_KEY)
+    except (OSError, ValueError, AttributeError):
+        return None
+    if built_for != fingerprint:
+        logger.warning("%s was built for other URLs, generating the schema", path)
+        return None
+    return content
+
+
+class PrecomputedSchemaMixin:
+    """Serves the schema from OPENAPI_SCHEMA["FILE"] instead of per request
+
+    The file is written by the build_schema command. If it is missing or
+    was built for another URLconf, the schema is generated on first use.
+    Either way it is kept per process and URLconf and sent with a strong
+    ETag, so clients polling it mostly get a 304. The UI pages, which do
+    not introspect the views, are left to drf_yasg.
+    """
+
+    info = None
+    documents = {}
+    lock = threading.Lock()
+
+    @classmethod
+    def get_document(cls):
+        fingerprint = current_fingerprint()
+        document = cls.documents.get(fingerprint)
+        if document is None:
+            # One thread generates while concurrent first requests wait for it
+            with cls.lock:
+                document = cls.documents.get(fingerprint)
+                if document is None:
+                    path = getattr(settings, "OPENAPI_SCHEMA", {}).get("FILE")
+                    content = path and read_schema_file(path, fingerprint)
+                    document = SchemaDocument(content or build_schema(cls))
+                    cls.documents[fingerprint] = document
+        return document
+
+    def get(self, request, version="", format=None):
+        if not isinstance(request.accepted_renderer, _SpecRenderer):
+            return super().get(request, version, format)
+        content, etag = self.get_document().encode(request.accepted_renderer)
+        response = HttpResponse(
+            content, content_type=request.accepted_renderer.media_type
+        )
+        response["ETag"] = etag
+        patch_cache_control(response, no_cache=True)
+        return get_conditional_response(request, etag=etag, response=response)
+
+
+def precomputed_schema_view(schema_view, info):
+    """Returns schema_view, as made by get_schema_view(info), serving precomputed"""
+    return type(
+        schema_view.__name__, (PrecomputedSchemaMixin, schema_view), {"info": info}
+    )
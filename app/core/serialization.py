@@ -0,0 +1,262 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import ISO_8601, serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# Fields whose to_representation returns database values unchanged
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+)
+
+
+# Distinct seconds remembered by one datetime converter
+DATETIME_CACHE_SIZE = 4096
+
+
+def datetime_converter(field):
+    """Returns a converter formatting datetimes exactly like field does
+
+    Only %f changes within a second, so the rest of the output is
+    formatted once per distinct second and the microseconds spliced in.
+    """
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() == ISO_8601:
+        return field.to_representation
+    field_timezone = (
+        field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    )
+    if field_timezone is None or output_format.count("%f") > 1 or "%%" in output_format:
+        return field.to_representation
+    head, _, tail = output_format.partition("%f")
+    formatted = {}
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        # Cheaper to build than value.replace(microsecond=0)
+        second = (
+            value.year,
+            value.month,
+            value.day,
+            value.hour,
+            value.minute,
+            value.second,
+            value.fold,
+            value.tzinfo,
+        )
+        parts = formatted.get(second)
+        if parts is None:
+            if len(formatted) >= DATETIME_CACHE_SIZE:
+                formatted.clear()
+            local = value.replace(microsecond=0).astimezone(field_timezone)
+            parts = formatted[second] = (
+                local.strftime(head),
+                local.strftime(tail) if tail else "",
+            )
+        if head == output_format:
+            return parts[0]
+        return f"{parts[0]}{value.microsecond:06d}{parts[1]}"
+
+    return convert
+
+
+class ValuesSerializer:
+    """Read only fast path producing the output of a ModelSerializer
+
+    Rows are fetched with values_list() and each column goes through a
+    converter compiled from the matching serializer field, so no model
+    instance or per-field serializer call is made per row.
+    """
+
+    def __init__(self, serializer_class):
+        fields = [
+            field
+            for field in serializer_class().fields.values()
+            if not field.write_only
+        ]
+        for field in fields:
+            nested = isinstance(field, serializers.BaseSerializer)
+            if nested or "." in field.source or field.source == "*":
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{field.field_name} is not a column"
+                )
+        self.fields = fields
+        self.names = tuple(field.field_name for field in fields)
+        self.sources = tuple(field.source for field in fields)
+
+    def get_converters(self):
+        """Returns one converter per column, or None where values pass through"""
+        converters = []
+        for field in self.fields:
+            if isinstance(field, PASSTHROUGH_FIELDS):
+                converters.append(None)
+            elif isinstance(field, serializers.DateTimeField):
+                converters.append(datetime_converter(field))
+            else:
+                converters.append(field.to_representation)
+        return converters
+
+    def convert(self, rows):
+        """Yields rows of raw column values ordered like self.sources, serialized"""
+        converted = [
+            (index, convert)
+            for index, convert in enumerate(self.get_converters())
+            if convert is not None
+        ]
+        for row in rows:
+            if converted:
+                row = list(row)
+                for index, convert in converted:
+                    if row[index] is not None:
+                        row[index] = convert(row[index])
+            yield row
+
+    def iter_rows(self, queryset, chunk_size=None, extra=()):
+        """Yields serialized rows as sequences ordered like self.names
+
+        With chunk_size the rows are streamed from a server side cursor.
+        The raw values of the extra columns are appended to every row.
+        """
+        rows = queryset.values_list(*self.sources, *extra)
+        if chunk_size:
+            rows = rows.iterator(chunk_size=chunk_size)
+        return self.convert(rows)
+
+    def iter_dicts(self, queryset, chunk_size=None):
+        names = self.names
+        for row in self.iter_rows(queryset, chunk_size):
+            yield dict(zip(names, row))
+
+    def data(self, queryset):
+        """Returns the same list ModelSerializer(queryset, many=True).data would"""
+        return list(self.iter_dicts(queryset))
+
+    def page(self, queryset, keys):
+        """Returns the serialized rows and the raw values of the keys columns"""
+        return self.split_keys(self.iter_rows(queryset, extra=keys))
+
+    async def adata(self, queryset):
+        """Like data(), fetching the rows with the async ORM"""
+        names = self.names
+        rows = [row async for row in queryset.values_list(*self.sources)]
+        return [dict(zip(names, row)) for row in self.convert(rows)]
+
+    async def apage(self, queryset, keys):
+        """Like page(), fetching the rows with the async ORM"""
+        rows = [row async for row in queryset.values_list(*self.sources, *keys)]
+        return self.split_keys(self.convert(rows))
+
+    def split_keys(self, rows):
+        names, width = self.names, len(self.names)
+        data, positions = [], []
+        for row in rows:
+            data.append(dict(zip(names, row[:width])))
+            positions.append(tuple(row[width:]))
+        return data, positions
+
+
+class ValuesListMixin:
+    """Serves list requests through a ValuesSerializer
+
+    Views set values_serializer to ValuesSerializer(serializer_class);
+    writes and single object reads still go through serializer_class.
+    """
+
+    values_serializer = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(self.values_serializer.data(queryset))
+
+
+def read_plan(serializer, model, prefix=""):
+    """Returns the (columns, select, prefetch) paths serializer reads from model
+
+    columns is None when a field reads something other than a model
+    field, such as a property, since only() would then load it per row.
+    """
+    columns, select, prefetch = [], [], []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            columns = None
+            continue
+        path = prefix + field.source
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        many = model_field.many_to_many or model_field.one_to_many
+        if many:
+            prefetch.append(path)
+        elif model_field.is_relation and isinstance(field, serializers.BaseSerializer):
+            select.append(path)
+        if columns is not None and not many:
+            columns.append(path)
+        if not isinstance(nested, serializers.BaseSerializer):
+            continue
+        nested_columns, nested_select, nested_prefetch = read_plan(
+            nested, model_field.related_model, path + "__"
+        )
+        if many:
+            # Relations of prefetched rows are prefetched along with them
+            prefetch += nested_select + nested_prefetch
+            continue
+        select += nested_select
+        prefetch += nested_prefetch
+        if columns is not None and nested_columns is not None:
+            columns += nested_columns
+        else:
+            columns = None
+    return columns, select, prefetch
+
+
+@lru_cache(maxsize=None)
+def get_read_plan(serializer_class, model):
+    columns, select, prefetch = read_plan(serializer_class(), model)
+    concrete = {field.name for field in model._meta.concrete_fields}
+    if columns is not None and concrete <= set(columns):
+        # Every column is read anyway
+        columns = None
+    return columns, select, prefetch
+
+
+def optimize_queryset(queryset, serializer_class, defer=False):
+    """Returns queryset loading what serializer_class reads up front
+
+    Nested serializers get select_related or prefetch_related, so a deeper
+    depth does not turn into one query per row. With defer, columns the
+    serializer does not read are left out with only().
+    """
+    columns, select, prefetch = get_read_plan(serializer_class, queryset.model)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    if defer and columns is not None:
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+class OptimizedQuerysetMixin:
+    """Loads what serializer_class reads in a constant number of queries
+
+    See optimize_queryset. Only safe requests defer columns, since writes
+    may touch fields the serializer does not show.
+    """
+
+    def get_queryset(self):
+        return optimize_queryset(
+            super().get_queryset(),
+            self.get_serializer_class(),
+            defer=self.request.method in SAFE_METHODS,
+        )
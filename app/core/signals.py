@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from core.instrumentation import record_query
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Applies settings.SQLITE_PRAGMAS to every new SQLite connection"""
+    if connection.vendor != "sqlite":
+        return
+    for name, value in getattr(settings, "SQLITE_PRAGMAS", {}).items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    """Lets core.instrumentation count the queries of sampled requests"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
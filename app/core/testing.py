@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+
+from django.urls import URLPattern
+
+from core.instrumentation import RequestStats, collect_queries
+
+
+def list_endpoints(app):
+    """Yields the URL names of the GET routes of app without arguments"""
+    module = __import__(f"{app}.urls", fromlist=["urlpatterns"])
+    for pattern in module.urlpatterns:
+        if not isinstance(pattern, URLPattern) or pattern.pattern.converters:
+            continue
+        view = getattr(pattern.callback, "cls", None)
+        # Routes included from other packages, like oauth2_provider, are theirs
+        if view is None or not view.__module__.startswith(f"{app}."):
+            continue
+        if hasattr(view, "get"):
+            yield f"{module.app_name}:{pattern.name}"
+
+
+class QueryBudgetMixin:
+    """Query count assertions for TestCase, like assertNumQueries()"""
+
+    @contextmanager
+    def assertMaxQueries(self, budget, repeats=None):
+        """Fails when the block runs more than budget queries
+
+        With repeats set, also fails when one statement runs that many
+        times or more, the mark of an N+1 pattern. Yields the RequestStats
+        of the block.
+        """
+        stats = RequestStats(count_repeats=repeats is not None)
+        with collect_queries(stats):
+            yield stats
+        self.assertLessEqual(
+            stats.queries, budget, f"{stats.queries} queries, budget {budget}"
+        )
+        if repeats is not None:
+            repeated = stats.repeated(repeats)
+            self.assertFalse(
+                repeated,
+                (
+                    f"one statement ran {repeated[0][0]} times: {repeated[0][1]}"
+                    if repeated
+                    else ""
+                ),
+            )
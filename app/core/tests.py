@@ -0,0 +1,711 @@
+import datetime
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from core.factories import create_products, create_rentals, create_users
+from core.http import HTTPClient, Unavailable
+from core.instrumentation import InstrumentationMiddleware
+from core.jobs import Worker, enqueue, get_options, prune_jobs, task
+from core.models import Job, ProductModel, Rental, User
+from core.response_cache import get_response_cache
+from core.routers import replica_reads, wrote
+from core.testing import QueryBudgetMixin, list_endpoints
+from product import async_views, views
+from product.changes import encode_token
+from product.search import get_search_index
+
+
+@override_settings(THROTTLING={})
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Every user and product list endpoint runs the same few queries
+    however many rows there are, and no statement once per row"""
+
+    budget = 4
+    # Runs of one statement in a request that count as N+1
+    repeats = 3
+    # Query parameters of endpoints that require some, by URL name
+    params = {
+        "product:product_availability": {
+            "start_date": "2030-01-01",
+            "end_date": "2030-01-08",
+        },
+        "product:product_search": {"q": "car"},
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("budget@example.com"))
+        self.endpoints = [
+            name for app in ("user", "product") for name in list_endpoints(app)
+        ]
+
+    def seed(self, count, start, year):
+        """Adds count users, products and rentals, in a year of their own"""
+        create_users(count, start=start)
+        create_products(count, start=start, seed=start)
+        create_rentals(count, start=datetime.date(year, 1, 1))
+
+    def queries(self, name):
+        """Returns the queries a GET of name ran, read to the end"""
+        # Cached responses would hide the queries being counted, and the
+        # search index refreshes on a timer, so it is rebuilt every time
+        get_response_cache().cache.clear()
+        get_search_index.cache_clear()
+        with self.assertMaxQueries(self.budget, self.repeats) as stats:
+            response = self.client.get(reverse(name), self.params.get(name, {}))
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertEqual(response.status_code, 200)
+        return stats.queries
+
+    def test_list_queries_stay_constant(self):
+        self.seed(20, 0, 2022)
+        counts = {name: [self.queries(name)] for name in self.endpoints}
+        self.seed(80, 20, 2023)
+        for name in self.endpoints:
+            with self.subTest(name):
+                counts[name].append(self.queries(name))
+                self.assertEqual(len(set(counts[name])), 1, counts[name])
+
+
+def sqlite_scans(connection, sql, params):
+    """Returns the tables the SQLite plan of sql reads without an index"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        details = [row[3].split() for row in cursor.fetchall()]
+    # Index scans read "SCAN table USING [COVERING] INDEX name"
+    return {
+        words[1] for words in details if words[0] == "SCAN" and "USING" not in words
+    }
+
+
+def postgresql_scans(connection, sql, params):
+    """Returns the tables PostgreSQL reads sequentially even when told not to
+
+    With enable_seqscan off a sequential scan is only planned when no
+    index can answer the query, whatever the table statistics say.
+    """
+
+    def walk(plan):
+        if plan["Node Type"] == "Seq Scan":
+            yield plan["Relation Name"]
+        for child in plan.get("Plans", ()):
+            yield from walk(child)
+
+    with connection.cursor() as cursor:
+        cursor.execute("SET enable_seqscan = off")
+        try:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.execute("RESET enable_seqscan")
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return set(walk(plan[0]["Plan"]))
+
+
+@override_settings(THROTTLING={})
+class QueryPlanTests(TestCase):
+    """No query of the user and product endpoints reads a whole table"""
+
+    explainers = {"sqlite": sqlite_scans, "postgresql": postgresql_scans}
+    # Tables an endpoint reads whole by design, by path
+    full_scans = {
+        # Lists every user, it has no pagination
+        "/user/": {"core_user"},
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        create_users(2000)
+        create_products(2000)
+        create_rentals(2000)
+        # Plans as on a database with statistics
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def setUp(self):
+        if connection.vendor not in self.explainers:
+            self.skipTest(f"No EXPLAIN support for {connection.vendor}")
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.order_by("id").first())
+
+    def get_requests(self):
+        """Returns the (path, query parameters) of every request checked"""
+        product = ProductModel.objects.order_by("id").first()
+        rental = Rental.objects.order_by("id").first()
+        user = User.objects.order_by("id").first()
+        now = timezone.now()
+        dates = {"start_date": "2030-01-01", "end_date": "2030-01-08"}
+        return [
+            ("/user/", {}),
+            (f"/user/{user.pk}/", {}),
+            ("/product/", {}),
+            ("/product/", {"product_type": "car"}),
+            ("/product/", {"availability": "true", "needing_repair": "false"}),
+            ("/product/", {"needing_repair": "true"}),
+            ("/product/", {"product_type": "car", "price_max": 100}),
+            ("/product/", {"product_type": "van", "durability_min": 1000}),
+            (f"/product/{product.pk}/", {}),
+            ("/product/availability/", dates),
+            ("/product/availability/", {**dates, "product_type": "car"}),
+            ("/product/changes/", {"page_size": 100}),
+            ("/product/changes/", {"since": encode_token((now, 0), (now, 0))}),
+            ("/product/rentals/", {}),
+            ("/product/rentals/", {"product": product.pk}),
+            (f"/product/rentals/{rental.pk}/", {}),
+        ]
+
+    def capture(self, path, params):
+        """Returns (alias, sql, params) of every SELECT a GET of path ran"""
+        statements = []
+
+        def execute(execute, sql, sql_params, many, context):
+            if sql.lstrip().upper().startswith("SELECT"):
+                statements.append((context["connection"].alias, sql, sql_params))
+            return execute(sql, sql_params, many, context)
+
+        # A cached response would run no queries
+        get_response_cache().cache.clear()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(execute))
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return statements
+
+    def test_no_full_scans(self):
+        for path, params in self.get_requests():
+            with self.subTest(path=path, params=params):
+                for alias, sql, query_params in self.capture(path, params):
+                    db = connections[alias]
+                    scans = self.explainers[db.vendor](db, sql, query_params)
+                    scans -= self.full_scans.get(path, set())
+                    self.assertFalse(scans, sql)
+
+
+class MetricsTests(SimpleTestCase):
+    """/metrics only answers METRICS_ALLOWED_IPS, whatever X-Forwarded-For
+    a client sends"""
+
+    def get(self, num_proxies, remote_addr, forwarded_for=None):
+        headers = {"REMOTE_ADDR": remote_addr}
+        if forwarded_for:
+            headers["HTTP_X_FORWARDED_FOR"] = forwarded_for
+        with override_settings(REST_FRAMEWORK={"NUM_PROXIES": num_proxies}):
+            return Client().get("/metrics", **headers).status_code
+
+    def test_allowed_ips(self):
+        self.assertEqual(self.get(None, "127.0.0.1"), 200)
+        self.assertEqual(self.get(None, "203.0.113.9"), 403)
+
+    def test_spoofed_forwarded_for(self):
+        self.assertEqual(self.get(None, "203.0.113.9", "127.0.0.1"), 403)
+        # The proxy appended the real client after the spoofed entry
+        self.assertEqual(self.get(1, "10.0.0.1", "127.0.0.1, 203.0.113.9"), 403)
+
+    def test_proxied_client(self):
+        self.assertEqual(self.get(1, "10.0.0.1", "203.0.113.9, 127.0.0.1"), 200)
+
+
+@override_settings(INSTRUMENTATION={"SAMPLE_RATE": 1.0}, THROTTLING={})
+class InstrumentationTests(TestCase):
+    """Sampled requests report the queries their view ran, on the event
+    loop under ASGI too"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_products(1)
+        cls.path = f"/product/{ProductModel.objects.get().pk}/"
+
+    def setUp(self):
+        get_response_cache().cache.clear()
+
+    def queries(self, response):
+        self.assertEqual(response.status_code, 200)
+        return int(re.search(r'desc="(\d+) queries"', response["Server-Timing"])[1])
+
+    def test_sync_request(self):
+        self.assertGreater(self.queries(self.client.get(self.path)), 0)
+
+    async def test_async_request(self):
+        middleware = InstrumentationMiddleware(
+            async_views.ListCreateProductAPIView.as_view()
+        )
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await self.async_client.get(self.path)
+        self.assertGreater(self.queries(response), 0)
+
+
+class ProductViews:
+    """Calls the product list and detail views of a module like the router"""
+
+    def __init__(self, module):
+        self.factory = RequestFactory()
+        self.views = {}
+        for name, view in (
+            ("list", module.ListCreateProductAPIView),
+            ("detail", module.RetrieveUpdateDestroyProductAPIView),
+        ):
+            handler = view.as_view()
+            self.views[name] = async_to_sync(handler) if view.view_is_async else handler
+
+    def call(self, method, pk=None, data=None, query=None, **headers):
+        path = "/product/" if pk is None else f"/product/{pk}/"
+        request = getattr(self.factory, method)(
+            path + (f"?{query}" if query else ""),
+            data,
+            content_type="application/json",
+            **headers,
+        )
+        if pk is None:
+            response = self.views["list"](request)
+        else:
+            response = self.views["detail"](request, pk=pk)
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    def get(self, pk=None, query=None, **headers):
+        """Returns the response and the count of queries it ran"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.call("get", pk, query=query, **headers)
+        return response, len(queries)
+
+
+class ResponseCacheTests(TransactionTestCase):
+    """Product reads, sync and async, are served from the response cache,
+    answer conditional requests with 304 and see every write at once"""
+
+    modules = (views, async_views)
+
+    def setUp(self):
+        # Invalidation runs when writes commit
+        create_products(20)
+        get_response_cache().cache.clear()
+        self.first, self.second = ProductModel.objects.order_by("id")[:2]
+        self.targets = {
+            "list": {"query": "page_size=5"},
+            "detail": {"pk": self.first.pk},
+            "other detail": {"pk": self.second.pk},
+        }
+
+    def test_repeated_reads(self):
+        for module in self.modules:
+            api = ProductViews(module)
+            for label, target in self.targets.items():
+                with self.subTest(module.__name__, target=label):
+                    self.assertEqual(api.get(**target)[0].status_code, 200)
+                    response, queries = api.get(**target)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(queries, 0)
+                    etag = response["ETag"]
+                    conditional = api.get(**target, HTTP_IF_NONE_MATCH=etag)[0]
+                    self.assertEqual(conditional.status_code, 304)
+
+    def test_last_modified(self):
+        """Last-Modified is only a validator once no write can share its second"""
+        stamp = self.first.updated_at.timestamp()
+        since = http_date(stamp)
+        for module in self.modules:
+            api = ProductViews(module)
+            for now, validator in ((stamp, False), (stamp + 1, True)):
+                with self.subTest(module.__name__, validator=validator):
+                    get_response_cache().cache.clear()
+                    with mock.patch("core.response_cache.time") as clock:
+                        clock.time.return_value = now
+                        clock.time_ns.side_effect = time.time_ns
+                        response = api.get(pk=self.first.pk)[0]
+                        conditional = api.get(
+                            pk=self.first.pk, HTTP_IF_MODIFIED_SINCE=since
+                        )[0]
+                    if validator:
+                        self.assertEqual(response["Last-Modified"], since)
+                        self.assertEqual(conditional.status_code, 304)
+                    else:
+                        self.assertNotIn("Last-Modified", response)
+                        self.assertEqual(conditional.status_code, 200)
+
+    def test_update(self):
+        for module in self.modules:
+            api = ProductViews(module)
+            before = {
+                label: api.get(**self.targets[label])[0] for label in self.targets
+            }
+            response = api.call("patch", self.first.pk, {"name": module.__name__})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                api.get(pk=self.second.pk)[1],
+                0,
+                "updating one product dropped the cache of another",
+            )
+            for label in ("list", "detail"):
+                with self.subTest(module.__name__, target=label):
+                    target = self.targets[label]
+                    response = api.get(**target)[0]
+                    self.assertIn(module.__name__.encode(), response.content)
+                    etag = before[label]["ETag"]
+                    response = api.get(**target, HTTP_IF_NONE_MATCH=etag)[0]
+                    self.assertEqual(response.status_code, 200)
+
+    def test_delete(self):
+        for module in self.modules:
+            with self.subTest(module.__name__):
+                api = ProductViews(module)
+                api.get(pk=self.second.pk)
+                api.get(query="page_size=100")
+                self.assertEqual(api.call("delete", self.second.pk).status_code, 204)
+                self.assertEqual(api.get(pk=self.second.pk)[0].status_code, 404)
+                response = api.get(query="page_size=100")[0]
+                self.assertNotIn(f'"id":{self.second.pk},'.encode(), response.content)
+                # Restores the deleted product for the next module
+                self.second.save()
+
+
+@override_settings(THROTTLING={})
+class DatabaseRoutingTests(TransactionTestCase):
+    """Opted in reads go to a replica, and writes, select_for_update() and
+    reads after a write go to default, with a second SQLite database
+    standing in for the replica"""
+
+    replica = "replica_check"
+    # Resolved once the replica is declared, in setUpClass()
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        # Declared before the test case checks its databases
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        connections.settings[cls.replica] = {
+            **connection.settings_dict,
+            "NAME": os.path.join(directory.name, "replica.sqlite3"),
+        }
+        cls.addClassCleanup(cls.remove_replica)
+        super().setUpClass()
+
+    @classmethod
+    def remove_replica(cls):
+        connections[cls.replica].close()
+        del connections[cls.replica]
+        del connections.settings[cls.replica]
+
+    def setUp(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("The replica is a copy of a SQLite database")
+        create_users(2)
+        create_products(20)
+        self.user = User.objects.order_by("id").first()
+        self.product = ProductModel.objects.order_by("id").first()
+        self.copy_replica()
+        # Marks the replica's copy of the first product
+        ProductModel.objects.using(self.replica).filter(pk=self.product.pk).update(
+            name="replica copy"
+        )
+        self.enterContext(override_settings(DATABASE_REPLICAS=[self.replica]))
+        get_response_cache().cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def copy_replica(self):
+        """Copies the default database to the replica"""
+        connections[self.replica].close()
+        target = sqlite3.connect(connections[self.replica].settings_dict["NAME"])
+        connection.ensure_connection()
+        connection.connection.backup(target)
+        target.close()
+
+    @contextmanager
+    def capture(self, statements):
+        """Collects the (alias, sql) of every statement run in the block"""
+
+        def execute(execute, sql, params, many, context):
+            statements.append((context["connection"].alias, sql))
+            return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for alias in ("default", self.replica):
+                stack.enter_context(connections[alias].execute_wrapper(execute))
+            yield
+
+    def aliases(self, statements, table):
+        return {alias for alias, sql in statements if f'"{table}"' in sql}
+
+    def test_requests(self):
+        # As after a write outside any request, the mixin starts unpinned
+        wrote_token = wrote.set(True)
+        self.addCleanup(wrote.reset, wrote_token)
+        pages = {}
+        for path, table in (
+            ("/product/", "core_productmodel"),
+            ("/user/", "core_user"),
+        ):
+            statements = []
+            with self.capture(statements):
+                response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            pages[path] = response.json()
+            self.assertEqual(self.aliases(statements, table), {self.replica}, path)
+        rows = pages["/product/"]
+        if isinstance(rows, dict):
+            rows = rows["results"]
+        self.assertIn("replica copy", [row["name"] for row in rows])
+
+        statements = []
+        with self.capture(statements):
+            response = self.client.post(
+                "/product/rentals/",
+                {
+                    "product": self.product.pk,
+                    "start_date": "2031-01-01",
+                    "end_date": "2031-03-01",
+                },
+                format="json",
+            )
+        self.assertEqual(response.status_code, 201)
+        writes = {
+            alias
+            for alias, sql in statements
+            if sql.startswith(("INSERT", "UPDATE", "DELETE"))
+        }
+        self.assertEqual(writes, {"default"})
+
+    def test_transactions(self):
+        """Reads after a write and in transactions, as in a GET handler"""
+        replica_token = replica_reads.set(True)
+        self.addCleanup(replica_reads.reset, replica_token)
+        wrote_token = wrote.set(False)
+        self.addCleanup(wrote.reset, wrote_token)
+        product = ProductModel.objects.get(pk=self.product.pk)
+        self.assertEqual(product.name, "replica copy", "a read before any write")
+        ProductModel.objects.filter(pk=self.product.pk).update(name="written")
+        product = ProductModel.objects.get(pk=self.product.pk)
+        self.assertEqual(product.name, "written", "a read after a write")
+
+        wrote.set(False)
+        statements = []
+        with self.capture(statements):
+            with transaction.atomic():
+                ProductModel.objects.select_for_update().get(pk=self.product.pk)
+        self.assertEqual(self.aliases(statements, "core_productmodel"), {"default"})
+
+    def test_cache_fill(self):
+        """Caches the product list right after a write the replica lacks"""
+        # Bumps the cached versions, the replica keeps its old copy
+        response = self.client.patch(
+            f"/product/{self.product.pk}/", {"name": "patched"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        for _ in range(2):
+            data = self.client.get("/product/").json()
+            rows = data["results"] if isinstance(data, dict) else data
+            name = next(row["name"] for row in rows if row["id"] == self.product.pk)
+            self.assertEqual(name, "patched")
+
+
+@task(max_attempts=2)
+def always_fails():
+    raise RuntimeError("always fails")
+
+
+class JobTests(TestCase):
+    """Jobs are retried with backoff, deduplicated and scheduled"""
+
+    def test_retry(self):
+        """A failing job waits for its backoff before it runs again"""
+        job = enqueue(always_fails)
+        worker = Worker()
+        now = timezone.now()
+        self.assertEqual(worker.run_due(now), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertGreater(job.run_at, now)
+        self.assertEqual(worker.run_due(now), 0, "ran again before its backoff")
+        self.assertEqual(worker.run_due(now + timedelta(hours=1)), 1)
+
+    def test_key(self):
+        """Jobs queued under one key run once"""
+        for _ in range(2):
+            enqueue(prune_jobs, key="prune")
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_failing(self):
+        """Runs a failing task until it is given up"""
+        job = enqueue(always_fails)
+        now = timezone.now() + timedelta(days=1)
+        worker = Worker()
+        while worker.run_due(now):
+            now += timedelta(hours=1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, job.max_attempts)
+
+    def test_lost_lease(self):
+        """A worker whose lease ran out leaves the job to its new owner"""
+        for func in (always_fails, prune_jobs):
+            with self.subTest(func.__name__):
+                job = enqueue(func)
+                now = timezone.now()
+                Job.objects.filter(pk=job.pk).update(
+                    status=Job.RUNNING, attempts=1, locked_until=now
+                )
+                stale = Job.objects.get(pk=job.pk)
+                # Another worker claims it once the lease ran out
+                lease = now + timedelta(minutes=5)
+                Job.objects.filter(pk=job.pk).update(attempts=2, locked_until=lease)
+                Worker().run_job(stale)
+                job.refresh_from_db()
+                self.assertEqual(job.status, Job.RUNNING)
+                self.assertEqual(job.locked_until, lease)
+
+    def test_schedule(self):
+        """Two workers queue each scheduled task once"""
+        schedule = get_options()["SCHEDULE"]
+        now = timezone.now()
+        for worker in (Worker(), Worker()):
+            worker.enqueue_scheduled(now)
+        queued = Job.objects.filter(key__startswith="schedule:").count()
+        self.assertEqual(queued, len(schedule))
+        self.assertEqual(Worker().run_due(now), queued)
+
+
+class Upstream(BaseHTTPRequestHandler):
+    """Answers /ok at once, /slow after a second and /down with 503"""
+
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, Nagle would hold the body back
+    disable_nagle_algorithm = True
+    hits = {}
+
+    def do_GET(self):
+        Upstream.hits[self.path] = Upstream.hits.get(self.path, 0) + 1
+        if self.path == "/slow":
+            time.sleep(1)
+        status = 503 if self.path == "/down" else 200
+        try:
+            self.send_response(status)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"{}")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out
+            pass
+
+    do_POST = do_GET
+
+    def log_message(self, *args):
+        pass
+
+
+class HTTPClientTests(SimpleTestCase):
+    """Keep-alive, timeouts, retries, the circuit breaker and pool limits"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(server.shutdown)
+        cls.base = f"http://127.0.0.1:{server.server_port}"
+
+    def setUp(self):
+        Upstream.hits = {}
+
+    def test_keep_alive(self):
+        client = HTTPClient()
+        for _ in range(20):
+            client.get(f"{self.base}/ok")
+        opened = next(iter(client.stats()["pools"].values()))["opened"]
+        self.assertEqual(opened, 1)
+
+    def test_timeout(self):
+        client = HTTPClient(timeout=(1.0, 0.2))
+        started = time.perf_counter()
+        with self.assertRaises(Exception) as raised:
+            client.post(f"{self.base}/slow")
+        self.assertNotIsInstance(raised.exception, Unavailable)
+        # A POST is not retried after its request was sent
+        self.assertLess(time.perf_counter() - started, 0.5)
+
+    def test_breaker(self):
+        client = HTTPClient(retries=1, backoff=0.01, breaker_threshold=3)
+        for _ in range(3):
+            client.get(f"{self.base}/down")
+        self.assertEqual(Upstream.hits["/down"], 6, "3 calls with 1 retry each")
+        started = time.perf_counter()
+        with self.assertRaises(Unavailable):
+            client.get(f"{self.base}/down")
+        self.assertEqual(Upstream.hits["/down"], 6, "an open circuit called")
+        self.assertLess(time.perf_counter() - started, 0.005)
+
+    def test_post_not_retried(self):
+        """A POST the upstream answered may have taken effect"""
+        client = HTTPClient(retries=1, backoff=0.01)
+        client.get(f"{self.base}/down")
+        client.post(f"{self.base}/down")
+        self.assertEqual(
+            Upstream.hits["/down"], 3, "the GET retried once, not the POST"
+        )
+
+    def test_pool_limit(self):
+        client = HTTPClient(pool_maxsize=2, pool_timeout=0.1, timeout=(1.0, 5.0))
+
+        def call(_):
+            try:
+                client.get(f"{self.base}/slow")
+                return "ok"
+            except Unavailable:
+                return "shed"
+
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(call, range(6)))
+        self.assertEqual(results.count("ok"), 2, results)
+
+
+class BuildSchemaTests(SimpleTestCase):
+    """build_schema --check fails once the API documented has changed"""
+
+    def build_schema(self, *args, **options):
+        # Some views log a warning when introspected without a request
+        with mock.patch("drf_yasg.inspectors.base.logger"):
+            call_command("build_schema", *args, stdout=StringIO(), **options)
+
+    def test_check(self):
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        path = os.path.join(directory, "schema.json")
+        with self.assertRaises(CommandError):
+            self.build_schema("--check", output=path)
+        self.build_schema(output=path)
+        self.build_schema("--check", output=path)
+        # The URLs stay the same when only a view or serializer changes
+        with mock.patch.object(views.BulkProductAPIView.post, "__doc__", "Changed"):
+            with self.assertRaises(CommandError):
+                self.build_schema("--check", output=path)
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework.settings import api_settings
+
+from core.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+# Seconds to stay on the local buckets after the shared cache failed
+SHARED_RETRY_AFTER = 5
+
+
+def parse_rate(rate):
+    """Returns (capacity, tokens per second) for a DRF style "10/min" rate"""
+    num, period = rate.split("/")
+    num = int(num)
+    return num, num / PERIODS[period[0]]
+
+
+def client_ip(request):
+    """Returns the client address, REMOTE_ADDR unless behind NUM_PROXIES
+
+    Clients can send any X-Forwarded-For, so it is only read with
+    NUM_PROXIES set, and then only the address the outermost trusted
+    proxy appended, counted from the right.
+    """
+    remote_addr = request.META.get("REMOTE_ADDR")
+    num_proxies = api_settings.NUM_PROXIES
+    xff = request.META.get("HTTP_X_FORWARDED_FOR")
+    if not num_proxies or not xff:
+        return remote_addr
+    addrs = [addr.strip() for addr in xff.split(",")]
+    # Fewer entries than proxies, the request did not come through all of them
+    if len(addrs) < num_proxies:
+        return remote_addr
+    return addrs[-num_proxies]
+
+
+def request_email(request):
+    """Returns the lowercased email or username posted as JSON or a form"""
+    if request.method != "POST":
+        return None
+    # Reading body first keeps it readable for views after POST was parsed
+    body = request.body
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(body or b"{}")
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+    else:
+        data = request.POST
+    email = data.get("email") or data.get("username")
+    if not isinstance(email, str) or not email.strip():
+        return None
+    return email.strip().lower()
+
+
+IDENTIFIERS = {"ip": client_ip, "email": request_email}
+
+
+class BucketStore:
+    """Token buckets kept in a shared cache, or in process if there is none
+
+    State is read and written back in two calls, so concurrent requests
+    in different workers may each take the last token of a bucket.
+    """
+
+    def __init__(self, shared_cache=None, max_entries=100000):
+        self.shared = caches[shared_cache] if shared_cache else None
+        self.shared_down_until = 0
+        self.local = LRUCache(max_entries=max_entries)
+        self.lock = threading.Lock()
+
+    def take(self, buckets, now):
+        """Takes a token from every bucket, or from none if one is empty
+
+        buckets holds (key, capacity, rate) triples. Returns the seconds
+        until the emptiest bucket has a token again, or 0 when allowed.
+        """
+        if self.shared is not None and now >= self.shared_down_until:
+            try:
+                return self._take(self.shared, buckets, now)
+            except Exception:
+                logger.warning("Throttle cache unavailable, using local buckets")
+                self.shared_down_until = now + SHARED_RETRY_AFTER
+        with self.lock:
+            return self._take(self.local, buckets, now)
+
+    def _take(self, cache, buckets, now):
+        if cache is self.local:
+            states = {key: cache.get(key) for key, _, _ in buckets}
+        else:
+            states = cache.get_many([key for key, _, _ in buckets])
+        updates, wait = {}, 0
+        for key, capacity, rate in buckets:
+            tokens, stamp = states.get(key) or (capacity, now)
+            tokens = min(capacity, tokens + (now - stamp) * rate)
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate)
+            updates[key] = (tokens - 1, now)
+        if wait:
+            return wait
+        # A bucket left alone this long is full again, like a missing one
+        timeout = max(math.ceil(capacity / rate) for _, capacity, rate in buckets)
+        if cache is self.local:
+            for key, state in updates.items():
+                cache.set(key, state, timeout)
+        else:
+            cache.set_many(updates, timeout)
+        return 0
+
+
+class ThrottleMiddleware:
+    """Answers 429 once a client runs out of its budget for a group of paths
+
+    settings.THROTTLING["BUDGETS"] maps budget names to path prefixes and
+    to a rate per identifier, "ip" or "email". Requests are throttled
+    before any view, authentication or password check runs.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = getattr(settings, "THROTTLING", {})
+        self.store = BucketStore(
+            shared_cache=options.get("SHARED_CACHE"),
+            max_entries=options.get("MAX_ENTRIES", 100000),
+        )
+        self.budgets = []
+        for name, budget in options.get("BUDGETS", {}).items():
+            rates = {
+                identifier: parse_rate(rate)
+                for identifier, rate in budget["RATES"].items()
+            }
+            for prefix in budget["PATHS"]:
+                self.budgets.append((prefix, name, rates))
+        # The longest matching prefix wins
+        self.budgets.sort(key=lambda budget: len(budget[0]), reverse=True)
+
+    def __call__(self, request):
+        wait = self.check(request)
+        if wait:
+            retry_after = math.ceil(wait)
+            response = JsonResponse(
+                {
+                    "detail": "Request was throttled. "
+                    f"Expected available in {retry_after} seconds."
+                },
+                status=429,
+            )
+            response["Retry-After"] = str(retry_after)
+            return response
+        return self.get_response(request)
+
+    def check(self, request):
+        """Returns the seconds the request has to wait, or 0 when allowed"""
+        path = request.path_info
+        for prefix, name, rates in self.budgets:
+            if path.startswith(prefix):
+                break
+        else:
+            return 0
+        buckets = []
+        for identifier, (capacity, rate) in rates.items():
+            value = IDENTIFIERS[identifier](request)
+            if value is None:
+                continue
+            digest = hashlib.sha256(value.encode()).hexdigest()
+            buckets.append((f"throttle:{name}:{identifier}:{digest}", capacity, rate))
+        if not buckets:
+            return 0
+        return self.store.take(buckets, time.time())
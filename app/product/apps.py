@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class UserConfig(AppConfig):
     name = 'product'
+
+    def ready(self):
+        from product import signals  # noqa: F401
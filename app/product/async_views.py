@@ -0,0 +1,77 @@
+from asgiref.sync import sync_to_async
+from rest_framework import mixins, status
+from rest_framework.generics import GenericAPIView
+from rest_framework.response import Response
+
+from core.async_views import AsyncDispatchMixin
+from core.models import ProductModel
+from core.response_cache import AsyncCachedResponseMixin
+from core.routers import ReplicaReadMixin
+from core.serialization import OptimizedQuerysetMixin, ValuesSerializer
+from product.pagination import KeysetPagination
+from product.serializers import ProductFilterSerializer, ProductSerializer
+
+# Async counterparts of the views of the same name in product.views, routed
+# instead of them when settings.ASYNC_VIEWS is set. Serializer validation
+# and save() use the synchronous ORM, so writes run in a thread.
+
+
+class ListCreateProductAPIView(
+    AsyncDispatchMixin,
+    AsyncCachedResponseMixin,
+    ReplicaReadMixin,
+    mixins.CreateModelMixin,
+    GenericAPIView,
+):
+    serializer_class = ProductSerializer
+    values_serializer = ValuesSerializer(ProductSerializer)
+    queryset = ProductModel.objects.all()
+    pagination_class = KeysetPagination
+    cache_scope = "product"
+
+    def filter_queryset(self, queryset):
+        """Applies the product_type, flag, price and durability filters"""
+        params = ProductFilterSerializer(data=self.request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        return queryset.filter(**params.get_filters())
+
+    async def get(self, request, *args, **kwargs):
+        return await self.acached_get(self.alist, request, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.paginator.apaginate_queryset(queryset, request, view=self)
+        return self.get_paginated_response(page)
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.create)(request, *args, **kwargs)
+
+
+class RetrieveUpdateDestroyProductAPIView(
+    AsyncDispatchMixin,
+    AsyncCachedResponseMixin,
+    OptimizedQuerysetMixin,
+    mixins.UpdateModelMixin,
+    GenericAPIView,
+):
+    serializer_class = ProductSerializer
+    queryset = ProductModel.objects.all()
+    cache_scope = "product"
+
+    async def get(self, request, *args, **kwargs):
+        return await self.acached_get(self.aretrieve, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+    async def put(self, request, *args, **kwargs):
+        return await sync_to_async(self.update)(request, *args, **kwargs)
+
+    async def patch(self, request, *args, **kwargs):
+        return await sync_to_async(self.partial_update)(request, *args, **kwargs)
+
+    async def delete(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        await instance.adelete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,23 @@
+from django.db.models import Exists, OuterRef
+
+from core.models import Rental
+
+
+def overlapping(start_date, end_date):
+    """Returns rentals whose [start_date, end_date) range overlaps the given one"""
+    return Rental.objects.filter(start_date__lt=end_date, end_date__gt=start_date)
+
+
+def free_products(queryset, start_date, end_date):
+    """Narrows queryset to products that can be rented for the whole range
+
+    The overlap test is a correlated NOT EXISTS served by
+    rental_product_range_idx, so the whole catalogue is answered in one query.
+    """
+    days = (end_date - start_date).days
+    booked = overlapping(start_date, end_date).filter(product=OuterRef("pk"))
+    return queryset.filter(
+        availability=True,
+        needing_repair=False,
+        minimum_rent_period__lte=days,
+    ).exclude(Exists(booked))
@@ -0,0 +1,127 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.jobs import task
+from core.models import ProductModel, ProductTombstone
+
+
+class SyncExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = _("Deletes since this point were pruned, sync again from scratch")
+    default_code = "sync_expired"
+
+
+def get_options():
+    options = getattr(settings, "PRODUCT_CHANGES", {})
+    return {
+        "LAG": options.get("LAG", 5),
+        "RETENTION_DAYS": options.get("RETENTION_DAYS", 30),
+    }
+
+
+def encode_token(product_position, tombstone_position):
+    """Returns the opaque sync token of a pair of (timestamp, id) positions"""
+    raw = json.dumps(
+        {
+            "p": [product_position[0].isoformat(), product_position[1]],
+            "t": [tombstone_position[0].isoformat(), tombstone_position[1]],
+        }
+    )
+    return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_token(token):
+    """Returns the positions of a sync token, raising ValueError if it is not one"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = json.loads(urlsafe_b64decode(padded.encode()))
+        return tuple(
+            (datetime.fromisoformat(raw[key][0]), int(raw[key][1]))
+            for key in ("p", "t")
+        )
+    except (TypeError, ValueError, KeyError, IndexError):
+        raise ValueError("Invalid sync token")
+
+
+def after(queryset, field, position):
+    """Narrows queryset to rows ordered after the (field, id) position"""
+    if position is None:
+        return queryset
+    value, pk = position
+    return queryset.filter(**{f"{field}__gte": value}).exclude(
+        **{field: value, "id__lte": pk}
+    )
+
+
+def changes(values_serializer, positions, size):
+    """Returns one page of products changed and deleted after positions
+
+    positions is a (product, tombstone) pair of (timestamp, id) positions,
+    or None for a first sync, which skips deletes made before it. Both are
+    index range scans in (timestamp, id) order, so a page costs the same
+    however large the catalogue is. Rows newer than LAG seconds are left
+    to the next page, so writes committed late with an earlier timestamp
+    are not skipped. Once every delete up to until is sent, the tombstone
+    position moves up to it, so a client syncing within RETENTION_DAYS
+    keeps a live token even when nothing is deleted.
+    """
+    options = get_options()
+    until = timezone.now() - timedelta(seconds=options["LAG"])
+    if positions is None:
+        product_position, tombstone_position = None, (until, 0)
+    else:
+        product_position, tombstone_position = positions
+        horizon = timezone.now() - timedelta(days=options["RETENTION_DAYS"])
+        if tombstone_position[0] < horizon:
+            raise SyncExpired()
+
+    products = after(
+        ProductModel.objects.filter(updated_at__lte=until),
+        "updated_at",
+        product_position,
+    ).order_by("updated_at", "id")
+    rows, keys = values_serializer.page(products[: size + 1], ("updated_at", "id"))
+    tombstones = list(
+        after(
+            ProductTombstone.objects.filter(deleted_at__lte=until),
+            "deleted_at",
+            tombstone_position,
+        )
+        .order_by("deleted_at", "id")
+        .values_list("product_id", "deleted_at", "id")[: size + 1]
+    )
+
+    tombstones_left = len(tombstones) > size
+    has_more = len(rows) > size or tombstones_left
+    rows, keys, tombstones = rows[:size], keys[:size], tombstones[:size]
+    if keys:
+        product_position = keys[-1]
+    elif product_position is None:
+        # Nothing up to until exists yet, so the next sync starts there
+        product_position = (until, 0)
+    if tombstones:
+        tombstone_position = tombstones[-1][1:]
+    if not tombstones_left:
+        tombstone_position = max(tombstone_position, (until, 0))
+    return {
+        "changed": rows,
+        "deleted": [tombstone[0] for tombstone in tombstones],
+        "sync_token": encode_token(product_position, tombstone_position),
+        "has_more": has_more,
+    }
+
+
+@task
+def prune_tombstones(retention_days=None):
+    """Deletes tombstones older than RETENTION_DAYS, returning how many"""
+    if retention_days is None:
+        retention_days = get_options()["RETENTION_DAYS"]
+    horizon = timezone.now() - timedelta(days=retention_days)
+    return ProductTombstone.objects.filter(deleted_at__lt=horizon).delete()[0]
@@ -0,0 +1,133 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination seeking on (updated_at, id), newest first
+
+    Each page is an index range scan that starts at the cursor, so a page
+    deep into the table costs the same as the first one.
+    """
+
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = _("Invalid cursor")
+    key_fields = ("updated_at", "id")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.seek(queryset, request)
+        # Views with a values_serializer get serialized dicts back, see
+        # core.serialization.ValuesListMixin
+        values_serializer = getattr(view, "values_serializer", None)
+        if values_serializer is None:
+            rows = list(queryset)
+            keys = [(row.updated_at, row.pk) for row in rows]
+        else:
+            rows, keys = values_serializer.page(queryset, self.key_fields)
+        return self.trim(rows, keys)
+
+    async def apaginate_queryset(self, queryset, request, view):
+        """Like paginate_queryset(), for async views with a values_serializer"""
+        queryset = self.seek(queryset, request)
+        rows, keys = await view.values_serializer.apage(queryset, self.key_fields)
+        return self.trim(rows, keys)
+
+    def seek(self, queryset, request):
+        """Returns queryset ordered and sliced to the page after the cursor"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        if self.reverse:
+            queryset = queryset.order_by("updated_at", "id")
+        else:
+            queryset = queryset.order_by("-updated_at", "-id")
+        if self.position is not None:
+            updated_at, pk = self.position
+            if self.reverse:
+                queryset = queryset.filter(updated_at__gte=updated_at).exclude(
+                    updated_at=updated_at, id__lte=pk
+                )
+            else:
+                queryset = queryset.filter(updated_at__lte=updated_at).exclude(
+                    updated_at=updated_at, id__gte=pk
+                )
+        # One extra row tells whether there is a next page
+        return queryset[: self.size + 1]
+
+    def trim(self, rows, keys):
+        """Returns the rows of the page and sets the links around it"""
+        size, position, reverse = self.size, self.position, self.reverse
+        has_more = len(rows) > size
+        rows, keys = rows[:size], keys[:size]
+        if reverse:
+            rows.reverse()
+            keys.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows and (has_more or reverse):
+            self.next_position = keys[-1]
+        if rows and ((position is not None and not reverse) or (has_more and reverse)):
+            self.previous_position = keys[0]
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_link(self.next_position, reverse=False),
+                "previous": self.get_link(self.previous_position, reverse=True),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, self.encode_cursor(position, reverse)
+        )
+
+    def encode_cursor(self, position, reverse):
+        updated_at, pk = position
+        raw = json.dumps({"u": updated_at.isoformat(), "i": pk, "r": int(reverse)})
+        return urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        """Returns ((updated_at, id), reverse) for the cursor of the request"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            raw = json.loads(urlsafe_b64decode(padded.encode()))
+            position = (datetime.fromisoformat(raw["u"]), int(raw["i"]))
+            return position, bool(raw.get("r"))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,36 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class InvalidLine(ParseError):
+    """Stands in for a line of an NDJSON body that is not JSON"""
+
+
+class NDJSONParser(BaseParser):
+    """Parses newline delimited JSON lazily, one object per line
+
+    request.data is a generator, so rows are decoded as the view consumes
+    them instead of all at once. A line that is not JSON comes out as an
+    InvalidLine, so the view can report it with the other row errors
+    instead of failing halfway through the body.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        return self.rows(stream, encoding)
+
+    def rows(self, stream, encoding):
+        for number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line.decode(encoding))
+            except ValueError as exc:
+                yield InvalidLine(f"NDJSON parse error on line {number} - {exc}")
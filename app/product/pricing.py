@@ -0,0 +1,105 @@
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+QUOTE_COLUMNS = (
+    "id",
+    "price",
+    "minimum_rent_period",
+    "durability",
+    "max_durability",
+    "mileage",
+)
+
+# Largest id list sent in one IN clause
+ID_CHUNK_SIZE = 5000
+
+
+class PricingRule:
+    """Adjusts the prices of a whole batch of quotes at once
+
+    Rules get the billable days, the running prices and the product
+    columns as parallel sequences, and return the new prices.
+    """
+
+    def __init__(self, **options):
+        self.options = options
+
+    def apply(self, days, prices, columns):
+        return prices
+
+
+class LongRentalDiscount(PricingRule):
+    """Takes a percentage off rentals of at least a number of days"""
+
+    def __init__(self, tiers=None):
+        # {minimum days: percent off}, the largest reached tier wins
+        self.tiers = sorted((tiers or {7: 10, 30: 25}).items())
+
+    def percent(self, days):
+        off = 0
+        for minimum, percent in self.tiers:
+            if days >= minimum:
+                off = percent
+        return off
+
+    def apply(self, days, prices, columns):
+        factors = {d: 1 - self.percent(d) / 100 for d in set(days)}
+        return [price * factors[d] for d, price in zip(days, prices)]
+
+
+class WearSurcharge(PricingRule):
+    """Adds up to a percentage on products that are worn out
+
+    Wear is the share of max_durability that is used up.
+    """
+
+    def __init__(self, percent=20):
+        self.percent = percent / 100
+
+    def apply(self, days, prices, columns):
+        return [
+            price * (1 + self.percent * (1 - durability / maximum)) if maximum else price
+            for price, durability, maximum in zip(
+                prices, columns["durability"], columns["max_durability"]
+            )
+        ]
+
+
+@lru_cache(maxsize=None)
+def get_rules():
+    """Returns the rules listed in settings.RENTAL_PRICING_RULES"""
+    return tuple(
+        import_string(rule["CLASS"])(**rule.get("OPTIONS", {}))
+        for rule in getattr(settings, "RENTAL_PRICING_RULES", [])
+    )
+
+
+def fetch_columns(queryset, ids=None):
+    """Loads the quote columns of the products as parallel lists"""
+    if ids is None:
+        rows = list(queryset.values_list(*QUOTE_COLUMNS))
+    else:
+        rows = []
+        for start in range(0, len(ids), ID_CHUNK_SIZE):
+            chunk = ids[start : start + ID_CHUNK_SIZE]
+            rows.extend(queryset.filter(id__in=chunk).values_list(*QUOTE_COLUMNS))
+    return {
+        name: [row[index] for row in rows] for index, name in enumerate(QUOTE_COLUMNS)
+    }
+
+
+def quote(columns, start_date, end_date, rules=None):
+    """Prices a batch of products for renting from start_date to end_date
+
+    Returns the billable days and the price of every product, in the order
+    of columns["id"]. Rentals shorter than minimum_rent_period are billed
+    for the minimum.
+    """
+    days = (end_date - start_date).days
+    billable = [max(days, minimum) for minimum in columns["minimum_rent_period"]]
+    prices = [price * d for price, d in zip(columns["price"], billable)]
+    for rule in get_rules() if rules is None else rules:
+        prices = rule.apply(billable, prices, columns)
+    return billable, [round(price, 2) for price in prices]
@@ -0,0 +1,331 @@
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+from itertools import count
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import ProductModel, ProductTombstone
+from product.changes import get_options as get_change_options
+
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Score of a query term matching an indexed term exactly, as a prefix or
+# with one typo, multiplied by the weight of the field it was found in
+EXACT, PREFIX, FUZZY = 3, 2, 1
+FIELD_WEIGHTS = {"code": 2, "name": 1}
+
+# Shortest query and indexed terms that are matched with a typo
+FUZZY_MIN_LENGTH = 4
+
+# Postings up to this size are kept as tuples, which are much smaller
+SMALL_POSTING = 8
+
+BUILD_CHUNK_SIZE = 5000
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def document_terms(code, name):
+    """Returns the terms indexed for the code and the name of a product"""
+    code_terms = set(tokenize(code))
+    if len(code_terms) > 1:
+        # "AB-12" is also found as "ab12"
+        code_terms.add("".join(tokenize(code)))
+    return code_terms, set(tokenize(name))
+
+
+def deletions(term):
+    """Returns term and every string one deleted character away from it"""
+    return {term} | {term[:i] + term[i + 1 :] for i in range(len(term))}
+
+
+def within_one_edit(a, b):
+    """Tells whether a substitution, insertion, deletion or swap turns a into b"""
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < len(a) and i < len(b) and a[i] == b[i]:
+        i += 1
+    if len(a) > len(b):
+        return a[i + 1 :] == b[i:]
+    if len(a) < len(b):
+        return a[i:] == b[i + 1 :]
+    return a[i + 1 :] == b[i + 1 :] or (
+        a[i : i + 2] == b[i : i + 2][::-1] and a[i + 2 :] == b[i + 2 :]
+    )
+
+
+def is_fuzzy(term):
+    return len(term) >= FUZZY_MIN_LENGTH and not term.isdigit()
+
+
+def compact(pks):
+    return tuple(pks) if len(pks) <= SMALL_POSTING else set(pks)
+
+
+class Field:
+    """Inverted index of one product column
+
+    Terms are kept sorted for prefix lookups. Fuzzy fields also map every
+    single deletion of a term back to it, so typos are found without
+    scanning the vocabulary.
+    """
+
+    def __init__(self, postings=None, fuzzy=False):
+        self.postings = {term: compact(pks) for term, pks in (postings or {}).items()}
+        self.terms = sorted(self.postings)
+        self.fuzzy = fuzzy
+        self.variants = defaultdict(set)
+        if fuzzy:
+            for term in self.terms:
+                self._add_variants(term)
+
+    def add(self, term, pk):
+        posting = self.postings.get(term)
+        if posting is None:
+            self.postings[term] = (pk,)
+            insort(self.terms, term)
+            self._add_variants(term)
+        elif isinstance(posting, set):
+            posting.add(pk)
+        elif pk not in posting:
+            self.postings[term] = compact(posting + (pk,))
+
+    def discard(self, term, pk):
+        posting = self.postings.get(term)
+        if posting is None or pk not in posting:
+            return
+        if isinstance(posting, set):
+            posting.discard(pk)
+        else:
+            posting = self.postings[term] = tuple(p for p in posting if p != pk)
+        if posting:
+            return
+        del self.postings[term]
+        del self.terms[bisect_left(self.terms, term)]
+        if self.fuzzy and is_fuzzy(term):
+            for variant in deletions(term):
+                self.variants[variant].discard(term)
+                if not self.variants[variant]:
+                    del self.variants[variant]
+
+    def prefixed(self, prefix, limit):
+        """Returns up to limit terms that start with prefix, other than itself"""
+        terms = []
+        index = bisect_left(self.terms, prefix)
+        while index < len(self.terms) and len(terms) < limit:
+            term = self.terms[index]
+            if not term.startswith(prefix):
+                break
+            if term != prefix:
+                terms.append(term)
+            index += 1
+        return terms
+
+    def similar(self, term):
+        """Returns the terms one typo away from term"""
+        if not self.fuzzy or not is_fuzzy(term):
+            return set()
+        candidates = set()
+        for variant in deletions(term):
+            candidates |= self.variants.get(variant, set())
+        candidates.discard(term)
+        return {other for other in candidates if within_one_edit(term, other)}
+
+    def _add_variants(self, term):
+        if self.fuzzy and is_fuzzy(term):
+            for variant in deletions(term):
+                self.variants[variant].add(term)
+
+
+class SearchIndex:
+    """In-process index of product codes and names
+
+    The index is built on first use. Saves and deletes in this process
+    reach it through signals. Writes that send no signal, such as
+    bulk_create() or writes by other processes, are picked up through
+    updated_at and the delete tombstones at most refresh_interval seconds
+    later. Matches are read back from the database, so deleted products are
+    never returned.
+    """
+
+    def __init__(self, max_expansions=50, refresh_interval=1.0):
+        self.max_expansions = max_expansions
+        self.refresh_interval = refresh_interval
+        # Guards the index while it is read or changed
+        self.lock = threading.RLock()
+        # Held by the one thread building or refreshing, which reads the
+        # database without holding lock
+        self.update_lock = threading.Lock()
+        self.built = False
+
+    def build(self):
+        """Indexes every product from scratch, swapping the result in under lock"""
+        code_postings, name_postings = defaultdict(list), defaultdict(list)
+        documents, high_water = {}, None
+        started = timezone.now()
+        rows = ProductModel.objects.values_list("id", "code", "name", "updated_at")
+        for pk, code, name, updated_at in rows.iterator(chunk_size=BUILD_CHUNK_SIZE):
+            documents[pk] = (code, name)
+            code_terms, name_terms = document_terms(code, name)
+            for term in code_terms:
+                code_postings[term].append(pk)
+            for term in name_terms:
+                name_postings[term].append(pk)
+            if high_water is None or updated_at > high_water:
+                high_water = updated_at
+        with self.lock:
+            self.fields = {
+                "code": Field(code_postings),
+                "name": Field(name_postings, fuzzy=True),
+            }
+            self.documents = documents
+            self.high_water = high_water
+            self.deleted_since = started
+            self.refreshed_at = time.monotonic()
+            self.built = True
+
+    def refresh(self):
+        """Indexes the products updated and drops those deleted since the
+        last build or refresh
+
+        Like the change feed, it looks PRODUCT_CHANGES["LAG"] seconds further
+        back, so writes committed late with an earlier timestamp are not
+        skipped. Searches only wait while a row is indexed, not for the query.
+        """
+        lag = timedelta(seconds=get_change_options()["LAG"])
+        started = timezone.now()
+        rows = ProductModel.objects.values_list("id", "code", "name", "updated_at")
+        if self.high_water is not None:
+            rows = rows.filter(updated_at__gte=self.high_water - lag)
+        for pk, code, name, updated_at in rows.iterator(chunk_size=BUILD_CHUNK_SIZE):
+            self.add(pk, code, name)
+            if self.high_water is None or updated_at > self.high_water:
+                self.high_water = updated_at
+        deleted = ProductTombstone.objects.filter(
+            deleted_at__gte=self.deleted_since - lag
+        ).values_list("product_id", flat=True)
+        for pk in deleted.iterator(chunk_size=BUILD_CHUNK_SIZE):
+            self.remove(pk)
+        self.deleted_since = started
+        self.refreshed_at = time.monotonic()
+
+    def add(self, pk, code, name):
+        """Indexes a new product or reindexes a changed one"""
+        with self.lock:
+            if not self.built or self.documents.get(pk) == (code, name):
+                return
+            self.remove(pk)
+            self.documents[pk] = (code, name)
+            for field, terms in zip(self.fields.values(), document_terms(code, name)):
+                for term in terms:
+                    field.add(term, pk)
+
+    def remove(self, pk):
+        with self.lock:
+            if not self.built or pk not in self.documents:
+                return
+            code, name = self.documents.pop(pk)
+            for field, terms in zip(self.fields.values(), document_terms(code, name)):
+                for term in terms:
+                    field.discard(term, pk)
+
+    def search(self, query, limit=20):
+        """Returns the ids of the best matches, best first
+
+        Every query term has to match the code or the name of a product.
+        Products are ranked by the sum of their best match per term, ties
+        keep the order in which they were found.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        if not self.built:
+            # Nothing to search before the first build, so wait for it
+            with self.update_lock:
+                if not self.built:
+                    self.build()
+        elif self.stale() and self.update_lock.acquire(blocking=False):
+            # One thread refreshes, the others search what is indexed
+            try:
+                if self.stale():
+                    self.refresh()
+            finally:
+                self.update_lock.release()
+        with self.lock:
+            levels = [self.levels(term) for term in terms]
+            if not all(levels):
+                return []
+            return self.top(levels, limit)
+
+    def stale(self):
+        return time.monotonic() - self.refreshed_at >= self.refresh_interval
+
+    def levels(self, term):
+        """Returns the (score, posting) pairs a query term matches, best first"""
+        matches = []
+        for name, field in self.fields.items():
+            weight = FIELD_WEIGHTS[name]
+            if term in field.postings:
+                matches.append((EXACT * weight, field.postings[term]))
+            for other in field.prefixed(term, self.max_expansions):
+                matches.append((PREFIX * weight, field.postings[other]))
+            for other in field.similar(term):
+                matches.append((FUZZY * weight, field.postings[other]))
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return matches
+
+    def top(self, levels, limit):
+        """Returns the limit best products matching every term's levels
+
+        Candidates come from the term with the fewest postings, best level
+        first, and the other terms are probed for membership. Once limit
+        products are found, levels that cannot beat the worst of them are
+        skipped.
+        """
+        sizes = [sum(len(posting) for _, posting in term) for term in levels]
+        driver = levels.pop(sizes.index(min(sizes)))
+        others_best = sum(term[0][0] for term in levels)
+        found, seen, order = [], set(), count()
+        for score, posting in driver:
+            bound = score + others_best
+            if len(found) == limit and found[0][0] >= bound:
+                break
+            for pk in posting:
+                if len(found) == limit and found[0][0] >= bound:
+                    break
+                if pk in seen:
+                    continue
+                seen.add(pk)
+                total = score
+                for term in levels:
+                    best = next((s for s, p in term if pk in p), None)
+                    if best is None:
+                        break
+                    total += best
+                else:
+                    entry = (total, -next(order), pk)
+                    if len(found) < limit:
+                        heapq.heappush(found, entry)
+                    elif entry > found[0]:
+                        heapq.heapreplace(found, entry)
+        return [pk for _, _, pk in sorted(found, reverse=True)]
+
+
+@lru_cache(maxsize=None)
+def get_search_index():
+    """Returns the product index configured by settings.PRODUCT_SEARCH"""
+    options = getattr(settings, "PRODUCT_SEARCH", {})
+    return SearchIndex(
+        max_expansions=options.get("MAX_EXPANSIONS", 50),
+        refresh_interval=options.get("REFRESH_INTERVAL", 1.0),
+    )
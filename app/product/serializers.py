@@ -1,15 +1,100 @@
 # from user.serializers import BasicUserSerializer
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework.validators import UniqueValidator
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import gettext_lazy as _
-from core.models import ProductModel
+from core.models import ProductModel, Rental
+from product.availability import overlapping
+from product.changes import decode_token
 from django_currentuser.middleware import get_current_user
 
+NON_FIELD_ERRORS_KEY = api_settings.NON_FIELD_ERRORS_KEY
+
+
+class ProductListSerializer(serializers.ListSerializer):
+    """List serializer writing products with bulk queries
+
+    Rows are validated without the UniqueValidator of code, which queries
+    once per row; the caller checks a chunk with code_conflicts() instead.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.child.fields["code"]
+        unique = [v for v in field.validators if isinstance(v, UniqueValidator)]
+        self.code_message = unique[0].message if unique else None
+        field.validators = [v for v in field.validators if v not in unique]
+
+    def code_conflicts(self, validated_data, instances=None):
+        """Returns {position: errors} of rows whose code is taken, in one query
+
+        A row keeping the code of the instance it updates never conflicts;
+        other rows conflict with any other row or product using their code.
+        """
+        positions = {}
+        for position, data in enumerate(validated_data):
+            if "code" in data:
+                positions.setdefault(data["code"], []).append(position)
+        if not positions:
+            return {}
+        owners = dict(
+            ProductModel.objects.filter(code__in=positions).values_list("code", "id")
+        )
+        conflicts = {}
+        for code, rows in positions.items():
+            for position in rows:
+                owner = owners.get(code)
+                own = instances is not None and instances[position].pk == owner
+                if not own and (len(rows) > 1 or owner is not None):
+                    conflicts[position] = {"code": [self.code_message]}
+        return conflicts
+
+    def validate_row(self, row, instance=None):
+        """Returns (validated_data, errors) for one row of a bulk request"""
+        self.child.instance = instance
+        try:
+            return self.child.run_validation(row), None
+        except serializers.ValidationError as exc:
+            return None, exc.detail
+        finally:
+            self.child.instance = None
+
+    def create(self, validated_data):
+        return ProductModel.objects.bulk_create(
+            [ProductModel(**data) for data in validated_data]
+        )
+
+    def update(self, instances, validated_data):
+        """Saves every instance with one bulk UPDATE per batch
+
+        bulk_update skips Field.pre_save, so updated_at and updated_by are
+        filled in here the way save() would.
+        """
+        touched = [
+            field
+            for field in ProductModel._meta.concrete_fields
+            if getattr(field, "auto_now", False) or getattr(field, "on_update", False)
+        ]
+        fields = {field.name for field in touched}
+        for instance, data in zip(instances, validated_data):
+            for name, value in data.items():
+                setattr(instance, name, value)
+                fields.add(name)
+            for field in touched:
+                field.pre_save(instance, add=False)
+        ProductModel.objects.bulk_update(instances, sorted(fields))
+        return instances
+
 
 class ProductSerializer(serializers.ModelSerializer):
     """Serializer for Creating School"""
 
     class Meta:
         model = ProductModel
+        list_serializer_class = ProductListSerializer
         depth = 0
         fields = "__all__"
         read_only_fields = [
@@ -22,3 +107,158 @@ class ProductSerializer(serializers.ModelSerializer):
 
         def perform_create(self, serializer):
             serializer.save(created_by=get_current_user)
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    """Serializer for the product list query parameters"""
+
+    product_type = serializers.CharField(required=False, max_length=50)
+    availability = serializers.BooleanField(required=False)
+    needing_repair = serializers.BooleanField(required=False)
+    price_min = serializers.IntegerField(required=False, min_value=0)
+    price_max = serializers.IntegerField(required=False, min_value=0)
+    durability_min = serializers.IntegerField(required=False, min_value=0)
+    durability_max = serializers.IntegerField(required=False, min_value=0)
+
+    lookups = {
+        "product_type": "product_type",
+        "availability": "availability",
+        "needing_repair": "needing_repair",
+        "price_min": "price__gte",
+        "price_max": "price__lte",
+        "durability_min": "durability__gte",
+        "durability_max": "durability__lte",
+    }
+
+    def get_filters(self):
+        """Returns the ORM lookups of the validated parameters"""
+        return {
+            self.lookups[name]: value
+            for name, value in self.validated_data.items()
+            if name in self.lookups
+        }
+
+
+class AvailabilityFilterSerializer(ProductFilterSerializer):
+    """Serializer for the availability query parameters"""
+
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+
+    def validate(self, attrs):
+        if attrs["end_date"] <= attrs["start_date"]:
+            raise serializers.ValidationError(
+                _("end_date must be after start_date"), code="range"
+            )
+        return attrs
+
+
+class RentalSerializer(serializers.ModelSerializer):
+    """Serializer for booking a product"""
+
+    class Meta:
+        model = Rental
+        fields = "__all__"
+        read_only_fields = [
+            "id",
+            "created_at",
+            "updated_at",
+            "created_by",
+            "updated_by",
+        ]
+
+    def validate(self, attrs):
+        product = attrs.get("product", getattr(self.instance, "product", None))
+        start_date = attrs.get("start_date", getattr(self.instance, "start_date", None))
+        end_date = attrs.get("end_date", getattr(self.instance, "end_date", None))
+        if end_date <= start_date:
+            raise serializers.ValidationError(
+                _("end_date must be after start_date"), code="range"
+            )
+        if (end_date - start_date).days < product.minimum_rent_period:
+            raise serializers.ValidationError(
+                _("Product must be rented for at least %(days)s days")
+                % {"days": product.minimum_rent_period},
+                code="minimum_rent_period",
+            )
+        return attrs
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            self.check_free(validated_data)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            self.check_free(validated_data, instance)
+            return super().update(instance, validated_data)
+
+    def check_free(self, validated_data, instance=None):
+        """Rejects the booking if another rental overlaps it
+
+        The product row is locked first, so concurrent bookings of the same
+        product run this check one after another.
+        """
+        product = validated_data.get("product", getattr(instance, "product", None))
+        product = ProductModel.objects.select_for_update().get(pk=product.pk)
+        if not product.availability or product.needing_repair:
+            raise serializers.ValidationError(
+                {NON_FIELD_ERRORS_KEY: [_("Product is not available for rent")]},
+                code="unavailable",
+            )
+        start_date = validated_data.get(
+            "start_date", getattr(instance, "start_date", None)
+        )
+        end_date = validated_data.get("end_date", getattr(instance, "end_date", None))
+        clashes = overlapping(start_date, end_date).filter(product=product)
+        if instance is not None:
+            clashes = clashes.exclude(pk=instance.pk)
+        if clashes.exists():
+            message = _("Product is already booked for these dates")
+            raise serializers.ValidationError(
+                {NON_FIELD_ERRORS_KEY: [message]}, code="overlap"
+            )
+
+
+class QuoteSerializer(AvailabilityFilterSerializer):
+    """Serializer for a batch price quote, by product ids or by filters"""
+
+    products = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), required=False, max_length=100000
+    )
+
+
+class SearchSerializer(serializers.Serializer):
+    """Serializer for the product search query parameters"""
+
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(
+        required=False, default=20, min_value=1, max_value=100
+    )
+
+
+class ChangesSerializer(serializers.Serializer):
+    """Serializer for the change feed query parameters
+
+    since takes the sync_token of the previous page or an ISO 8601
+    timestamp, and validates to the positions to resume from.
+    """
+
+    since = serializers.CharField(required=False, max_length=200)
+    page_size = serializers.IntegerField(
+        required=False, default=500, min_value=1, max_value=5000
+    )
+
+    def validate_since(self, value):
+        try:
+            return decode_token(value)
+        except ValueError:
+            pass
+        moment = parse_datetime(value)
+        if moment is None:
+            raise serializers.ValidationError(
+                _("Expected a sync token or an ISO 8601 timestamp"), code="invalid"
+            )
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return (moment, 0), (moment, 0)
@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import ProductModel, ProductTombstone
+from core.response_cache import get_response_cache
+from product.search import get_search_index
+
+
+@receiver(post_save, sender=ProductModel)
+def index_product(sender, instance, **kwargs):
+    """Keeps the search index of this process in step with a saved product"""
+    pk, code, name = instance.pk, instance.code, instance.name
+    transaction.on_commit(lambda: get_search_index().add(pk, code, name))
+
+
+@receiver(post_delete, sender=ProductModel)
+def unindex_product(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: get_search_index().remove(pk))
+
+
+def invalidate_products(pks):
+    """Drops cached product lists and the cached details of pks once committed"""
+    if not pks:
+        return
+    scopes = ["product", *(f"product:{pk}" for pk in pks)]
+    transaction.on_commit(lambda: get_response_cache().bump(*scopes))
+
+
+@receiver(post_save, sender=ProductModel)
+@receiver(post_delete, sender=ProductModel)
+def invalidate_product(sender, instance, **kwargs):
+    invalidate_products([instance.pk])
+
+
+@receiver(post_save, sender=ProductModel)
+def forget_tombstone(sender, instance, created, **kwargs):
+    """Drops the tombstone of a product saved again under its old id"""
+    if created:
+        ProductTombstone.objects.filter(product_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=ProductModel)
+def record_tombstone(sender, instance, **kwargs):
+    """Records the delete in the same transaction, for the change feed"""
+    ProductTombstone.objects.create(product_id=instance.pk)
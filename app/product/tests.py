@@ -0,0 +1,154 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.factories import create_products
+from core.models import ProductModel
+from product import views
+from product.changes import encode_token
+from product.search import SearchIndex
+
+
+@override_settings(THROTTLING={}, PRODUCT_CHANGES={"LAG": 0, "RETENTION_DAYS": 30})
+class ProductChangesTests(TestCase):
+    """The change feed pages through a first sync and then returns only what
+    changed, in a constant number of queries"""
+
+    products = 2000
+    page_size = 500
+    # Per page
+    queries = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        create_products(cls.products)
+
+    def sync(self, since=None):
+        """Follows the feed to its end, returning the rows, the token and stats"""
+        changed, deleted, pages, size = {}, set(), 0, 0
+        has_more = True
+        while has_more:
+            params = {"page_size": self.page_size}
+            if since:
+                params["since"] = since
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get("/product/changes/", params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(captured), self.queries)
+            data = response.json()
+            pages += 1
+            size += len(response.content)
+            changed.update((row["id"], row) for row in data["changed"])
+            deleted.update(data["deleted"])
+            since, has_more = data["sync_token"], data["has_more"]
+        return changed, deleted, since, {"pages": pages, "bytes": size}
+
+    def test_first_and_delta_sync(self):
+        changed, deleted, token, stats = self.sync()
+        self.assertEqual(len(changed), self.products)
+        self.assertFalse(deleted)
+        full_bytes = stats["bytes"]
+
+        products = list(ProductModel.objects.order_by("?")[:5])
+        for product in products[:3]:
+            product.name = "Synced"
+            product.save()
+        removed = {product.pk for product in products[3:]}
+        ProductModel.objects.filter(pk__in=removed).delete()
+
+        changed, deleted, token, stats = self.sync(token)
+        self.assertEqual(set(changed), {product.pk for product in products[:3]})
+        self.assertEqual(deleted, removed)
+        self.assertTrue(all(row["name"] == "Synced" for row in changed.values()))
+        self.assertLess(stats["bytes"] * 50, full_bytes)
+
+        changed, deleted, _, stats = self.sync(token)
+        self.assertFalse(changed or deleted, "a sync right after another")
+        self.assertEqual(stats["pages"], 1)
+
+    def test_daily_sync(self):
+        """Syncs once a day past RETENTION_DAYS without any delete"""
+        token = self.sync()[2]
+        start = timezone.now()
+        for day in range(1, 41):
+            with mock.patch.object(
+                timezone, "now", return_value=start + timedelta(days=day)
+            ):
+                response = self.client.get("/product/changes/", {"since": token})
+            self.assertEqual(response.status_code, 200, f"day {day}")
+            token = response.json()["sync_token"]
+
+    def test_pruned_token(self):
+        old = timezone.now() - timedelta(days=31)
+        response = self.client.get(
+            "/product/changes/", {"since": encode_token((old, 0), (old, 0))}
+        )
+        self.assertEqual(response.status_code, 410)
+
+    def test_malformed_since(self):
+        response = self.client.get("/product/changes/", {"since": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(THROTTLING={})
+class BulkProductTests(TestCase):
+    """Bad bodies and lines are rejected without writing half of a request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_products(5)
+
+    def test_not_a_list(self):
+        for body in ("5", "null", '"products"', '{"id": 1}'):
+            with self.subTest(body):
+                response = self.client.post(
+                    "/product/bulk/", body, content_type="application/json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_invalid_line(self):
+        """A bad line after a committed chunk is reported with the rows"""
+        pks = list(ProductModel.objects.values_list("id", flat=True))
+        lines = [str(pk) for pk in pks[:2]] + ["{not json"] + [str(pks[2])]
+        with mock.patch.object(views.BulkProductAPIView, "chunk_size", 1):
+            response = self.client.delete(
+                "/product/bulk/",
+                "\n".join(lines),
+                content_type="application/x-ndjson",
+            )
+        self.assertEqual(response.status_code, 207)
+        data = response.json()
+        self.assertEqual(data["deleted"], 3)
+        self.assertEqual([error["index"] for error in data["errors"]], [2])
+        self.assertIn("line 3", data["errors"][0]["errors"][0])
+        self.assertEqual(ProductModel.objects.count(), 2)
+
+
+@override_settings(PRODUCT_CHANGES={"LAG": 5, "RETENTION_DAYS": 30})
+class SearchIndexTests(TestCase):
+    """A refresh picks up what other processes wrote and deleted"""
+
+    def test_refresh(self):
+        create_products(3)
+        late, kept, deleted = ProductModel.objects.order_by("id")
+        ProductModel.objects.filter(pk=deleted.pk).update(name="Doomed")
+        index = SearchIndex()
+        index.build()
+        self.assertEqual(index.search("doomed"), [deleted.pk])
+
+        # Committed after the build with an earlier timestamp, and deleted,
+        # as another process would: on_commit never runs in a TestCase
+        ProductModel.objects.filter(pk=late.pk).update(
+            name="Latecomer", updated_at=index.high_water - timedelta(seconds=1)
+        )
+        ProductModel.objects.filter(pk=deleted.pk).delete()
+        self.assertIn(deleted.pk, index.documents)
+        index.refresh()
+        self.assertEqual(index.search("latecomer"), [late.pk])
+        self.assertEqual(index.search("doomed"), [])
+        self.assertNotIn(deleted.pk, index.documents)
+        self.assertIn(kept.pk, index.documents)
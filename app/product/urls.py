@@ -1,12 +1,34 @@
+from django.conf import settings
 from django.urls import path
-from product import views
+from product import async_views, views
+
+# Endpoints served by an async view under settings.ASYNC_VIEWS
+api = async_views if settings.ASYNC_VIEWS else views
 
 app_name = "product"
 urlpatterns = [
-    path("", views.ListCreateProductAPIView.as_view(), name="product_create_list"),
+    path("", api.ListCreateProductAPIView.as_view(), name="product_create_list"),
+    path("bulk/", views.BulkProductAPIView.as_view(), name="product_bulk"),
+    path("export/", views.ProductExportAPIView.as_view(), name="product_export"),
+    path("search/", views.ProductSearchAPIView.as_view(), name="product_search"),
+    path("changes/", views.ProductChangesAPIView.as_view(), name="product_changes"),
     path(
         "<int:pk>/",
-        views.RetrieveUpdateDestroyProductAPIView.as_view(),
+        api.RetrieveUpdateDestroyProductAPIView.as_view(),
         name="product_retrive_delete_update",
     ),
+    path(
+        "availability/",
+        views.ProductAvailabilityAPIView.as_view(),
+        name="product_availability",
+    ),
+    path("quote/", views.ProductQuoteAPIView.as_view(), name="product_quote"),
+    path(
+        "rentals/", views.ListCreateRentalAPIView.as_view(), name="rental_create_list"
+    ),
+    path(
+        "rentals/<int:pk>/",
+        views.RetrieveUpdateDestroyRentalAPIView.as_view(),
+        name="rental_retrive_delete_update",
+    ),
 ]
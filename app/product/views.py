@@ -1,7 +1,43 @@
+from collections.abc import Iterator
+from itertools import compress, islice
+
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
-from product.serializers import ProductSerializer
-from core.models import ProductModel
-from rest_framework.generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView
+from rest_framework.response import Response
+from core.export import export_response
+from core.response_cache import CachedResponseMixin
+from core.routers import ReplicaReadMixin
+from core.serialization import (
+    OptimizedQuerysetMixin,
+    ValuesListMixin,
+    ValuesSerializer,
+)
+from product.availability import free_products
+from product.changes import changes
+from product.pagination import KeysetPagination
+from product.parsers import InvalidLine, NDJSONParser
+from product.pricing import fetch_columns, quote
+from product.search import get_search_index
+from product.signals import invalidate_products
+from product.serializers import (
+    AvailabilityFilterSerializer,
+    ChangesSerializer,
+    ProductFilterSerializer,
+    ProductSerializer,
+    QuoteSerializer,
+    RentalSerializer,
+    SearchSerializer,
+)
+from core.models import ProductModel, Rental
+from rest_framework.generics import (
+    GenericAPIView,
+    ListAPIView,
+    ListCreateAPIView,
+    RetrieveUpdateDestroyAPIView,
+)
 
 
 def get_or_none(classmodel, **kwargs):
@@ -11,19 +47,331 @@ def get_or_none(classmodel, **kwargs):
         return None
 
 
-class ListCreateProductAPIView(ListCreateAPIView):
+class ListCreateProductAPIView(
+    CachedResponseMixin, ReplicaReadMixin, ValuesListMixin, ListCreateAPIView
+):
     serializer_class = ProductSerializer
+    values_serializer = ValuesSerializer(ProductSerializer)
     queryset = ProductModel.objects.all()
+    pagination_class = KeysetPagination
+    cache_scope = "product"
     # permission_classes = [
     #     IsAuthenticated,
     # ]
 
+    def filter_queryset(self, queryset):
+        """Applies the product_type, flag, price and durability filters"""
+        params = ProductFilterSerializer(data=self.request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        return queryset.filter(**params.get_filters())
+
+
+class ProductExportAPIView(GenericAPIView):
+    """Streams every product matching the list filters as NDJSON or CSV"""
+
+    serializer_class = ProductSerializer
+    queryset = ProductModel.objects.all()
+    values_serializer = ValuesSerializer(ProductSerializer)
+
+    def get(self, request):
+        params = ProductFilterSerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        queryset = self.get_queryset().filter(**params.get_filters()).order_by("id")
+        return export_response(
+            request,
+            self.values_serializer,
+            queryset,
+            request.query_params.get("output", "ndjson"),
+            "products",
+        )
+
+
+class ProductSearchAPIView(ReplicaReadMixin, GenericAPIView):
+    """Finds products by code or name, allowing prefixes and typos, best first"""
+
+    serializer_class = ProductSerializer
+    values_serializer = ValuesSerializer(ProductSerializer)
+    queryset = ProductModel.objects.all()
+
+    def get(self, request):
+        params = SearchSerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        index = get_search_index()
+        ids = index.search(params.validated_data["q"], params.validated_data["limit"])
+        rows = {
+            row["id"]: row
+            for row in self.values_serializer.data(
+                self.get_queryset().filter(id__in=ids)
+            )
+        }
+        for pk in ids:
+            if pk not in rows:
+                # Deleted by another process since it was indexed
+                index.remove(pk)
+        return Response({"results": [rows[pk] for pk in ids if pk in rows]})
+
 
-class RetrieveUpdateDestroyProductAPIView(RetrieveUpdateDestroyAPIView):
+class ProductChangesAPIView(GenericAPIView):
+    """Lists products changed and deleted since a sync token, oldest first
+
+    Clients follow sync_token while has_more is set and keep the last one
+    for their next sync. Reads stay on default, since a replica behind by
+    more than PRODUCT_CHANGES["LAG"] would let rows slip past a token.
+    """
+
+    serializer_class = ProductSerializer
+    values_serializer = ValuesSerializer(ProductSerializer)
+    queryset = ProductModel.objects.all()
+
+    def get(self, request):
+        params = ChangesSerializer(data=request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        data = changes(
+            self.values_serializer,
+            params.validated_data.get("since"),
+            params.validated_data["page_size"],
+        )
+        return Response(data)
+
+
+class RetrieveUpdateDestroyProductAPIView(
+    CachedResponseMixin, OptimizedQuerysetMixin, RetrieveUpdateDestroyAPIView
+):
     serializer_class = ProductSerializer
     queryset = ProductModel.objects.all()
+    cache_scope = "product"
     # permission_classes = [
     #     IsAuthenticated,
     # ]
 
 
+class ProductAvailabilityAPIView(ReplicaReadMixin, ValuesListMixin, ListAPIView):
+    """Lists products free for rent between start_date and end_date"""
+
+    serializer_class = ProductSerializer
+    values_serializer = ValuesSerializer(ProductSerializer)
+    queryset = ProductModel.objects.all()
+    pagination_class = KeysetPagination
+
+    def filter_queryset(self, queryset):
+        params = AvailabilityFilterSerializer(data=self.request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        queryset = queryset.filter(**params.get_filters())
+        return free_products(
+            queryset,
+            params.validated_data["start_date"],
+            params.validated_data["end_date"],
+        )
+
+
+class ListCreateRentalAPIView(
+    ReplicaReadMixin, OptimizedQuerysetMixin, ListCreateAPIView
+):
+    serializer_class = RentalSerializer
+    queryset = Rental.objects.all()
+    pagination_class = KeysetPagination
+
+    def filter_queryset(self, queryset):
+        product = self.request.query_params.get("product")
+        if product and product.isdigit():
+            queryset = queryset.filter(product_id=product)
+        return queryset
+
+
+class RetrieveUpdateDestroyRentalAPIView(
+    OptimizedQuerysetMixin, RetrieveUpdateDestroyAPIView
+):
+    serializer_class = RentalSerializer
+    queryset = Rental.objects.all()
+
+
+class ProductQuoteAPIView(GenericAPIView):
+    """Prices the rental of many products in one call"""
+
+    serializer_class = QuoteSerializer
+    queryset = ProductModel.objects.all()
+
+    def post(self, request):
+        """Returns the rental price of every matching product"""
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        start_date = serializer.validated_data["start_date"]
+        end_date = serializer.validated_data["end_date"]
+
+        queryset = self.get_queryset().filter(**serializer.get_filters())
+        columns = fetch_columns(queryset, serializer.validated_data.get("products"))
+        days, prices = quote(columns, start_date, end_date)
+        data = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "quotes": [
+                {"product": pk, "days": d, "price": price}
+                for pk, d, price in zip(columns["id"], days, prices)
+            ],
+        }
+        return Response(status=status.HTTP_200_OK, data=data)
+
+
+class BulkProductAPIView(GenericAPIView):
+    """Creates, updates or deletes many products per request
+
+    Takes a JSON array or NDJSON and writes it in chunks, one transaction
+    and one bulk query per chunk. Rows that fail validation are reported by
+    their index and do not stop the others.
+    """
+
+    serializer_class = ProductSerializer
+    queryset = ProductModel.objects.all()
+    parser_classes = [JSONParser, NDJSONParser]
+    chunk_size = 1000
+
+    def get_chunks(self, request, errors):
+        """Yields lists of (index, row) pairs of at most chunk_size rows
+
+        Rows the parser could not read go to errors instead.
+        """
+        data = request.data
+        if not isinstance(data, (list, Iterator)):
+            raise ParseError("Expected a list of items")
+        rows = self.get_rows(data, errors)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    @staticmethod
+    def get_rows(data, errors):
+        for index, row in enumerate(data):
+            if isinstance(row, InvalidLine):
+                errors.append({"index": index, "errors": [row.detail]})
+            else:
+                yield index, row
+
+    @staticmethod
+    def get_pk(value):
+        """Returns value if it can be a product id, else None"""
+        if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+            return value
+        return None
+
+    def drop_conflicts(self, serializer, errors, indexes, valid, matched=None):
+        """Moves the rows whose code is taken to errors, keeping the others"""
+        conflicts = serializer.code_conflicts(valid, matched)
+        for position, row_errors in sorted(conflicts.items()):
+            errors.append({"index": indexes[position], "errors": row_errors})
+        kept = [position not in conflicts for position in range(len(valid))]
+        if matched is None:
+            return list(compress(indexes, kept)), list(compress(valid, kept))
+        return (
+            list(compress(indexes, kept)),
+            list(compress(valid, kept)),
+            list(compress(matched, kept)),
+        )
+
+    def write_chunk(self, indexes, errors, write):
+        """Runs write in a transaction, charging a failure to every row"""
+        try:
+            with transaction.atomic():
+                return write()
+        except IntegrityError as exc:
+            errors.extend({"index": index, "errors": [str(exc)]} for index in indexes)
+            return []
+
+    def post(self, request):
+        """Creates a product for every row"""
+        serializer = self.get_serializer(many=True)
+        ids, errors = [], []
+        for chunk in self.get_chunks(request, errors):
+            indexes, valid = [], []
+            for index, row in chunk:
+                data, row_errors = serializer.validate_row(row)
+                if row_errors:
+                    errors.append({"index": index, "errors": row_errors})
+                else:
+                    indexes.append(index)
+                    valid.append(data)
+            indexes, valid = self.drop_conflicts(serializer, errors, indexes, valid)
+            if valid:
+                created = self.write_chunk(
+                    indexes, errors, lambda: serializer.create(valid)
+                )
+                ids.extend(product.pk for product in created)
+        # bulk_create sends no post_save
+        invalidate_products(ids)
+        return self.bulk_response(
+            {"created": len(ids), "ids": ids}, errors, status.HTTP_201_CREATED
+        )
+
+    def put(self, request):
+        """Replaces the products identified by the id of every row"""
+        return self.update(request, partial=False)
+
+    def patch(self, request):
+        """Partially updates the products identified by the id of every row"""
+        return self.update(request, partial=True)
+
+    def update(self, request, partial):
+        serializer = self.get_serializer(many=True, partial=partial)
+        ids, errors = [], []
+        for chunk in self.get_chunks(request, errors):
+            pks = [
+                self.get_pk(row.get("id") if isinstance(row, dict) else None)
+                for _, row in chunk
+            ]
+            instances = self.get_queryset().in_bulk([pk for pk in pks if pk])
+            indexes, matched, valid = [], [], []
+            for (index, row), pk in zip(chunk, pks):
+                instance = instances.get(pk)
+                if instance is None:
+                    errors.append({"index": index, "errors": {"id": ["Not found."]}})
+                    continue
+                data, row_errors = serializer.validate_row(row, instance)
+                if row_errors:
+                    errors.append({"index": index, "errors": row_errors})
+                else:
+                    indexes.append(index)
+                    matched.append(instance)
+                    valid.append(data)
+            indexes, valid, matched = self.drop_conflicts(
+                serializer, errors, indexes, valid, matched
+            )
+            if valid:
+                updated = self.write_chunk(
+                    indexes, errors, lambda: serializer.update(matched, valid)
+                )
+                ids.extend(product.pk for product in updated)
+        invalidate_products(ids)
+        return self.bulk_response(
+            {"updated": len(ids), "ids": ids}, errors, status.HTTP_200_OK
+        )
+
+    def delete(self, request):
+        """Deletes the products whose ids are listed"""
+        deleted, errors = 0, []
+        for chunk in self.get_chunks(request, errors):
+            pks = [self.get_pk(pk) for _, pk in chunk]
+            found = set(
+                self.get_queryset()
+                .filter(id__in=[pk for pk in pks if pk])
+                .values_list("id", flat=True)
+            )
+            indexes = []
+            for (index, _), pk in zip(chunk, pks):
+                if pk in found:
+                    indexes.append(index)
+                else:
+                    errors.append({"index": index, "errors": {"id": ["Not found."]}})
+            if found and self.write_chunk(
+                indexes,
+                errors,
+                lambda: self.get_queryset().filter(id__in=found).delete(),
+            ):
+                deleted += len(found)
+        return self.bulk_response({"deleted": deleted}, errors, status.HTTP_200_OK)
+
+    def bulk_response(self, data, errors, success_status):
+        data["errors"] = sorted(errors, key=lambda error: error["index"])
+        if errors:
+            return Response(status=status.HTTP_207_MULTI_STATUS, data=data)
+        return Response(status=success_status, data=data)
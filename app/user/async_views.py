@@ -0,0 +1,124 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.contrib.auth.signals import user_logged_in
+from rest_framework import generics, mixins, permissions, serializers, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from core.async_views import AsyncDispatchMixin
+from core.models import User
+from core.routers import ReplicaReadMixin
+from core.serialization import ValuesSerializer
+from user.oauth import issue_token, revoke_token
+from user.serializers import (
+    BasicUserSerializer,
+    CredentialsSerializer,
+    LoginSerializer,
+    LogoutSerializer,
+    UserSerializer,
+)
+
+# Async counterparts of the views of the same name in user.views, routed
+# instead of them when settings.ASYNC_VIEWS is set. Token issuance and
+# serializer writes use the synchronous ORM, so they run in a thread.
+
+
+class UserAPIView(
+    AsyncDispatchMixin,
+    ReplicaReadMixin,
+    mixins.CreateModelMixin,
+    generics.GenericAPIView,
+):
+    serializer_class = UserSerializer
+    values_serializer = ValuesSerializer(UserSerializer)
+    queryset = User.objects.all()
+    permission_classes = [
+        IsAuthenticated,
+    ]
+
+    async def get(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(await self.values_serializer.adata(queryset))
+
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.create)(request, *args, **kwargs)
+
+
+class UserCreateView(AsyncDispatchMixin, generics.GenericAPIView):
+    """Creates a new user to the system"""
+
+    serializer_class = BasicUserSerializer
+    permission_classes = [
+        permissions.AllowAny,
+    ]
+
+    async def post(self, request):
+        """Create a user and returns access_token"""
+        serializer = self.serializer_class(data=request.data)
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        user = await sync_to_async(serializer.save)()
+        user.is_active = True
+        user.is_staff = True
+        await user.asave()
+        data, token_status = await sync_to_async(issue_token)(
+            request,
+            serializer.validated_data["email"],
+            serializer.validated_data["password"],
+            user=user,
+        )
+        data["id"] = user.id
+        return Response(status=token_status, data=data)
+
+
+class UserLoginView(AsyncDispatchMixin, generics.GenericAPIView):
+    """Logs in Admin user to the system"""
+
+    serializer_class = LoginSerializer
+    permission_classes = [
+        permissions.AllowAny,
+    ]
+
+    async def post(self, request):
+        """Logs in user to the system"""
+        serializer = CredentialsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        email = serializer.validated_data["email"]
+        password = serializer.validated_data["password"]
+
+        user = await aauthenticate(request=request, username=email, password=password)
+        if not user:
+            raise serializers.ValidationError(
+                {
+                    api_settings.NON_FIELD_ERRORS_KEY: [
+                        LoginSerializer.authentication_failed
+                    ]
+                },
+                code="authenticate",
+            )
+        data, token_status = await sync_to_async(issue_token)(
+            request, email, password, user=user
+        )
+        if token_status == status.HTTP_200_OK:
+            await user_logged_in.asend(
+                sender=user.__class__, request=request, user=user
+            )
+        return Response(status=token_status, data=data)
+
+
+class UserLogoutView(AsyncDispatchMixin, generics.GenericAPIView):
+    """Log out and revoke token"""
+
+    serializer_class = LogoutSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    async def post(self, request):
+        """Revoke access token and logout user"""
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        revoke_status = await sync_to_async(revoke_token)(
+            request, serializer.data.get("token", None)
+        )
+        if revoke_status != status.HTTP_200_OK:
+            return Response(status=revoke_status, data="Token was not revoked.")
+        return Response(status=status.HTTP_200_OK, data="Successfully logged out.")
@@ -0,0 +1,175 @@
+import copy
+import hashlib
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http.request import RawPostDataException
+from django.utils import timezone
+from oauth2_provider.contrib.rest_framework import OAuth2Authentication
+
+from core.cache import LRUCache
+
+
+class CachedAccessToken:
+    """Cached copy of a validated access token, answering the same scope checks"""
+
+    def __init__(self, token_key, user_id, scope, expires):
+        self.token_key = token_key
+        self.user_id = user_id
+        self.scope = scope
+        self.expires = expires
+
+    def is_expired(self):
+        return timezone.now() >= self.expires
+
+    def allow_scopes(self, scopes):
+        if not scopes:
+            return True
+        return set(scopes).issubset(set(self.scope.split()))
+
+    def is_valid(self, scopes=None):
+        return not self.is_expired() and self.allow_scopes(scopes)
+
+
+class TokenCache:
+    """Maps bearer tokens to (user, token) through a local LRU and a shared cache
+
+    Invalidation only reaches the local LRU of the process that made the
+    change, so TIMEOUT bounds how long other workers may keep a revoked token.
+    """
+
+    def __init__(self, max_entries=10000, timeout=60, shared_cache=None):
+        self.timeout = timeout
+        self.local = LRUCache(max_entries=max_entries, timeout=timeout)
+        self.shared = caches[shared_cache] if shared_cache else None
+
+    @staticmethod
+    def key(token):
+        return "oauth2-token:" + hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def user_key(user_id):
+        return f"oauth2-token-user:{user_id}"
+
+    def get(self, token):
+        """Returns a (user, token) pair for a still valid cached token"""
+        key = self.key(token)
+        entry = self.local.get(key)
+        if entry is None and self.shared is not None:
+            entry = self._get_shared(key)
+            if entry is not None:
+                self.local.set(key, entry, self._ttl(entry[1]))
+        if entry is None or entry[1].is_expired():
+            return None
+        user, access_token = entry
+        # Views mutate request.user, so never hand out the cached instance
+        return copy.copy(user), access_token
+
+    def set(self, token, user, access_token):
+        key = self.key(token)
+        entry = (
+            user,
+            CachedAccessToken(key, user.pk, access_token.scope, access_token.expires),
+        )
+        ttl = self._ttl(entry[1])
+        if ttl <= 0:
+            return
+        if self.shared is not None:
+            generation = self.shared.get(self.user_key(user.pk), 0)
+            self.shared.set(key, (entry, generation), ttl)
+        self.local.set(key, entry, ttl)
+
+    def invalidate_token(self, token):
+        key = self.key(token)
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def invalidate_user(self, user_id):
+        """Drops every cached token of a user, e.g. after a password change"""
+        self.local.delete_where(lambda entry: entry[1].user_id == user_id)
+        if self.shared is not None:
+            try:
+                self.shared.incr(self.user_key(user_id))
+            except ValueError:
+                self.shared.set(self.user_key(user_id), 1, None)
+
+    def clear(self):
+        self.local.clear()
+
+    def _get_shared(self, key):
+        cached = self.shared.get(key)
+        if cached is None:
+            return None
+        entry, generation = cached
+        if self.shared.get(self.user_key(entry[1].user_id), 0) != generation:
+            return None
+        return entry
+
+    def _ttl(self, access_token):
+        remaining = (access_token.expires - timezone.now()).total_seconds()
+        return int(min(self.timeout, remaining))
+
+
+@lru_cache(maxsize=None)
+def get_token_cache():
+    """Returns the token cache configured by settings.OAUTH2_TOKEN_CACHE"""
+    options = getattr(settings, "OAUTH2_TOKEN_CACHE", {})
+    return TokenCache(
+        max_entries=options.get("MAX_ENTRIES", 10000),
+        timeout=options.get("TIMEOUT", 60),
+        shared_cache=options.get("SHARED_CACHE"),
+    )
+
+
+def get_bearer_token(request):
+    """Returns the bearer token of the Authorization header, if any"""
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def has_token_parameter(request):
+    """Tells whether the query or body may carry an access_token parameter"""
+    if "access_token" in request.query_params:
+        return True
+    try:
+        return b"access_token" in request.body
+    except RawPostDataException:
+        # The body was read as a stream, only OAuth2Authentication can tell
+        return True
+
+
+class CachedOAuth2Authentication(OAuth2Authentication):
+    """OAuth2Authentication that skips the token and user queries on cache hits"""
+
+    def authenticate(self, request):
+        token = get_bearer_token(request)
+        if token is None:
+            return super().authenticate(request)
+        token_cache = get_token_cache()
+        cached = token_cache.get(token)
+        if cached is not None:
+            return cached
+        result = super().authenticate(request)
+        if result is not None:
+            token_cache.set(token, *result)
+        return result
+
+    async def aauthenticate(self, request):
+        """Like authenticate(), only leaving the event loop when it has to query"""
+        token = get_bearer_token(request)
+        if token is None:
+            # OAuth2Authentication also takes an access_token parameter
+            if not has_token_parameter(request):
+                return None
+            return await sync_to_async(self.authenticate)(request)
+        if get_token_cache().shared is None:
+            cached = get_token_cache().get(token)
+            if cached is not None:
+                return cached
+        return await sync_to_async(self.authenticate)(request)
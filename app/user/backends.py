@@ -0,0 +1,29 @@
+from django.contrib.auth import backends, get_user_model
+from django.contrib.auth.hashers import make_password
+
+from core.hashers import acheck_password, arun_hashing
+
+UserModel = get_user_model()
+
+
+class ModelBackend(backends.ModelBackend):
+    """ModelBackend whose async path hashes in the hashing pool
+
+    Django's aauthenticate() verifies the password on the event loop, which
+    stalls every other request of an ASGI worker for the whole hash.
+    """
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hashes anyway, so unknown emails take as long as wrong passwords
+            await arun_hashing(make_password, password)
+            return None
+        if await acheck_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,119 @@
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from oauth2_provider.models import (
+    get_access_token_model,
+    get_grant_model,
+    get_id_token_model,
+    get_refresh_token_model,
+    refresh_token_expire_timedelta,
+)
+from oauth2_provider.settings import oauth2_settings
+
+from core.jobs import task
+
+
+def get_options():
+    options = getattr(settings, "EXPIRED_CLEANUP", {})
+    return {
+        "BATCH_SIZE": options.get("BATCH_SIZE", 500),
+        "PAUSE": options.get("PAUSE", 0.1),
+    }
+
+
+def expired_querysets(now):
+    """Returns (label, queryset) of the expired rows, in deletion order
+
+    Tokens follow the rules of oauth2_provider.models.clear_expired().
+    Sessions are only purged from database backed session engines.
+    """
+    refresh_tokens = get_refresh_token_model().objects
+    querysets = []
+    expire_delta = refresh_token_expire_timedelta()
+    refresh_expire_at = now - expire_delta if expire_delta else None
+    grace = timedelta(seconds=oauth2_settings.REFRESH_TOKEN_GRACE_PERIOD_SECONDS)
+    # Revoked refresh tokens detect reuse until they expire
+    if oauth2_settings.REFRESH_TOKEN_REUSE_PROTECTION:
+        revoked_at = refresh_expire_at
+    else:
+        revoked_at = now - grace
+    if revoked_at:
+        querysets.append(
+            ("revoked refresh tokens", refresh_tokens.filter(revoked__lte=revoked_at))
+        )
+    querysets.append(
+        (
+            "orphaned refresh tokens",
+            refresh_tokens.filter(revoked__isnull=True, access_token__isnull=True),
+        )
+    )
+    if refresh_expire_at:
+        querysets.append(
+            (
+                "expired refresh tokens",
+                refresh_tokens.filter(
+                    revoked__isnull=True, access_token__expires__lte=refresh_expire_at
+                ),
+            )
+        )
+    querysets += [
+        (
+            "access tokens",
+            get_access_token_model().objects.filter(
+                refresh_token__isnull=True, expires__lt=now
+            ),
+        ),
+        (
+            "id tokens",
+            get_id_token_model().objects.filter(
+                access_token__isnull=True, expires__lt=now
+            ),
+        ),
+        ("grants", get_grant_model().objects.filter(expires__lt=now)),
+    ]
+    store = import_module(settings.SESSION_ENGINE).SessionStore
+    if hasattr(store, "get_model_class"):
+        sessions = store.get_model_class().objects
+        querysets.append(("sessions", sessions.filter(expire_date__lt=now)))
+    return querysets
+
+
+def delete_in_batches(queryset, batch_size, pause):
+    """Deletes the rows of queryset batch_size at a time, returning how many
+
+    Batches walk the primary key, so each one reads past the rows already
+    checked instead of scanning the table again, and each commits on its
+    own, so writers wait for one batch at most.
+    """
+    deleted = 0
+    last_pk = None
+    while True:
+        batch = queryset.order_by("pk")
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        pks = list(batch.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return deleted
+        with transaction.atomic():
+            counts = queryset.model.objects.filter(pk__in=pks).delete()[1]
+        deleted += counts.get(queryset.model._meta.label, 0)
+        if len(pks) < batch_size:
+            return deleted
+        last_pk = pks[-1]
+        time.sleep(pause)
+
+
+@task
+def purge_expired(batch_size=None, pause=None):
+    """Deletes expired tokens, grants and sessions, returning counts by label"""
+    options = get_options()
+    batch_size = batch_size or options["BATCH_SIZE"]
+    pause = options["PAUSE"] if pause is None else pause
+    return {
+        label: delete_in_batches(queryset, batch_size, pause)
+        for label, queryset in expired_querysets(timezone.now())
+    }
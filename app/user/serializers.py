@@ -59,14 +59,20 @@ class UserUpdateDataSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class LoginSerializer(serializers.Serializer):
-    """Serializer for the user authentication object"""
+class CredentialsSerializer(serializers.Serializer):
+    """Email and password of a login, checked by the caller"""
 
     email = serializers.EmailField()
     password = serializers.CharField(
         style={"input_type": "password"}, trim_whitespace=False
     )
 
+
+class LoginSerializer(CredentialsSerializer):
+    """Serializer for the user authentication object"""
+
+    authentication_failed = "Unable to authenticate with provided information"
+
     def validate(self, attrs):
         """Validate and authenticate the user"""
         email = attrs.get("email")
@@ -78,8 +84,9 @@ class LoginSerializer(serializers.Serializer):
             password=password,
         )
         if not user:
-            msg = "Unable to authenticate with provided information"
-            raise serializers.ValidationError(msg, code="authenticate")
+            raise serializers.ValidationError(
+                self.authentication_failed, code="authenticate"
+            )
 
         attrs["user"] = user
         return attrs
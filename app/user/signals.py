@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from oauth2_provider.models import get_access_token_model
+
+from core.models import User
+from user.authentication import get_token_cache
+
+# Django's receiver writes last_login on every login, the one below at most
+# once per LAST_LOGIN_UPDATE_INTERVAL
+user_logged_in.disconnect(dispatch_uid="update_last_login")
+
+
+@receiver(user_logged_in, dispatch_uid="update_last_login")
+def update_last_login(sender, user, **kwargs):
+    """Saves last_login, unless it was saved less than the configured interval ago"""
+    now = timezone.now()
+    interval = timedelta(seconds=settings.LAST_LOGIN_UPDATE_INTERVAL)
+    if user.last_login is not None and now - user.last_login < interval:
+        return
+    user.last_login = now
+    user.save(update_fields=["last_login"])
+
+
+@receiver([post_save, post_delete], sender=get_access_token_model())
+def forget_access_token(sender, instance, **kwargs):
+    """Drops a revoked or changed access token from the token cache"""
+    get_token_cache().invalidate_token(instance.token)
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_user_tokens(sender, instance, update_fields=None, **kwargs):
+    """Drops cached tokens of a user whose password or status may have changed"""
+    if update_fields == {"last_login"}:
+        return
+    get_token_cache().invalidate_user(instance.pk)
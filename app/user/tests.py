@@ -0,0 +1,223 @@
+from contextlib import ExitStack
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from decouple import config
+from django.contrib.sessions.models import Session
+from django.db import connection, connections
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oauth2_provider.models import AccessToken, Application, RefreshToken
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.factories import create_application
+from core.models import User
+from user.authentication import CachedOAuth2Authentication
+from user.cleanup import expired_querysets, purge_expired
+
+EMAIL = "queries@example.com"
+PASSWORD = "queries-password"
+
+
+def user_updates(queries):
+    return [
+        query["sql"]
+        for query in queries
+        if query["sql"].startswith('UPDATE "core_user"')
+        # Upgrading an outdated password hash is the hasher's business
+        and 'SET "password"' not in query["sql"]
+    ]
+
+
+@override_settings(THROTTLING={}, LAST_LOGIN_UPDATE_INTERVAL=300)
+class LoginQueryTests(TestCase):
+    """Login and logout run no more queries or user writes than budgeted"""
+
+    login_queries = 8
+    logout_queries = 11
+
+    @classmethod
+    def setUpTestData(cls):
+        Application.objects.create(
+            name="queries",
+            client_id=config("CLIENT_ID"),
+            client_secret=config("CLIENT_SECRET"),
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_PASSWORD,
+        )
+        User.objects.create_user(EMAIL, PASSWORD)
+
+    def post(self, path, data, budget, writes, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                path, data, content_type="application/json", **headers
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), budget)
+        self.assertEqual(len(user_updates(queries.captured_queries)), writes)
+        return response
+
+    def test_login_and_logout(self):
+        login = {"email": EMAIL, "password": PASSWORD}
+        self.post("/user/oauth/login/", login, self.login_queries, 1)
+        # Within the interval, a login does not write last_login again
+        response = self.post("/user/oauth/login/", login, self.login_queries, 0)
+        token = response.json()["access_token"]
+        self.post(
+            "/user/oauth/logout/",
+            {"token": token},
+            self.logout_queries,
+            0,
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+
+
+@override_settings(THROTTLING={})
+class ExpiredCleanupTests(TestCase):
+    """The batched purge deletes exactly the expired tokens and sessions,
+    and logins delete nothing"""
+
+    rows = 200
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.application = create_application()
+        cls.user = User.objects.create_user("cleanup@example.com", "cleanup")
+        now = timezone.now()
+        idle = now - timedelta(days=60)
+
+        def access_tokens(prefix, count, expires):
+            return AccessToken.objects.bulk_create(
+                AccessToken(
+                    user=cls.user,
+                    application=cls.application,
+                    token=f"{prefix}-{i}",
+                    expires=expires,
+                    scope="read write",
+                )
+                for i in range(count)
+            )
+
+        def refresh_tokens(prefix, tokens, revoked=None):
+            RefreshToken.objects.bulk_create(
+                RefreshToken(
+                    user=cls.user,
+                    application=cls.application,
+                    token=f"{prefix}-{i}",
+                    access_token=token,
+                    revoked=revoked,
+                )
+                for i, token in enumerate(tokens)
+            )
+
+        rows = cls.rows
+        # Expired
+        access_tokens("expired", rows, now - timedelta(hours=1))
+        refresh_tokens("revoked", [None] * rows, revoked=now - timedelta(hours=1))
+        refresh_tokens("idle", access_tokens("idle-access", rows, idle))
+        Session.objects.bulk_create(
+            Session(session_key=f"expired{i}", session_data="", expire_date=idle)
+            for i in range(rows)
+        )
+        # Live, interleaved with the expired ones by primary key
+        access_tokens("live", rows // 10, now + timedelta(days=1))
+        refresh_tokens(
+            "refreshable",
+            access_tokens("recent", rows // 10, now - timedelta(days=1)),
+        )
+        Session.objects.bulk_create(
+            Session(
+                session_key=f"live{i}",
+                session_data="",
+                expire_date=now + timedelta(days=1),
+            )
+            for i in range(rows // 10)
+        )
+
+    def count_live(self):
+        return {
+            "access tokens": AccessToken.objects.filter(
+                token__regex=r"^(live|recent)-"
+            ).count(),
+            "refresh tokens": RefreshToken.objects.filter(
+                token__startswith="refreshable-"
+            ).count(),
+            "sessions": Session.objects.filter(session_key__startswith="live").count(),
+        }
+
+    def capture(self, statements):
+        """Collects the sql of every statement run in the block"""
+
+        def execute(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(execute))
+        return stack
+
+    def test_purge(self):
+        live = self.count_live()
+        statements = []
+        with self.capture(statements):
+            deleted = purge_expired(batch_size=50, pause=0)
+        self.assertEqual(sum(deleted.values()), self.rows * 5)
+        left = {
+            label: queryset.count()
+            for label, queryset in expired_querysets(timezone.now())
+        }
+        self.assertFalse(any(left.values()), left)
+        self.assertEqual(self.count_live(), live)
+        deletes = [sql for sql in statements if sql.startswith("DELETE")]
+        # Bounded batches, not one statement per table
+        self.assertGreater(len(deletes), 5)
+
+    def test_login_deletes_nothing(self):
+        User.objects.create_user(EMAIL, PASSWORD)
+        statements = []
+        with self.capture(statements):
+            response = Client().post(
+                "/user/oauth/login/",
+                {"email": EMAIL, "password": PASSWORD},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 200)
+        deletes = [sql for sql in statements if sql.startswith("DELETE")]
+        self.assertFalse(deletes)
+
+
+class AsyncAuthenticationTests(TestCase):
+    """aauthenticate() accepts an access token wherever authenticate() does"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(EMAIL, PASSWORD)
+        AccessToken.objects.create(
+            user=cls.user,
+            application=create_application(),
+            token="parameter-token",
+            expires=timezone.now() + timedelta(hours=1),
+            scope="read write",
+        )
+
+    def test_token_parameter(self):
+        factory = APIRequestFactory()
+        requests = {
+            "query": lambda: factory.get("/", {"access_token": "parameter-token"}),
+            "body": lambda: factory.post(
+                "/", {"access_token": "parameter-token"}, format="json"
+            ),
+        }
+        authentication = CachedOAuth2Authentication()
+        for name, request in requests.items():
+            with self.subTest(name):
+                user, _ = authentication.authenticate(Request(request()))
+                self.assertEqual(user, self.user)
+                result = async_to_sync(authentication.aauthenticate)(Request(request()))
+                self.assertIsNotNone(result)
+                self.assertEqual(result[0], self.user)
+        anonymous = Request(factory.get("/"))
+        self.assertIsNone(async_to_sync(authentication.aauthenticate)(anonymous))
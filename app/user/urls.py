@@ -1,28 +1,33 @@
+from django.conf import settings
 from django.urls import path, include
 
-from user import views
+from user import async_views, views
+
+# Endpoints served by an async view under settings.ASYNC_VIEWS
+api = async_views if settings.ASYNC_VIEWS else views
 
 app_name = "user"
 
 urlpatterns = [
-    path('oauth/', include('oauth2_provider.urls', namespace='oauth2_provider')),
     path(
         "oauth/create/",
-        views.UserCreateView.as_view(),
+        api.UserCreateView.as_view(),
         name="User Create",
     ),
     path(
         "oauth/login/",
-        views.UserLoginView.as_view(),
+        api.UserLoginView.as_view(),
         name="User Login",
     ),
     path(
         "oauth/logout/",
-        views.UserLogoutView.as_view(),
+        api.UserLogoutView.as_view(),
         name="User Logout",
     ),
+    path('oauth/', include('oauth2_provider.urls', namespace='oauth2_provider')),
     path('',
-         views.UserAPIView.as_view(), name='session_create_list'),
+         api.UserAPIView.as_view(), name='session_create_list'),
+    path("export/", views.UserExportAPIView.as_view(), name="user_export"),
     path(
         "<int:pk>/",
         views.RetrieveUpdateDestroyUserAPIView.as_view(),
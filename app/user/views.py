@@ -1,6 +1,14 @@
+from core.export import export_response
 from core.models import User
+from core.routers import ReplicaReadMixin
+from core.serialization import (
+    OptimizedQuerysetMixin,
+    ValuesListMixin,
+    ValuesSerializer,
+)
 from rest_framework import generics, authentication, permissions, status, views
-from django.contrib.auth import authenticate, login, logout, get_user_model
+from django.contrib.auth import login, logout, get_user_model
+from django.contrib.auth.signals import user_logged_in
 from user.serializers import (
     UserSerializer,
     LoginSerializer,
@@ -10,15 +18,11 @@ from user.serializers import (
     UserUpdateDataSerializer,
 )
 from rest_framework.response import Response
-from decouple import config
-import requests
+from user.oauth import issue_token, revoke_token
 from rest_framework.generics import RetrieveUpdateDestroyAPIView, ListCreateAPIView
 from rest_framework.permissions import IsAuthenticated
 
 
-baseUrl = config("API_BASE_URL")
-
-
 def get_or_none(classmodel, **kwargs):
     try:
         return classmodel.objects.get(**kwargs)
@@ -26,15 +30,38 @@ def get_or_none(classmodel, **kwargs):
         return None
 
 
-class UserAPIView(ListCreateAPIView):
+class UserAPIView(ReplicaReadMixin, ValuesListMixin, ListCreateAPIView):
+    serializer_class = UserSerializer
+    values_serializer = ValuesSerializer(UserSerializer)
+    queryset = User.objects.all()
+    permission_classes = [
+        IsAuthenticated,
+    ]
+
+
+class UserExportAPIView(generics.GenericAPIView):
+    """Streams every user as NDJSON or CSV"""
+
     serializer_class = UserSerializer
     queryset = User.objects.all()
     permission_classes = [
         IsAuthenticated,
     ]
+    values_serializer = ValuesSerializer(UserSerializer)
+
+    def get(self, request):
+        return export_response(
+            request,
+            self.values_serializer,
+            self.get_queryset().order_by("id"),
+            request.query_params.get("output", "ndjson"),
+            "users",
+        )
 
 
-class RetrieveUpdateDestroyUserAPIView(RetrieveUpdateDestroyAPIView):
+class RetrieveUpdateDestroyUserAPIView(
+    OptimizedQuerysetMixin, RetrieveUpdateDestroyAPIView
+):
     serializer_class = UserSerializer
     queryset = User.objects.all()
     permission_classes = [
@@ -59,17 +86,14 @@ class UserCreateView(generics.GenericAPIView):
             user.is_active = True
             user.is_staff = True
             user.save()
-            data = {
-                "grant_type": "password",
-                "username": serializer.validated_data["email"],
-                "password": serializer.validated_data["password"],
-                "client_id": config("CLIENT_ID"),
-                "client_secret": config("CLIENT_SECRET"),
-            }
-            res = requests.post(f"{baseUrl}/user/oauth/token/", json=data)
-            data = res.json()
+            data, token_status = issue_token(
+                request,
+                serializer.validated_data["email"],
+                serializer.validated_data["password"],
+                user=user,
+            )
             data["id"] = user.id
-            return Response(status=status.HTTP_200_OK, data=data)
+            return Response(status=token_status, data=data)
         return Response(status=status.HTTP_400_BAD_REQUEST, data="Invalid user data")
 
 
@@ -83,36 +107,21 @@ class UserLoginView(generics.GenericAPIView):
 
     def post(self, request):
         """Logs in user to the system"""
-        serializer = self.serializer_class(data=request.data)
-        serializer.is_valid(raise_exception=True)
-        # user = serializer.validate()
-
-        user = authenticate(
-            request=request,
-            username=serializer.validated_data["email"],
-            password=serializer.validated_data["password"],
+        serializer = self.serializer_class(
+            data=request.data, context={"request": request}
         )
-        if not user:
-            return Response(
-                status=status.HTTP_400_BAD_REQUEST, data="Incorrect ID or password"
-            )
-
-        user.is_active = True
-        user.save()
-        data = {
-            "grant_type": "password",
-            "username": serializer.validated_data["email"],
-            "password": serializer.validated_data["password"],
-            "client_id": config("CLIENT_ID"),
-            "client_secret": config("CLIENT_SECRET"),
-        }
-        res = requests.post(
-            f"{baseUrl}/user/oauth/token/",
-            json=data,
-            headers={"content-type": "application/json"},
-            timeout=120,
+        # Validation authenticates the user, wrong credentials answer 400
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data["user"]
+        data, token_status = issue_token(
+            request,
+            serializer.validated_data["email"],
+            serializer.validated_data["password"],
+            user=user,
         )
-        return Response(status=status.HTTP_200_OK, data=res.json())
+        if token_status == status.HTTP_200_OK:
+            user_logged_in.send(sender=user.__class__, request=request, user=user)
+        return Response(status=token_status, data=data)
 
 
 class UserLogoutView(generics.GenericAPIView):
@@ -128,13 +137,9 @@ class UserLogoutView(generics.GenericAPIView):
         token = serializer.data.get("token", None)
 
         if serializer.is_valid():
-            data = {
-                "token": token,
-                "client_id": config("CLIENT_ID"),
-                "client_secret": config("CLIENT_SECRET"),
-            }
-            requests.post(f"{baseUrl}/user/oauth/revoke-token/", json=data)
-            request.user.save()
+            revoke_status = revoke_token(request, token)
+            if revoke_status != status.HTTP_200_OK:
+                return Response(status=revoke_status, data="Token was not revoked.")
             return Response(status=status.HTTP_200_OK, data="Successfully logged out.")
         else:
             return Response(